@@ -43,6 +43,8 @@ if __name__ == '__main__':
             level = 10,
             format = "%(asctime)s %(filename)s:%(lineno)s %(levelname)s %(message)s"
             )
+    # Set to logging.DEBUG to log every IPC message and poll.
+    logging.getLogger('pkg').setLevel(logging.INFO)
 
     if gateway_addon.API_VERSION < _API_VERSION['min'] or \
             gateway_addon.API_VERSION > _API_VERSION['max']:
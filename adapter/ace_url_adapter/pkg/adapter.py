@@ -4,9 +4,13 @@ import socket
 from gateway_addon import Adapter, SetPinError
 
 from pkg.addon_manager_proxy import AceAddonManagerProxy
+from pkg.coap_context import CoapClientContext
 from pkg.device import *
+from pkg.http_pool import HTTPConnectionPool
+from pkg.poll_scheduler import PollScheduler
 
 from pkg.parameters import *
+from pkg.utils.utils import EventLoopThread
 
 from zeroconf import ServiceBrowser, Zeroconf
 import logging
@@ -15,6 +19,8 @@ import logging
 
 
 
+_LOGGER = logging.getLogger(__name__)
+
 _TIMEOUT = 3
 
 
@@ -34,8 +40,7 @@ class AceAdapter(Adapter):
         verbose -- whether or not to enable verbose logging
         """
         self.verbose = verbose
-        if self.verbose:
-            print(BLUE + 'AceAdapter().__init__()' + ENDC)
+        _LOGGER.debug('AceAdapter().__init__()')
 
         # NOTE: error if absent
         self.name = self.__class__.__name__
@@ -51,6 +56,20 @@ class AceAdapter(Adapter):
         # False in it's constructor.
         self.ready = True
 
+        # All devices submit their I/O to this one loop.
+        self.loop_thread = EventLoopThread(name = 'AceAdapterLoop')
+        self.loop_thread.start()
+        # All HTTP devices share these keep-alive connections.
+        self.http_pool = HTTPConnectionPool()
+        # All CoAP devices share this client context.
+        self.coap_context = CoapClientContext()
+        # One scheduler polls all devices, see PollDevice.async_update().
+        self.poll_scheduler = PollScheduler(self.loop_thread.loop,
+                                            interval = POLL_INTERVAL,
+                                            floor = POLL_FLOOR,
+                                            ceiling = POLL_CEILING)
+        self.poll_scheduler.start()
+
         self.manager_proxy = AceAddonManagerProxy(self.id, verbose = verbose)
         # ting-url-adapter.js : 406
         self.manager_proxy.add_adapter(self)
@@ -80,7 +99,13 @@ class AceAdapter(Adapter):
 
     def dump(self):
         """Dump the state of the adapter to the log."""
-        print('Adapter:', self.name, '- dump() not implemented')
+        _LOGGER.info('Adapter: %s http_pool: %s reuse_ratio: %.3f suppressed_updates: %d dispatcher: %s queue_depths: %s',
+                     self.name,
+                     self.http_pool.stats,
+                     self.http_pool.reuse_ratio(),
+                     sum(device.suppressed_updates for device in self.devices.values()),
+                     self.manager_proxy.dispatcher.stats,
+                     self.manager_proxy.dispatcher.queue_depths())
 
     def get_id(self):
         """
@@ -150,10 +175,11 @@ class AceAdapter(Adapter):
 
         device -- Device object
         """
-        if self.verbose:
-            print(BLUE + 'AceAdapter().handle_device_added()' + ENDC)
+        _LOGGER.debug('AceAdapter().handle_device_added()')
         self.devices[device.id] = device
         self.manager_proxy.handle_device_added(device)
+        self.poll_scheduler.add(device)
+        device.start_subscription()
 
     def handle_device_removed(self, device):
         """
@@ -161,8 +187,9 @@ class AceAdapter(Adapter):
 
         device -- Device object
         """
-        if self.verbose:
-            print(BLUE + 'AceAdapter().handle_device_removed()' + ENDC)
+        _LOGGER.debug('AceAdapter().handle_device_removed()')
+        self.poll_scheduler.remove(device.id)
+        device.stop_subscription()
         if device.id in self.devices:
             del self.devices[device.id]
 
@@ -173,7 +200,7 @@ class AceAdapter(Adapter):
     def start_pairing(self, timeout):
         # TODO this is where ACE-WebThingServer will be added.
         # addon-manager-proxy.js:153
-        print('Adapter:', self.name, 'id', self.id, 'pairing started')
+        _LOGGER.info('Adapter: %s id %s pairing started', self.name, self.id)
         self.pairing = True
 
         discovered_devices: dict = {}
@@ -192,7 +219,7 @@ class AceAdapter(Adapter):
                 _name: str = _info.name.split('.')[0]
                 _address: str = self.prefix + socket.inet_ntoa(_info.address) + ':' + str(_info.port)
                 discovered_devices[_name] = _address
-                print('Device ' + _name + ' discovered at ' + _address)
+                _LOGGER.info('Device %s discovered at %s', _name, _address)
 
 
             def remove_service(self, zeroconf, type, name):
@@ -252,7 +279,7 @@ class AceAdapter(Adapter):
 
     def cancel_pairing(self):
         self.pairing = False
-        print('Adapter:', self.name, 'id', self.id, 'pairing cancelled')
+        _LOGGER.info('Adapter: %s id %s pairing cancelled', self.name, self.id)
 
 
 
@@ -263,15 +290,8 @@ class AceAdapter(Adapter):
         device_id -- ID of device to unpair
         """
         device = self.get_device(device_id)
-        logging.info(
-                ':  Stopping polling_thread(' + device.polling_thread._name + ') for Device:  ' + device.name + '.')
-
-        device.stop_event.set()
-        device.polling_thread.join()
-        # device.polling_thread.stop()
         if device:
-            print('Adapter:', self.name, 'id', self.id,
-                  'remove_thing(' + device.id + ')')
+            _LOGGER.info('Adapter: %s id %s remove_thing(%s)', self.name, self.id, device.id)
 
             self.handle_device_removed(device)
 
@@ -283,12 +303,21 @@ class AceAdapter(Adapter):
         """
         device = self.get_device(device_id)
         if device:
-            print('Adapter:', self.name, 'id', self.id,
-                  'cancel_remove_thing(' + device.id + ')')
+            _LOGGER.info('Adapter: %s id %s cancel_remove_thing(%s)', self.name, self.id, device.id)
 
     def unload(self):
         """Perform any necessary cleanup before adapter is shut down."""
-        print('Adapter:', self.name, 'unloaded')
+        self.poll_scheduler.stop()
+        try:
+            self.loop_thread.run_sync(self.http_pool.close(), timeout = _TIMEOUT)
+        except Exception as e:
+            _LOGGER.error('Closing http_pool failed: %s', e)
+        try:
+            self.loop_thread.run_sync(self.coap_context.close(), timeout = _TIMEOUT)
+        except Exception as e:
+            _LOGGER.error('Closing coap_context failed: %s', e)
+        self.loop_thread.stop(timeout = _TIMEOUT)
+        _LOGGER.info('Adapter: %s unloaded', self.name)
 
     def set_pin(self, device_id, pin):
         """
@@ -299,7 +328,6 @@ class AceAdapter(Adapter):
         """
         device = self.get_device(device_id)
         if device:
-            print('Adapter:', self.name, 'id', self.id,
-                  'set_pin(' + device.id + ', ' + pin + ')')
+            _LOGGER.info('Adapter: %s id %s set_pin(%s, %s)', self.name, self.id, device.id, pin)
         else:
             raise SetPinError('Device not found')
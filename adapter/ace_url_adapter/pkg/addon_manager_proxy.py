@@ -4,8 +4,8 @@ import asyncio
 
 from gateway_addon import AddonManagerProxy
 from nnpy.errors import NNError
-import functools
 import json
+import logging
 import threading
 import time
 
@@ -13,9 +13,12 @@ from gateway_addon.ipc import IpcClient
 from gateway_addon.errors import ActionError, PropertyError, SetPinError
 
 
-print = functools.partial(print, flush = True)
-
 from pkg.parameters import *
+from pkg.dispatcher import OrderedDispatcher
+
+
+# NOTE: set to DEBUG to log every IPC message. Messages are only formatted if the level is enabled.
+_LOGGER = logging.getLogger(__name__)
 
 
 class AceAddonManagerProxy(AddonManagerProxy):
@@ -35,13 +38,15 @@ class AceAddonManagerProxy(AddonManagerProxy):
         verbose -- whether or not to enable verbose logging
         """
         self.verbose = verbose
-        if self.verbose:
-            print(BLUE + 'AceAddonManagerProxy().__init__()'+ENDC)
+        _LOGGER.debug('AceAddonManagerProxy().__init__()')
         #
         self.adapters = {}
         self.ipc_client = IpcClient(plugin_id, verbose = verbose)
         self.plugin_id = plugin_id
 
+        # Handlers of incoming messages, ordered per device.
+        self.dispatcher = OrderedDispatcher()
+
         self.running = True
         self.thread = threading.Thread(target = self.recv)
         self.thread.daemon = True
@@ -51,6 +56,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
     def close(self):
         """Close the proxy."""
         self.running = False
+        self.dispatcher.shutdown()
 
         try:
             self.ipc_client.manager_socket.close()
@@ -74,8 +80,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
 
         adapter -- the Adapter that was added
         """
-        if self.verbose:
-            print('AceAddonManagerProxy: add_adapter:', adapter.id)
+        _LOGGER.debug('add_adapter: %s', adapter.id)
 
         self.adapters[adapter.id] = adapter
         self.send('addAdapter', {
@@ -91,8 +96,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
 
         device -- the Device that was added
         """
-        if self.verbose:
-            print('AceAddonManagerProxy: handle_device_added:', device.id)
+        _LOGGER.debug('handle_device_added: %s', device.id)
 
         device_dict = device.as_dict()
         device_dict['adapterId'] = device.adapter.id
@@ -105,8 +109,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
 
         device -- the Device that was removed
         """
-        if self.verbose:
-            print('AceAddonManagerProxy: handle_device_removed:', device.id)
+        _LOGGER.debug('handle_device_removed: %s', device.id)
 
         self.send('handleDeviceRemoved', {
             'adapterId': device.adapter.id,
@@ -127,6 +130,19 @@ class AceAddonManagerProxy(AddonManagerProxy):
             })
 
 
+    def send_property_changed_notifications(self, props):
+        """
+        Send notifications for several changed device properties in one batch.
+
+        props -- list of the Properties that changed
+        """
+        self.send_batch([('propertyChanged', {
+            'adapterId': prop.device.adapter.id,
+            'deviceId' : prop.device.id,
+            'property' : prop.as_dict(),
+            }) for prop in props])
+
+
     def send_action_status_notification(self, action):
         """
         Send a notification that an action's status changed.
@@ -183,16 +199,36 @@ class AceAddonManagerProxy(AddonManagerProxy):
             _msg = json.dumps({'messageType': msg_type,
                                'data'       : data,
                                })
-            _msg_encoded = _msg.encode('utf-8')
             self.ipc_client.plugin_socket.send(_msg)
-            # NOTE: pretty print json of sent.
-            _msg_pretty = json.dumps({'messageType': msg_type,
-                                      'data'       : data,
-                                      },
-                                     indent = 4)
-            print(GREEN + 'AceAddonManagerProxy().send() '+ENDC + _msg_pretty)
+            # NOTE: logs the already encoded message, thus no second json.dumps().
+            _LOGGER.debug('send() %s', _msg)
         except NNError as e:
-            print('AddonManagerProxy: Failed to send message: {}'.format(e))
+            _LOGGER.error('Failed to send message: %s', e)
+
+
+    def send_batch(self, messages):
+        """
+        Send several messages through the IPC socket, back to back.
+        The IPC protocol has no batch message, so they are still sent one by one,
+        but encoded and logged together.
+
+        messages -- list of (msg_type, data) tuples
+        """
+        _msgs = []
+        for msg_type, data in messages:
+            if data is None:
+                data = {}
+            data['pluginId'] = self.plugin_id
+            _msgs.append(json.dumps({'messageType': msg_type,
+                                     'data'       : data,
+                                     }))
+
+        try:
+            for _msg in _msgs:
+                self.ipc_client.plugin_socket.send(_msg)
+                _LOGGER.debug('send_batch() %s', _msg)
+        except NNError as e:
+            _LOGGER.error('Failed to send message: %s', e)
 
 
     def recv(self):
@@ -205,8 +241,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
             try:
                 msg = self.ipc_client.plugin_socket.recv()
             except NNError as e:
-                print('AddonManagerProxy: Error receiving message from '
-                      'socket: {}'.format(e))
+                _LOGGER.error('Error receiving message from socket: %s', e)
                 break
 
 
@@ -214,29 +249,20 @@ class AceAddonManagerProxy(AddonManagerProxy):
                 break
 
             try:
-                msg = json.loads(msg.decode('utf-8'))
-
-
+                _msg = msg.decode('utf-8')
+                msg = json.loads(_msg)
             except ValueError:
-                print('AddonManagerProxy: Error parsing message as JSON')
+                _LOGGER.error('Error parsing message as JSON')
                 continue
 
             if 'messageType' not in msg:
-                print('AddonManagerProxy: Invalid message')
+                _LOGGER.error('Invalid message')
                 continue
 
             msg_type = msg['messageType']
-            msg_data = msg['data']
-
-            if True:
-            #if self.verbose:
-                # NOTE: pretty print json of sent.
-                _msg_pretty = json.dumps({'messageType': msg_type,
-                                          'data'       : msg_data,
-                                          },
-                                         indent = 4)
-                print(BLUE + 'AceAddonManagerProxy().recv() ' + _msg_pretty+ENDC)
 
+            # NOTE: logs the received string as is, thus no json.dumps().
+            _LOGGER.debug('recv() %s', _msg)
 
 
             if msg_type == 'unloadPlugin':
@@ -253,25 +279,25 @@ class AceAddonManagerProxy(AddonManagerProxy):
                 break
 
             if 'data' not in msg or 'adapterId' not in msg['data']:
-                print('AddonManagerProxy: Adapter ID not present in message.')
+                _LOGGER.warning('Adapter ID not present in message.')
                 continue
 
             adapter_id = msg['data']['adapterId']
             if adapter_id not in self.adapters:
-                print('AddonManagerProxy: Unrecognized adapter, ignoring '
-                      'message.')
+                _LOGGER.warning('Unrecognized adapter, ignoring message.')
                 continue
 
             adapter = self.adapters[adapter_id]
 
             # High-level adapter messages
+            # NOTE: these are unordered (key None), cancelPairing must not wait for startPairing.
             if msg_type == 'startPairing':
-                self.make_thread(adapter.start_pairing,
-                                 args = (msg['data']['timeout'],))
+                self.dispatcher.submit(None, adapter.start_pairing,
+                                       args = (msg['data']['timeout'],))
                 continue
 
             if msg_type == 'cancelPairing':
-                self.make_thread(adapter.cancel_pairing)
+                self.dispatcher.submit(None, adapter.cancel_pairing)
                 continue
 
             if msg_type == 'unloadAdapter':
@@ -281,28 +307,29 @@ class AceAddonManagerProxy(AddonManagerProxy):
                                {'adapterId': adapter.id})
 
 
-                self.make_thread(unload_fn, args = (self, adapter))
+                self.dispatcher.submit(None, unload_fn, args = (self, adapter))
                 del self.adapters[adapter.id]
                 continue
 
             # All messages from here on are assumed to require a valid deviceId
             if 'data' not in msg or 'deviceId' not in msg['data']:
-                print('AddonManagerProxy: No deviceId present in message, '
-                      'ignoring.')
+                _LOGGER.warning('No deviceId present in message, ignoring.')
                 continue
 
+            # Messages for the same device are handled in order, see OrderedDispatcher.
+            # NOTE: handlers run later, thus they get *msg* and *device_id* as arguments.
             device_id = msg['data']['deviceId']
             if msg_type == 'removeThing':
-                self.make_thread(adapter.remove_thing, args = (device_id,))
+                self.dispatcher.submit(device_id, adapter.remove_thing, args = (device_id,))
                 continue
 
             if msg_type == 'cancelRemoveThing':
-                self.make_thread(adapter.cancel_remove_thing,
-                                 args = (device_id,))
+                self.dispatcher.submit(device_id, adapter.cancel_remove_thing,
+                                       args = (device_id,))
                 continue
 
             if msg_type == 'setProperty':
-                def set_prop_fn(proxy, adapter):
+                def set_prop_fn(proxy, adapter, msg, device_id):
                     dev = adapter.get_device(device_id)
                     if not dev:
                         return
@@ -327,13 +354,13 @@ class AceAddonManagerProxy(AddonManagerProxy):
                         proxy.send_property_changed_notification(prop)
 
 
-                self.make_thread(set_prop_fn, args = (self, adapter))
+                self.dispatcher.submit(device_id, set_prop_fn, args = (self, adapter, msg, device_id))
                 continue
 
             if msg_type == 'requestAction':
 
 
-                def request_action_fn(proxy, adapter):
+                def request_action_fn(proxy, adapter, msg, device_id):
                     action_id = msg['data']['actionId']
                     action_name = msg['data']['actionName']
 
@@ -345,7 +372,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
                             if 'input' in msg['data']:
                                 action_input = msg['data']['input']
 
-                            print(FAIL+'INFO request_action from device with device_id : ' +str(device_id)+ENDC)
+                            _LOGGER.info('request_action from device with device_id : %s', device_id)
                             dev.request_action(action_id,
                                                action_name,
                                                action_input)
@@ -361,11 +388,11 @@ class AceAddonManagerProxy(AddonManagerProxy):
                             })
 
 
-                self.make_thread(request_action_fn, args = (self, adapter))
+                self.dispatcher.submit(device_id, request_action_fn, args = (self, adapter, msg, device_id))
                 continue
 
             if msg_type == 'removeAction':
-                def remove_action_fn(proxy, adapter):
+                def remove_action_fn(proxy, adapter, msg, device_id):
                     action_id = msg['data']['actionId']
                     action_name = msg['data']['actionName']
                     message_id = msg['data']['messageId']
@@ -389,11 +416,11 @@ class AceAddonManagerProxy(AddonManagerProxy):
                             })
 
 
-                self.make_thread(remove_action_fn, args = (self, adapter))
+                self.dispatcher.submit(device_id, remove_action_fn, args = (self, adapter, msg, device_id))
                 continue
 
             if msg_type == 'setPin':
-                def set_pin_fn(proxy, adapter):
+                def set_pin_fn(proxy, adapter, msg, device_id):
                     message_id = msg['data']['messageId']
 
                     try:
@@ -412,7 +439,7 @@ class AceAddonManagerProxy(AddonManagerProxy):
                             })
 
 
-                self.make_thread(set_pin_fn, args = (self, adapter))
+                self.dispatcher.submit(device_id, set_pin_fn, args = (self, adapter, msg, device_id))
                 continue
 
 
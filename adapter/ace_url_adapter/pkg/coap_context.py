@@ -0,0 +1,89 @@
+import asyncio
+
+from ace.client.coap import CoAPClient
+from aiocoap import Context, Message
+from aiocoap.numbers.codes import Code
+
+from pkg.observe import ObservationEnded, ObserveNotOffered
+from pkg.utils.utils import multi_loads
+
+# imports parameters.py
+from pkg.parameters import *
+
+
+class CoapClientContext:
+    """
+    One aiocoap client *Context* and one *CoAPClient* shared by all CoAP devices of one adapter.
+    This keeps the number of UDP sockets constant, no matter how many CoAP Things are paired.
+    NOTE: Must only be used from the adapter's event loop, the context is bound to it.
+    """
+
+    def __init__(self):
+        self._protocol = None
+        self._client = None
+        self._lock = None
+
+    async def client(self):
+        """
+        Get the shared ACE CoAP client, create it together with its context on first use.
+        """
+        if self._client is not None:
+            return self._client
+
+        # Created lazily, so that the lock belongs to the adapter's event loop.
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._client is None:
+                self._protocol = await Context.create_client_context()
+                self._client = CoAPClient(client_id = CLIENT_ID,
+                                          client_secret = CLIENT_SECRET,
+                                          protocol = self._protocol
+                                          )
+        return self._client
+
+    async def close(self):
+        """
+        Shut down the shared context, releasing its sockets.
+        """
+        protocol = self._protocol
+        self._protocol = None
+        self._client = None
+        if protocol is not None:
+            await protocol.shutdown()
+
+    async def observe(self, session, rs_url, endpoint):
+        """
+        Observe *endpoint* of the ACE RS at *rs_url*.\n
+        Async iterator of the decoded states at *endpoint*:
+        first the one `CoAPClient.access_resource()` returns, which also establishes the OSCORE context of *session*,
+        then one per notification, protected with that context.\n
+        Returns when the server ends the observation.
+        :raise ObserveNotOffered: if the resource is not observable.
+        :raise ObservationEnded: if the server answers with an unsuccessful code.
+        """
+        client = await self.client()
+        yield multi_loads(await client.access_resource(session = session,
+                                                       rs_url = rs_url,
+                                                       endpoint = endpoint))
+
+        oscore_context = session.oscore_context
+        request = self._protocol.request(Message(code = Code.GET,
+                                                 uri = rs_url + endpoint,
+                                                 observe = 0,
+                                                 payload = oscore_context.encrypt(b'')))
+        try:
+            response = await request.response
+            if not response.code.is_successful():
+                raise ObservationEnded(response.code)
+            if response.opt.observe is None:
+                raise ObserveNotOffered(endpoint)
+            yield multi_loads(oscore_context.decrypt(response.payload))
+
+            async for notification in request.observation:
+                if not notification.code.is_successful():
+                    raise ObservationEnded(notification.code)
+                yield multi_loads(oscore_context.decrypt(notification.payload))
+        finally:
+            request.observation.cancel()
@@ -1,22 +1,15 @@
 import json
 import logging
-import threading
-import time
-import traceback
 
-import aiohttp
 import asyncio
 
-from ace.client.coap import CoAPClient
-from aiocoap import Context
-
-from pkg.utils.utils import multi_loads, StoppableThread
+from pkg.utils.utils import multi_loads
 import cbor2
 from gateway_addon import Device, Action, Event
 
-from ace.client.http import HTTPClient
-
+from pkg.observe import ObserveSubscription
 from pkg.property import AceProperty
+from pkg.websocket_subscription import WebSocketSubscription
 
 # imports parameters.py
 from pkg.parameters import *
@@ -27,42 +20,224 @@ from jsonschema.exceptions import ValidationError
 
 
 
-_POLL_INTERVAL = 5
+_LOGGER = logging.getLogger(__name__)
+
+_REQUEST_TIMEOUT = 10
+# A cached Thing Description is revalidated every this many polls.
+_TD_REVALIDATE_POLLS = 12
+# Observations which find the ACE session expired within this many seconds share one renewal.
+_RENEW_INTERVAL = 5
 
 
 class PollDevice(Device):
 
+    thing_endpoint = '/'
+
     def __init__(self, adapter, _id):
+        """
+        Polling is driven by the adapter's PollScheduler, see `async_update()`.
+        """
         super().__init__(adapter, _id)
-        # stop_event is args of target == poll
-        self.stop_event = threading.Event()
-        self.polling_thread = threading.Thread(target = self.poll, args = (self.stop_event,))
-        self.polling_thread.daemon = True
-        self.polling_thread.start()
 
         self.events = []
+        # last Thing Description received from `/`, and the RS's validator for it
+        self.thing_state = None
+        self.thing_validator = None
+        self.polls_since_revalidation = 0
+        # polled property values which were unchanged, thus not sent to the Gateway
+        self.suppressed_updates = 0
+
+
+
+    async def fetch(self, endpoint):
+        """
+        DO implement in child class.
+        Returns the decoded state found at *endpoint* of the Thing.
+        """
+        raise NotImplementedError
+
+
+    async def fetch_thing(self):
+        return await self.fetch(self.thing_endpoint)
+
+
+    async def fetch_thing_validator(self):
+        """
+        The ACE RS answers `<thing_endpoint>?validator` with a hash of its Thing Description.
+        """
+        response = await self.fetch(self.thing_endpoint + '?validator')
+        if isinstance(response, dict):
+            return response.get('validator')
+        return None
+
+
+    async def fetch_thing_if_changed(self):
+        """
+        Returns the Thing Description, or None if the cached one is still valid.
+        """
+        validator = await self.fetch_thing_validator()
+        if validator is not None and validator == self.thing_validator:
+            return None
+
+        thing_state = await self.fetch_thing()
+        self.thing_validator = validator
+        return thing_state
+
+
+    async def revalidate_thing(self):
+        """
+        Returns the Thing Description, or None if the cached one is still valid.
+        The cached one is only revalidated every *_TD_REVALIDATE_POLLS* polls,
+        thus steady-state polls only touch `/properties` and `/events`.
+        """
+        if self.thing_state is not None and self.polls_since_revalidation < _TD_REVALIDATE_POLLS:
+            self.polls_since_revalidation += 1
+            return None
+
+        self.polls_since_revalidation = 0
+        return await self.fetch_thing_if_changed()
+
+
+    def start_subscription(self):
+        """
+        DO implement in child classes which are notified of changes, instead of polling for them.
+        Called once the device was added to the adapter.
+        """
+        pass
+
+
+    def stop_subscription(self):
+        pass
+
+
+    def is_observed(self, endpoint):
+        """
+        Endpoints whose changes are pushed by the Thing are not polled, see `async_update()`.
+        """
+        return False
+
+
+    def event_names(self):
+        if self.thing_state is None:
+            return []
+        return list(self.thing_state.get('events', {}))
+
+
+    def thing_is_stale(self, properties_state):
+        """
+        A polled property which the cached Thing Description lacks means the TD changed.
+        """
+        if self.thing_state is None or not isinstance(properties_state, dict):
+            return False
+        known = self.thing_state.get('properties', {})
+        return any(property_name not in known for property_name in properties_state)
+
+
+    def update(self):
+        """
+        Read the polled states of the Thing into *self*.
+        properties_state is needed because thing_state lacks Property Values.
+        A partly failed update keeps what succeeded and is only logged,
+        it raises only if the Thing Description could not be fetched at all.
+        """
+        try:
+            self.run_sync(self.async_update())
+        except Exception as e:
+            if self.thing_state is None:
+                raise
+            _LOGGER.warning('Update of %s failed in part:  %s', self.id, e)
 
 
+    async def async_update(self):
+        """
+        Fetch `/properties`, `/events` and, if due, `/` concurrently.
+        Properties are applied as soon as `/` and `/properties` arrived, without waiting for `/events`.
+        Endpoints which are observed (see `is_observed()`) are skipped, thus only `/` is revalidated.
+        A failed request only skips the part of the update that needs it,
+        the first failure is raised after the rest was applied.
+        :return: number of properties and events that changed.
+        """
+
+        async def unchanged():
+            return None
+
+        changes = 0
+        if self.is_observed('/events'):
+            events_task = asyncio.ensure_future(unchanged())
+        else:
+            events_task = asyncio.ensure_future(self.fetch('/events'))
+        try:
+            if self.is_observed('/properties'):
+                properties_fetch = unchanged()
+            else:
+                properties_fetch = self.fetch('/properties')
+            thing_state, properties_state = await asyncio.gather(self.revalidate_thing(),
+                                                                 properties_fetch,
+                                                                 return_exceptions = True)
+            errors = [state for state in (thing_state, properties_state)
+                      if isinstance(state, BaseException)]
 
-    def poll(self, stop_event):
-        while not stop_event.wait(1):
-            time.sleep(_POLL_INTERVAL)
             try:
-                self.update()
+                if thing_state is None and self.thing_is_stale(properties_state):
+                    thing_state = await self.fetch_thing()
+                    self.thing_validator = None
+                if thing_state is not None and not isinstance(thing_state, BaseException):
+                    self.thing_update(thing_state)
+                if properties_state is not None and not isinstance(properties_state, BaseException) \
+                        and self.thing_state is not None:
+                    changes += self.properties_update(self.thing_state, properties_state)
+            except Exception as e:
+                errors.append(e)
 
-                logging.info('Device : ' + multi_loads(self.name) + ' was polled.')
+            try:
+                events_state = await events_task
+                if events_state is not None:
+                    changes += self.events_update(events_state)
             except Exception as e:
-                logging.info('Polling failed:  ' + str(e))
-                continue
+                errors.append(e)
+        finally:
+            events_task.cancel()
 
-    def update(self):
+        if errors:
+            raise errors[0]
+        return changes
+
+
+    def has_sensors(self):
         """
-        DO implement in child class.
+        Hint from the Thing Description:
+        `readOnly` properties are sensors and change on their own,
+        writable properties are settings which mostly change through the adapter itself.
         """
-        pass
+        if self.thing_state is None:
+            return True
+        return any(description.get('readOnly', False)
+                   for description in self.thing_state.get('properties', {}).values())
+
+
+    def thing_update(self, thing_state):
+        self.name = thing_state['name']
+        self.description = thing_state['description']
+        self.actions.update(thing_state['actions'])
+        self.thing_state = thing_state
+
+
+    def run_sync(self, coro):
+        """
+        Run *coro* on the event loop shared by all devices of the adapter,
+        block until it returns and pass on its result.
+        """
+        return self.adapter.loop_thread.run_sync(coro, timeout = _REQUEST_TIMEOUT)
 
 
     def properties_update(self, thing_state, properties_state):
+        """
+        Only properties whose value changed are sent to the Gateway, in one batch.
+        Called on the adapter's event loop, the batch is sent by the manager proxy's dispatcher.
+        :return: number of properties that were added or changed their value.
+        """
+        changes = 0
+        changed_properties = []
         for property_name in properties_state:
             # NOTE:
             # - description must be dict and corespond to property.metadata, not property.metadata.description.
@@ -75,25 +250,49 @@ class PollDevice(Device):
                                        description = thing_state['properties'][property_name],
                                        value = properties_state[property_name])
                 self.properties[property.name] = property
+                changes += 1
+            elif property.update(value = properties_state[property_name]):
+                changed_properties.append(property)
+                changes += 1
             else:
-                property.update(value = properties_state[property_name])
+                self.suppressed_updates += 1
+
+        if changed_properties:
+            # NOTE: the IPC send blocks, thus it runs on the dispatcher, ordered with the other messages of this device.
+            manager_proxy = self.adapter.manager_proxy
+            manager_proxy.dispatcher.submit(self.id, manager_proxy.send_property_changed_notifications,
+                                            args = (changed_properties,), block = False)
+        return changes
 
 
     def events_update(self, events_state):
+        """
+        :return: number of new events.
+        """
+        changes = 0
         for event_description in events_state:
             if event_description not in self.events:
                 self.events.append(event_description)
+                changes += 1
+        return changes
 
 
 
 
 class URLDevice(PollDevice):
+    """
+    With *WEBSOCKET_SUBSCRIPTION* one WebSocket per Thing is kept open, see `WebSocketSubscription`.
+    Its `propertyStatus` and `event` messages feed `properties_update()` and `events_update()`,
+    and property writes and action requests are sent over it.
+    While it is closed, the Thing is polled and written to over HTTP.
+    """
 
     def __init__(self, adapter, _id, url):
 
         super().__init__(adapter, _id)
-        print(BLUE + 'URLDevice().__init__()' + ENDC)
+        _LOGGER.debug('URLDevice().__init__()')
         self.url = url
+        self.subscription = None
         self.update()
 
 
@@ -104,7 +303,7 @@ class URLDevice(PollDevice):
         Gets Property from Self, thus from Device, thus without querying the real Thing
         """
         # TODO this is never used, set this to be used in amproxy, better even find how others use it.
-        print(WARNING + 'ace_adapter.device.GET_property: ' + property_name + ENDC)
+        _LOGGER.debug('GET_property: %s', property_name)
         super().get_property(property_name = property_name)
 
 
@@ -112,20 +311,24 @@ class URLDevice(PollDevice):
     def set_property(self, property_name, value):
         """
         """
-        print(WARNING + 'ace_adapter.device.SET_property: ' + property_name + ' to ' + str(value) + ENDC)
+        _LOGGER.debug('SET_property: %s to %s', property_name, value)
         prop = self.find_property(property_name)
         if not prop:
             return
 
+        # NOTE: the thing answers with a pushed `propertyStatus`, which updates *prop*.
+        if self.send_message('setProperty', {property_name: value}):
+            return
+
         try:
             _response = self.aiohttp_request(method = 'PUT',
                                              url = self.url + prop.description['links'][0]['href'],
                                              headers = {'Accept': 'application/json'},
                                              data = json.dumps({property_name: value})
                                              )
-            print('Response: ' + str(_response))
+            _LOGGER.debug('Response: %s', _response)
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
+            _LOGGER.error('%s', e)
         else:
             prop.set_value(value)
 
@@ -135,7 +338,7 @@ class URLDevice(PollDevice):
         """
         This Overwrite is required because Parent would call its own *perform_action()* which is *pass*.
         """
-        print(FAIL + 'INFO action is being requested' + ENDC)
+        _LOGGER.info('Action is being requested.')
         if action_name not in self.actions:
             return
 
@@ -146,45 +349,137 @@ class URLDevice(PollDevice):
                 validate(action_input, metadata['input'])
             except ValidationError:
                 return
-        print(FAIL + 'action_id' + str(action_id) + ENDC)
-        print(FAIL + 'action_name' + str(action_name) + ENDC)
-        print(FAIL + 'action_input' + str(action_input) + ENDC)
+        _LOGGER.debug('action_id: %s action_name: %s action_input: %s', action_id, action_name, action_input)
         action = Action(action_id, self, action_name, action_input)
         self.perform_action(action)
 
 
 
     def perform_action(self, action):
-        print(FAIL + 'INFO action is being performed' + ENDC)
+        _LOGGER.info('Action is being performed.')
+        if self.send_message('requestAction', {action.name: {'input': action.input}}):
+            return
+
         try:
             _response: dict = self.aiohttp_request(method = 'POST',
                                                    url = self.url + '/actions/' + action.name,
                                                    headers = {'Accept': 'application/json'},
                                                    data = json.dumps({action.name: {'input': action.input}})
                                                    )
-            print('Response:' + _response['content'].decode('utf-8'))
+            _LOGGER.debug('Response: %s', _response)
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
+            _LOGGER.error('%s', e)
 
 
 
 
-    def update(self):
+    def send_message(self, message_type, data):
+        """
+        :return: whether the message was sent over the WebSocket, False if it is closed.
+        """
+        if self.subscription is None or not self.subscription.connected:
+            return False
+        try:
+            return self.run_sync(self.subscription.send(message_type, data))
+        except Exception as e:
+            _LOGGER.info('%s', e)
+            return False
+
+
+
+    def start_subscription(self):
+        if not WEBSOCKET_SUBSCRIPTION or self.subscription is not None:
+            return
+        self.subscription = WebSocketSubscription(self, self.adapter.loop_thread.loop, self.adapter.http_pool.session)
+        self.subscription.start()
+
+
+
+    def stop_subscription(self):
+        if self.subscription is not None:
+            self.subscription.stop()
+            self.subscription = None
+
+
+
+    def is_observed(self, endpoint):
+        return self.subscription is not None and self.subscription.connected \
+               and endpoint in ('/properties', '/events')
+
+
+
+    def ws_url(self):
+        """
+        The WebThingServer links its WebSocket as `alternate` in the Thing Description.
+        """
+        if self.thing_state is not None:
+            for link in self.thing_state.get('links', []):
+                if link.get('rel') == 'alternate' and link.get('href', '').startswith(('ws://', 'wss://')):
+                    return link['href']
+        return 'ws' + self.url[len('http'):] + self.thing_endpoint
+
+
+
+    async def resync(self):
+        """
+        Fetch `/properties` and `/events` once, the socket only pushes what changes after it connected.
+        """
+        properties_state, events_state = await asyncio.gather(self.fetch('/properties'), self.fetch('/events'))
+        if self.thing_state is not None:
+            self.properties_update(self.thing_state, properties_state)
+        self.events_update(events_state)
+
+
+
+    def on_message(self, message_type, data):
+        """
+        `propertyStatus` data are { name : value }, `event` data are one event description as listed by `/events`.
+        """
+        if message_type == 'propertyStatus':
+            if self.thing_state is not None:
+                self.properties_update(self.thing_state, data)
+        elif message_type == 'event':
+            self.events_update([data])
+        elif message_type == 'error':
+            _LOGGER.error('%s: %s', self.id, data)
+        else:
+            _LOGGER.debug('%s %s: %s', self.id, message_type, data)
+
+
+
+    def thing_update(self, thing_state):
+        super().thing_update(thing_state)
+        if self.subscription is not None:
+            # Events which the Thing Description gained.
+            self.subscription.subscribe_events()
+
+
+
+    async def fetch(self, endpoint):
         """
-            Read from polled states *thing_state* and *property_state* into *self*.
             - ..._response: { 'status' : int, 'content' : str}
             - multi_loads will fail if unauthorized (status 401) .
-            - properties_response needed because thing_response lacks Property Values.
         """
-        thing_state = self.aiohttp_request(method = 'GET', url = self.url + '/')
-        properties_state = self.aiohttp_request(method = 'GET', url = self.url + '/properties')
-        events_state = self.aiohttp_request(method = 'GET', url = self.url + '/events')
+        return await self.async_aiohttp_request(method = 'GET', url = self.url + endpoint)
 
-        self.name = thing_state['name']
-        self.description = thing_state['description']
-        self.properties_update(thing_state, properties_state)
-        self.actions.update(thing_state['actions'])
-        self.events_update(events_state)
+
+
+    async def fetch_thing_if_changed(self):
+        """
+        The plain WebThingServer (Tornado) sets an ETag, thus use a conditional GET as validator.
+        """
+        headers = None
+        if self.thing_validator is not None:
+            headers = {'If-None-Match': self.thing_validator}
+
+        _session = self.adapter.http_pool.session()
+        async with _session.get(self.url + self.thing_endpoint, headers = headers) as response:
+            if response.status == 304:
+                return None
+            response_content = await response.read()
+            self.thing_validator = response.headers.get('Etag')
+
+        return multi_loads(response_content)
 
 
 
@@ -193,27 +488,22 @@ class URLDevice(PollDevice):
             Performs requests through an aiohttp-client.
             Intended to communicate between the add-on and a Thing.
         """
-        async def request():
-            _session = aiohttp.ClientSession()
-            response = None
+        return self.run_sync(self.async_aiohttp_request(method, url, headers = headers, data = data))
+
+
 
-            if method == 'GET':
-                response = await _session.get(url)
-            elif method == 'PUT':
-                response = await _session.put(url, headers = headers, data = data)
-            elif method == 'POST':
-                response = await _session.post(url, headers = headers, data = data)
+    async def async_aiohttp_request(self, method, url, headers = None, data = None):
+        # NOTE: the session is pooled by the adapter, do not close it here.
+        _session = self.adapter.http_pool.session()
 
+        async with _session.request(method, url, headers = headers, data = data) as response:
             try:
                 response_content = await response.read()
             except Exception:
                 response_content = b''
 
-            await _session.close()
+        return multi_loads(response_content)
 
-            return multi_loads(response_content)
-
-        return asyncio.new_event_loop().run_until_complete(request())
 
 
 
@@ -225,7 +515,7 @@ class AceURLDevice(PollDevice):
     def __init__(self, adapter, _id, url):
 
         super().__init__(adapter, _id)
-        print(BLUE + 'AceThingURLDevice().__init__()' + ENDC)
+        _LOGGER.debug('AceThingURLDevice().__init__()')
         self.url = url
 
         self.ace_session = self.request_acess_token()
@@ -241,7 +531,7 @@ class AceURLDevice(PollDevice):
             Gets Property from Self, thus from Device, thus without querying the real Thing
         """
         # TODO this is never used, set this to be used in amproxy, better even find how others use it.
-        print(WARNING + 'ace_adapter.device.GET_property: ' + property_name + ENDC)
+        _LOGGER.debug('GET_property: %s', property_name)
         super().get_property(property_name = property_name)
 
 
@@ -251,16 +541,14 @@ class AceURLDevice(PollDevice):
         """
             Sets a property via ACE HTTP client.
         """
-        print(WARNING + 'ace_adapter.device.SET_property: ' + property_name + ' to ' + str(value) + ENDC)
+        _LOGGER.debug('SET_property: %s to %s', property_name, value)
         prop = self.find_property(property_name)
         if not prop:
             return
 
         async def request(ace_session, url):
             # TODO
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
+            client = self.adapter.http_pool.ace_client()
             data = cbor2.dumps({bytes(property_name, 'utf-8'): value})
             response = await client.post_resource(session = ace_session,
                                                   rs_url = url,
@@ -269,9 +557,9 @@ class AceURLDevice(PollDevice):
             return response
 
         try:
-            asyncio.new_event_loop().run_until_complete(request(self.ace_session, self.url))
+            self.run_sync(request(self.ace_session, self.url))
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
+            _LOGGER.error('%s', e)
         else:
             prop.set_value(value)
 
@@ -281,7 +569,7 @@ class AceURLDevice(PollDevice):
         """
         This Overwrite is required because Parent would call its own *perform_action()* which is *pass*.
         """
-        print(FAIL + 'INFO action is being requested' + ENDC)
+        _LOGGER.info('Action is being requested.')
         if action_name not in self.actions:
             return
 
@@ -292,18 +580,14 @@ class AceURLDevice(PollDevice):
                 validate(action_input, metadata['input'])
             except ValidationError:
                 return
-        print(FAIL + 'action_id' + str(action_id) + ENDC)
-        print(FAIL + 'action_name' + str(action_name) + ENDC)
-        print(FAIL + 'action_input' + str(action_input) + ENDC)
+        _LOGGER.debug('action_id: %s action_name: %s action_input: %s', action_id, action_name, action_input)
         action = Action(action_id, self, action_name, action_input)
         self.perform_action(action)
 
     def perform_action(self, action):
-        print(FAIL + 'INFO action is being performed' + ENDC)
+        _LOGGER.info('Action is being performed.')
         async def request(ace_session, url):
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
+            client = self.adapter.http_pool.ace_client()
             data = cbor2.dumps({bytes(action.name, 'utf-8'): {'input': action.input}})
             response = await client.post_resource(session = ace_session,
                                                   rs_url = url,
@@ -312,57 +596,21 @@ class AceURLDevice(PollDevice):
             return response
 
         try:
-            asyncio.new_event_loop().run_until_complete(request(self.ace_session, self.url))
+            self.run_sync(request(self.ace_session, self.url))
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
-
-
+            _LOGGER.error('%s', e)
 
 
 
-    def update(self):
-
-        async def request_thing(ace_session, url):
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
-            thing_response = await client.access_resource(session = ace_session,
-                                                          rs_url = url,
-                                                          endpoint = '/')
-            return multi_loads(thing_response)
 
 
+    async def fetch(self, endpoint):
+        client = self.adapter.http_pool.ace_client()
+        response = await client.access_resource(session = self.ace_session,
+                                                rs_url = self.url,
+                                                endpoint = endpoint)
+        return multi_loads(response)
 
-        async def request_properties(ace_session, url):
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
-            properties_response = await client.access_resource(session = ace_session,
-                                                               rs_url = url,
-                                                               endpoint = '/properties')
-            return multi_loads(properties_response)
-
-
-
-        async def request_events(ace_session, url):
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
-            events_response = await client.access_resource(session = ace_session,
-                                                           rs_url = url,
-                                                           endpoint = '/events')
-            return multi_loads(events_response)
-
-
-        thing_state = asyncio.new_event_loop().run_until_complete(request_thing(self.ace_session, self.url))
-        properties_state = asyncio.new_event_loop().run_until_complete(request_properties(self.ace_session, self.url))
-        events_state = asyncio.new_event_loop().run_until_complete(request_events(self.ace_session, self.url))
-
-        self.name = thing_state['name']
-        self.description = thing_state['description']
-        self.properties_update(thing_state, properties_state)
-        self.actions.update(thing_state['actions'])
-        self.events_update(events_state)
 
 
 
@@ -370,9 +618,7 @@ class AceURLDevice(PollDevice):
     def request_acess_token(self):
 
         async def request():
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
+            client = self.adapter.http_pool.ace_client()
 
             ace_session = await client.request_access_token(as_url = AS_URL,
                                                             audience = AUDIENCE,
@@ -380,7 +626,7 @@ class AceURLDevice(PollDevice):
                                                             )
             return ace_session
 
-        return asyncio.new_event_loop().run_until_complete(request())
+        return self.run_sync(request())
 
 
 
@@ -388,28 +634,36 @@ class AceURLDevice(PollDevice):
     def upload_access_token(self):
 
         async def request(ace_session, url):
-            client = HTTPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET
-                                )
+            client = self.adapter.http_pool.ace_client()
 
             await client.upload_access_token(session = ace_session,
                                              rs_url = url,
                                              endpoint = '/authz-info')
 
 
-        asyncio.new_event_loop().run_until_complete(request(self.ace_session, self.url))
+        self.run_sync(request(self.ace_session, self.url))
 
 
 
 
 class CoapAceURLDevice(PollDevice):
+    """
+    With *COAP_OBSERVE* the Thing's `/properties` and `/events/<name>` are observed, see `ObserveSubscription`,
+    and their notifications feed `properties_update()` and `events_update()`.
+    Polling then only revalidates the Thing Description, and takes over the endpoints which are not observable.
+    """
 
+    # NOTE: see CoapWebThingServer, ('',) results in 404.
+    thing_endpoint = '/ '
 
     def __init__(self, adapter, _id, url):
 
         super().__init__(adapter, _id)
-        print(BLUE + 'AceThingURLDevice().__init__()' + ENDC)
+        _LOGGER.debug('AceThingURLDevice().__init__()')
         self.url = url
+        self.subscription = None
+        self._renewal = None
+        self._renewed_at = None
 
         self.ace_session = self.request_acess_token()
         self.upload_access_token()
@@ -425,7 +679,7 @@ class CoapAceURLDevice(PollDevice):
             Gets Property from Self, thus from Device, thus without querying the real Thing
         """
         # TODO this is never used, set this to be used in amproxy, better even find how others use it.
-        print(WARNING + 'ace_adapter.device.GET_property: ' + property_name + ENDC)
+        _LOGGER.debug('GET_property: %s', property_name)
         super().get_property(property_name = property_name)
 
 
@@ -438,17 +692,13 @@ class CoapAceURLDevice(PollDevice):
         property_name -- name of the property to set
         value -- value to set
         """
-        print(WARNING + 'ace_adapter.device.SET_property: ' + property_name + ' to ' + str(value) + ENDC)
+        _LOGGER.debug('SET_property: %s to %s', property_name, value)
         prop = self.find_property(property_name)
         if not prop:
             return
 
         async def request(ace_session, url):
-            protocol = await Context.create_client_context()
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
+            client = await self.adapter.coap_context.client()
             data = cbor2.dumps({property_name: value})
             response = await client.post_resource(session = ace_session,
                                                   rs_url = url,
@@ -458,9 +708,9 @@ class CoapAceURLDevice(PollDevice):
 
         # TODO adjust for multipleThings
         try:
-            asyncio.new_event_loop().run_until_complete(request(self.ace_session, self.url))
+            self.run_sync(request(self.ace_session, self.url))
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
+            _LOGGER.error('%s', e)
         else:
             prop.set_value(value)
 
@@ -469,7 +719,7 @@ class CoapAceURLDevice(PollDevice):
         """
         This Overwrite is required because Parent would call its own *perform_action()* which is *pass*.
         """
-        print(FAIL + 'INFO action is being requested' + ENDC)
+        _LOGGER.info('Action is being requested.')
         if action_name not in self.actions:
             return
 
@@ -480,20 +730,14 @@ class CoapAceURLDevice(PollDevice):
                 validate(action_input, metadata['input'])
             except ValidationError:
                 return
-        print(FAIL + 'action_id' + str(action_id) + ENDC)
-        print(FAIL + 'action_name' + str(action_name) + ENDC)
-        print(FAIL + 'action_input' + str(action_input) + ENDC)
+        _LOGGER.debug('action_id: %s action_name: %s action_input: %s', action_id, action_name, action_input)
         action = Action(action_id, self, action_name, action_input)
         self.perform_action(action)
 
     def perform_action(self, action):
-        print(FAIL + 'INFO action is being performed' + ENDC)
+        _LOGGER.info('Action is being performed.')
         async def request(ace_session, url):
-            protocol = await Context.create_client_context()
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
+            client = await self.adapter.coap_context.client()
             data = cbor2.dumps({action.name: {'input': action.input}})
             response = await client.post_resource(session = ace_session,
                                                   rs_url = url,
@@ -502,9 +746,9 @@ class CoapAceURLDevice(PollDevice):
             return response
 
         try:
-            asyncio.new_event_loop().run_until_complete(request(self.ace_session, self.url))
+            self.run_sync(request(self.ace_session, self.url))
         except Exception as e:
-            print(FAIL + str(e) + ENDC)
+            _LOGGER.error('%s', e)
 
 
 
@@ -517,89 +761,114 @@ class CoapAceURLDevice(PollDevice):
 
 
 
-    def update(self):
+    async def fetch(self, endpoint):
+        client = await self.adapter.coap_context.client()
+        response = await client.access_resource(session = self.ace_session,
+                                                rs_url = self.url,
+                                                endpoint = endpoint)
+        return multi_loads(response)
 
 
-        async def request_thing(ace_session):
-            protocol = await Context.create_client_context()
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
-            thing_response = await client.access_resource(session = ace_session,
-                                                       rs_url = self.url,
-                                                       endpoint = '/ ')
-            return multi_loads(thing_response[0])
-
-        async def request_properties(ace_session):
-            protocol = await Context.create_client_context()
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
-            properties_response = await client.access_resource(session = ace_session,
-                                                            rs_url = self.url,
-                                                            endpoint = '/properties')
-            return multi_loads(properties_response)
-
-        async def request_events(ace_session):
-            protocol = await Context.create_client_context()
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
-            events_response = await client.access_resource(session = ace_session,
-                                                        rs_url = self.url,
-                                                        endpoint = '/events')
-            return multi_loads(events_response)
-
-
-        thing_state = asyncio.new_event_loop().run_until_complete(request_thing(self.ace_session))
-        properties_state = asyncio.new_event_loop().run_until_complete(request_properties(self.ace_session))
-        events_state = asyncio.new_event_loop().run_until_complete(request_events(self.ace_session))
+    async def fetch_thing(self):
+        client = await self.adapter.coap_context.client()
+        thing_response = await client.access_resource(session = self.ace_session,
+                                                      rs_url = self.url,
+                                                      endpoint = self.thing_endpoint)
+        return multi_loads(thing_response[0])
 
 
-        self.name = thing_state['name']
-        self.description = thing_state['description']
-        self.properties_update(thing_state, properties_state)
-        self.actions.update(thing_state['actions'])
-        self.events_update(events_state)
+    def thing_update(self, thing_state):
+        super().thing_update(thing_state)
+        if self.subscription is not None:
+            # Events which the Thing Description gained.
+            self.subscription.start(self.observable_endpoints())
 
 
+    def start_subscription(self):
+        if not COAP_OBSERVE or self.subscription is not None:
+            return
+        self.subscription = ObserveSubscription(self, self.adapter.loop_thread.loop)
+        self.subscription.start(self.observable_endpoints())
 
-    def request_acess_token(self):
 
-        async def request():
-            protocol = await Context.create_client_context()
+    def stop_subscription(self):
+        if self.subscription is not None:
+            self.subscription.stop()
+            self.subscription = None
 
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
 
-            ace_session = await client.request_access_token(as_url = AS_URL,
-                                                            audience = AUDIENCE,
-                                                            scopes = SCOPES
-                                                            )
-            return ace_session
+    def observable_endpoints(self):
+        return ['/properties'] + ['/events/' + event_name for event_name in self.event_names()]
 
-        return asyncio.new_event_loop().run_until_complete(request())
 
+    def is_observed(self, endpoint):
+        """
+        `/events` is not observable itself, it counts as observed while all `/events/<name>` are.
+        """
+        if self.subscription is None:
+            return False
+        if endpoint == '/events':
+            return all(self.subscription.is_observed('/events/' + event_name) for event_name in self.event_names())
+        return self.subscription.is_observed(endpoint)
 
 
+    def observe(self, endpoint):
+        return self.adapter.coap_context.observe(self.ace_session, self.url, endpoint)
 
-    def upload_access_token(self):
 
-        async def request(ace_session):
-            protocol = await Context.create_client_context()
+    def on_notification(self, endpoint, state):
+        """
+        `/properties` notifies with the properties which changed, `/events/<name>` with the new events.
+        """
+        if endpoint == '/properties':
+            if isinstance(state, dict) and self.thing_state is not None:
+                self.properties_update(self.thing_state, state)
+        elif isinstance(state, list):
+            self.events_update(state)
 
-            client = CoAPClient(client_id = CLIENT_ID,
-                                client_secret = CLIENT_SECRET,
-                                protocol = protocol
-                                )
 
-            await client.upload_access_token(session = ace_session,
-                                             rs_url = self.url,
-                                             endpoint = '/authz-info')
+    async def async_renew_session(self):
+        """
+        Request and upload a new access token, e.g. after the old one expired.
+        Observations which call this at the same time, or shortly after each other, share one renewal.
+        """
+        loop = asyncio.get_event_loop()
+        if self._renewal is None or self._renewal.done():
+            if self._renewed_at is not None and loop.time() - self._renewed_at < _RENEW_INTERVAL:
+                return
+            self._renewal = asyncio.ensure_future(self._renew_session())
+        await asyncio.shield(self._renewal)
+
+
+    async def _renew_session(self):
+        ace_session = await self.async_request_access_token()
+        await self.async_upload_access_token(ace_session)
+        self.ace_session = ace_session
+        self._renewed_at = asyncio.get_event_loop().time()
+        _LOGGER.info('ACE session of %s was renewed.', self.id)
 
-        asyncio.new_event_loop().run_until_complete(request(self.ace_session))
+
+    async def async_request_access_token(self):
+        client = await self.adapter.coap_context.client()
+
+        ace_session = await client.request_access_token(as_url = AS_URL,
+                                                        audience = AUDIENCE,
+                                                        scopes = SCOPES
+                                                        )
+        return ace_session
+
+
+    async def async_upload_access_token(self, ace_session):
+        client = await self.adapter.coap_context.client()
+
+        await client.upload_access_token(session = ace_session,
+                                         rs_url = self.url,
+                                         endpoint = '/authz-info')
+
+
+    def request_acess_token(self):
+        return self.run_sync(self.async_request_access_token())
+
+
+    def upload_access_token(self):
+        self.run_sync(self.async_upload_access_token(self.ace_session))
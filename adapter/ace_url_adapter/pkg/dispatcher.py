@@ -0,0 +1,110 @@
+import collections
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAX_WORKERS = 8
+_MAX_PENDING = 256
+
+
+class OrderedDispatcher:
+    """
+    Runs the handlers of incoming IPC messages on a bounded pool of worker threads.
+    + Handlers with the same *key* (a device id) run one after the other, in the order they were submitted.
+    + Handlers with different keys, or with key None, run in parallel.
+    + At most *max_pending* handlers may be queued or running, `submit()` blocks beyond that (backpressure).
+      Callers which must not block, e.g. the adapter's event loop, pass `block = False` and overflow instead.
+    + `stats` and `queue_depths()` show how far the handlers lag behind.
+    """
+
+    def __init__(self, max_workers = _MAX_WORKERS, max_pending = _MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats = {'submitted'  : 0,
+                      'completed'  : 0,
+                      'failed'     : 0,
+                      'pending'    : 0,
+                      'max_pending': 0,
+                      'blocked'    : 0,
+                      'overflow'   : 0,
+                      }
+        self._executor = ThreadPoolExecutor(max_workers = max_workers)
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        # key -> deque of (target, args, holds_slot), present while a worker drains that key
+        self._queues = {}
+
+    def submit(self, key, target, args = (), block = True):
+        """
+        Queue *target(\\*args)*. Blocks while *max_pending* handlers are pending.
+
+        key -- handlers with equal keys keep their order, None for unordered
+        block -- if False, queue beyond *max_pending* instead of blocking
+        """
+        holds_slot = self._slots.acquire(blocking = False)
+        if not holds_slot:
+            with self._lock:
+                if block:
+                    self.stats['blocked'] += 1
+                else:
+                    self.stats['overflow'] += 1
+            if block:
+                self._slots.acquire()
+                holds_slot = True
+
+        with self._lock:
+            self.stats['submitted'] += 1
+            self.stats['pending'] += 1
+            self.stats['max_pending'] = max(self.stats['max_pending'], self.stats['pending'])
+
+            if key is None:
+                self._executor.submit(self._run, target, args, holds_slot)
+                return
+
+            queue = self._queues.get(key)
+            if queue is not None:
+                # A worker is already draining this key, it will pick this up.
+                queue.append((target, args, holds_slot))
+                return
+            self._queues[key] = collections.deque([(target, args, holds_slot)])
+
+        self._executor.submit(self._drain, key)
+
+    def queue_depths(self):
+        """
+        Returns { key : number of handlers waiting } for every key with waiting handlers.
+        """
+        with self._lock:
+            return {key: len(queue) for key, queue in self._queues.items() if queue}
+
+    def shutdown(self, wait = False):
+        self._executor.shutdown(wait = wait)
+
+    def _drain(self, key):
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                target, args, holds_slot = queue.popleft()
+            self._run(target, args, holds_slot)
+
+    def _run(self, target, args, holds_slot):
+        failed = False
+        try:
+            target(*args)
+        except Exception:
+            failed = True
+            _LOGGER.exception('OrderedDispatcher: handler failed.')
+        finally:
+            with self._lock:
+                self.stats['pending'] -= 1
+                self.stats['completed'] += 1
+                if failed:
+                    self.stats['failed'] += 1
+            if holds_slot:
+                self._slots.release()
@@ -0,0 +1,82 @@
+import aiohttp
+
+from ace.client.http import HTTPClient
+
+# imports parameters.py
+from pkg.parameters import *
+
+
+_POOL_LIMIT = 100
+_POOL_LIMIT_PER_HOST = 4
+_KEEPALIVE_TIMEOUT = 30
+
+
+class HTTPConnectionPool:
+    """
+    Keep-alive HTTP connections shared by all HTTP devices of one adapter.
+    + `session()` is the pooled *aiohttp.ClientSession* used by *URLDevice*.
+    + `ace_client()` is the one *HTTPClient* used by every *AceURLDevice*.
+    + `stats` counts requests and how many of them reused an open connection.
+    NOTE: Must only be used from the adapter's event loop, the session is bound to it.
+    """
+
+    def __init__(self,
+                 limit = _POOL_LIMIT,
+                 limit_per_host = _POOL_LIMIT_PER_HOST,
+                 keepalive_timeout = _KEEPALIVE_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.stats = {'requests'            : 0,
+                      'connections_created' : 0,
+                      'connections_reused'  : 0,
+                      }
+        self._session = None
+        self._ace_client = None
+
+    def session(self):
+        """
+        Get the pooled session, create it on first use.
+        """
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._count('requests'))
+            trace_config.on_connection_create_end.append(self._count('connections_created'))
+            trace_config.on_connection_reuseconn.append(self._count('connections_reused'))
+
+            connector = aiohttp.TCPConnector(limit = self.limit,
+                                             limit_per_host = self.limit_per_host,
+                                             keepalive_timeout = self.keepalive_timeout)
+            self._session = aiohttp.ClientSession(connector = connector,
+                                                  trace_configs = [trace_config])
+        return self._session
+
+    def ace_client(self):
+        """
+        Get the shared ACE HTTP client, create it on first use.
+        """
+        if self._ace_client is None:
+            self._ace_client = HTTPClient(client_id = CLIENT_ID,
+                                          client_secret = CLIENT_SECRET
+                                          )
+        return self._ace_client
+
+    def reuse_ratio(self):
+        """
+        :return: share of requests which were served by an already open connection.
+        """
+        if not self.stats['requests']:
+            return 0.0
+        return self.stats['connections_reused'] / self.stats['requests']
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._ace_client = None
+
+    def _count(self, key):
+        async def on_signal(session, trace_config_ctx, params):
+            self.stats[key] += 1
+
+        return on_signal
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+
+from aiocoap.numbers.codes import Code
+
+_LOGGER = logging.getLogger(__name__)
+
+_RETRY_DELAY = 1
+_MAX_RETRY_DELAY = 60
+_RENEW_AFTER_FAILURES = 3
+
+
+class ObserveNotOffered(Exception):
+    """ The resource answered a registration without the Observe option. """
+
+
+class ObservationEnded(Exception):
+    """ The server ended an observation with an unsuccessful response, e.g. 4.01 once the token expired. """
+
+    def __init__(self, code):
+        super().__init__(str(code))
+        self.code = code
+
+
+class ObserveSubscription:
+    """
+    Keeps CoAP Observe registrations of one device alive, instead of polling its endpoints.
+    + Every endpoint is observed by its own task on the adapter's loop, see `device.observe()`.
+      Each state it yields, the first one as well as every notification, goes to `device.on_notification()`.
+    + An observation which the server ends is registered again. After a failure this is delayed,
+      doubling from *retry_delay* up to *max_retry_delay*.
+    + 4.01, or *renew_after* failures in a row, mean the token expired or the RS lost its security state,
+      thus `device.async_renew_session()` runs before the next registration.
+    + Endpoints which are not observable are left to polling, see `observed`.
+    `start()` and `stop()` may be called from any thread.
+    """
+
+    def __init__(self, device, loop,
+                 retry_delay = _RETRY_DELAY,
+                 max_retry_delay = _MAX_RETRY_DELAY,
+                 renew_after = _RENEW_AFTER_FAILURES):
+        self.device = device
+        self.loop = loop
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.renew_after = renew_after
+        # Endpoints whose observation delivered its first state and was not refused since.
+        self.observed = set()
+        self.not_offered = set()
+        self.stats = {'registrations': 0,
+                      'notifications': 0,
+                      'renewals'     : 0,
+                      'failures'     : 0,
+                      }
+        # Only touched on the loop.
+        self._tasks = {}
+
+    def start(self, endpoints):
+        """ Observe *endpoints*. """
+        self.loop.call_soon_threadsafe(self._start, list(endpoints))
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stop)
+
+    def is_observed(self, endpoint):
+        return endpoint in self.observed
+
+    def _start(self, endpoints):
+        for endpoint in endpoints:
+            if endpoint not in self._tasks and endpoint not in self.not_offered:
+                self._tasks[endpoint] = self.loop.create_task(self._keep(endpoint))
+
+    def _stop(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks = {}
+        self.observed.clear()
+
+    async def _keep(self, endpoint):
+        delay = self.retry_delay
+        failures = 0
+        while True:
+            renew = False
+            try:
+                self.stats['registrations'] += 1
+                observation = self.device.observe(endpoint)
+                try:
+                    async for state in observation:
+                        self.observed.add(endpoint)
+                        self.stats['notifications'] += 1
+                        failures = 0
+                        delay = self.retry_delay
+                        self.device.on_notification(endpoint, state)
+                finally:
+                    # Cancels the registration right away, before the next one is made.
+                    await observation.aclose()
+                _LOGGER.debug('Observation of %s%s ended, registering again.', self.device.id, endpoint)
+                self.observed.discard(endpoint)
+                await asyncio.sleep(self.retry_delay)
+                continue
+            except asyncio.CancelledError:
+                raise
+            except ObserveNotOffered:
+                _LOGGER.info('%s%s is not observable, it is polled.', self.device.id, endpoint)
+                self.observed.discard(endpoint)
+                self.not_offered.add(endpoint)
+                del self._tasks[endpoint]
+                return
+            except ObservationEnded as e:
+                renew = e.code == Code.UNAUTHORIZED
+                failures += 1
+                self.stats['failures'] += 1
+            except Exception as e:
+                failures += 1
+                self.stats['failures'] += 1
+                _LOGGER.info('Observing %s%s failed:  %s', self.device.id, endpoint, e)
+
+            self.observed.discard(endpoint)
+            if renew or failures % self.renew_after == 0:
+                try:
+                    self.stats['renewals'] += 1
+                    await self.device.async_renew_session()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    _LOGGER.info('Renewing the ACE session of %s failed:  %s', self.device.id, e)
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
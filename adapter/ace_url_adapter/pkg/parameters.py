@@ -114,6 +114,15 @@ SCOPES = ['GET /',
 ADAPTER_CLIENT_ID = 'adapter_ace_client_id'
 ADAPTER_CLIENT_SECRET = b'adapter_ace_client_1_secret_123456'
 
+# Observe the properties and events of ACE CoAP Things instead of polling them, see `pkg/observe.py`.
+COAP_OBSERVE = True
+# Keep a WebSocket to plain WebThingServers instead of polling them, see `pkg/websocket_subscription.py`.
+WEBSOCKET_SUBSCRIPTION = True
+# Seconds between two polls of an endpoint: the initial interval, and the bounds it adapts within, see `pkg/poll_scheduler.py`.
+POLL_INTERVAL = 5
+POLL_FLOOR = 5
+POLL_CEILING = 60
+
 
 
 
@@ -0,0 +1,177 @@
+import asyncio
+import heapq
+import logging
+import random
+
+# imports parameters.py
+from pkg.parameters import *
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAX_CONCURRENT_POLLS = 16
+_JITTER = 0.1
+
+
+class AdaptiveInterval:
+    """
+    Polling interval of one device, adapted to what its polls observe.
+    + A poll that saw changes halves the interval.
+    + A poll without changes stretches it by *backoff*.
+    + A failed poll doubles it, so unreachable devices are not hammered.
+    The interval always stays within [*floor*, *ceiling*].
+    """
+
+    def __init__(self, initial, floor = POLL_FLOOR, ceiling = POLL_CEILING, backoff = 1.25):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.backoff = backoff
+        self.value = self._clamp(initial)
+        self.polls = 0
+        self.changes = 0
+        self.failures = 0
+
+    def on_success(self, changes):
+        self.polls += 1
+        if changes:
+            self.changes += 1
+            self.value = self._clamp(self.value / 2)
+        else:
+            self.value = self._clamp(self.value * self.backoff)
+
+    def on_failure(self):
+        self.polls += 1
+        self.failures += 1
+        self.value = self._clamp(self.value * 2)
+
+    def _clamp(self, value):
+        return max(self.floor, min(self.ceiling, value))
+
+
+class PollScheduler:
+    """
+    Polls all devices of one adapter from the adapter's event loop, instead of one thread per device.
+    + Due times are kept in a heap, a single task sleeps until the next one is due.
+    + Polls run as coroutines (`device.async_update()`), at most *max_concurrent* at once.
+    + Every device has its own AdaptiveInterval within [*floor*, *ceiling*].
+      It starts at *interval*, or at four times that for devices without sensors (see `PollDevice.has_sensors()`).
+    + The first poll of a device is delayed by a random share of its interval,
+      later ones by its interval +/- *jitter*, so that devices do not all poll at once.
+    + `remove()` cancels a running poll right away.
+    `add()`, `remove()`, `start()` and `stop()` may be called from any thread.
+    """
+
+    def __init__(self, loop,
+                 interval = POLL_INTERVAL,
+                 floor = POLL_FLOOR,
+                 ceiling = POLL_CEILING,
+                 max_concurrent = _MAX_CONCURRENT_POLLS,
+                 jitter = _JITTER):
+        self.loop = loop
+        self.interval = interval
+        self.floor = floor
+        self.ceiling = ceiling
+        self.max_concurrent = max_concurrent
+        self.jitter = jitter
+
+        # Only touched on the loop.
+        self._heap = []
+        self._devices = {}
+        self._intervals = {}
+        self._polls = {}
+        self._seq = 0
+        self._task = None
+        self._wakeup = None
+        self._semaphore = None
+
+    def start(self):
+        self.loop.call_soon_threadsafe(self._start)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stop)
+
+    def add(self, device):
+        """ Start polling *device*. """
+        self.loop.call_soon_threadsafe(self._add, device)
+
+    def remove(self, device_id):
+        """ Stop polling the device, cancel its poll if one is running. """
+        self.loop.call_soon_threadsafe(self._remove, device_id)
+
+    def get_interval(self, device_id):
+        """
+        :return: the AdaptiveInterval of the device, or None. Read-only use from other threads.
+        """
+        return self._intervals.get(device_id)
+
+    def _start(self):
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._task = self.loop.create_task(self._run())
+
+    def _stop(self):
+        for device_id in list(self._devices):
+            self._remove(device_id)
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _add(self, device):
+        self._remove(device.id)
+        self._devices[device.id] = device
+        initial = self.interval if device.has_sensors() else self.interval * 4
+        self._intervals[device.id] = AdaptiveInterval(initial, floor = self.floor, ceiling = self.ceiling)
+        self._schedule(device, random.uniform(0, self._intervals[device.id].value))
+
+    def _remove(self, device_id):
+        self._devices.pop(device_id, None)
+        self._intervals.pop(device_id, None)
+        task = self._polls.pop(device_id, None)
+        if task is not None:
+            task.cancel()
+        # Heap entries of removed devices are skipped when they come up.
+
+    def _schedule(self, device, delay):
+        self._seq += 1
+        heapq.heappush(self._heap, (self.loop.time() + delay, self._seq, device.id, device))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _next_delay(self, device):
+        return self._intervals[device.id].value * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run(self):
+        while True:
+            now = self.loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, _, device_id, device = heapq.heappop(self._heap)
+                # Skip if removed, re-added or still busy with the previous poll.
+                if self._devices.get(device_id) is not device or device_id in self._polls:
+                    continue
+                self._polls[device_id] = self.loop.create_task(self._poll(device))
+
+            timeout = self._heap[0][0] - now if self._heap else None
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _poll(self, device):
+        try:
+            async with self._semaphore:
+                changes = await device.async_update()
+            self._intervals[device.id].on_success(changes)
+            _LOGGER.debug('Device : %s was polled.', device.name)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if device.id in self._intervals:
+                self._intervals[device.id].on_failure()
+            _LOGGER.info('Polling %s failed:  %s', device.id, e)
+        finally:
+            if self._polls.get(device.id) is asyncio.current_task():
+                del self._polls[device.id]
+                if self._devices.get(device.id) is device:
+                    self._schedule(device, self._next_delay(device))
@@ -1,8 +1,13 @@
+import logging
+
 from gateway_addon import Property
 # imports parameters.py
 from pkg.parameters import *
 
 
+_LOGGER = logging.getLogger(__name__)
+
+
 class AceProperty(Property):
 
 
@@ -13,7 +18,7 @@ class AceProperty(Property):
         :param description: The description of this property, as a dictionary.
         :param value: The current value of this property.
         '''
-        print(BLUE + 'AceProperty().__init__()'+ENDC)
+        _LOGGER.debug('AceProperty().__init__()')
         super().__init__(device, name, description)
 
         self.value = value
@@ -22,13 +27,16 @@ class AceProperty(Property):
 
     def update(self, value):
         """
-                Update the current value, if necessary.
+        Update the current value, if necessary.
+        The notification is sent by the device, batched per poll.
 
-                light_state -- current state of the light
-                """
+        value -- current value of the property on the Thing
+        :return: True if the value changed.
+        """
+        if self.value == value:
+            return False
 
-        self.value =value
-        manager_proxy = self.device.adapter.manager_proxy
-        manager_proxy.send_property_changed_notification(self)
+        self.value = value
+        return True
 
 
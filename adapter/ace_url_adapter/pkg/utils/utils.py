@@ -1,4 +1,6 @@
 """Utility functions."""
+import asyncio
+import concurrent.futures
 import json
 
 import cbor2
@@ -6,19 +8,71 @@ import cbor2
 
 import threading
 
-class StoppableThread(threading.Thread):
-    """Thread class with a stop() method. The thread itself has to check
-    regularly for the stopped() condition."""
 
-    def __init__(self, target = None):
-        super(StoppableThread, self).__init__(target= target)
-        self._stop_event = threading.Event()
+class EventLoopThread(threading.Thread):
+    """
+    Thread which owns one long-lived asyncio event loop.
+    Other threads hand coroutines to it via *submit()* or *run_sync()*,
+    instead of creating (and leaking) a new event loop per request.
+    """
 
-    def stop(self):
-        self._stop_event.set()
+    def __init__(self, name = 'EventLoopThread'):
+        super().__init__(name = name)
+        self.daemon = True
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
 
-    def stopped(self):
-        return self._stop_event.is_set()
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        try:
+            self.loop.run_forever()
+        finally:
+            self._cancel_pending()
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+            self.loop.close()
+
+    def start(self):
+        """ Start the thread and wait until its loop is running. """
+        super().start()
+        self._ready.wait()
+
+    def stop(self, timeout = None):
+        """ Stop the loop, cancel whatever is still pending and join the thread. """
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if threading.current_thread() is not self:
+            self.join(timeout)
+
+    def submit(self, coro):
+        """
+        Schedule *coro* on the loop from any thread.
+        :return: concurrent.futures.Future of the result.
+        """
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run_sync(self, coro, timeout = None):
+        """
+        Sync bridge: run *coro* on the loop and block the calling thread until it returns.
+        The coroutine is cancelled if *timeout* expires.
+        """
+        if threading.current_thread() is self:
+            coro.close()
+            raise RuntimeError('run_sync() would block its own event loop.')
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _cancel_pending(self):
+        pending = asyncio.all_tasks(self.loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions = True))
 
 
 
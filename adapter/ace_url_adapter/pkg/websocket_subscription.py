@@ -0,0 +1,134 @@
+import asyncio
+import json
+import logging
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+_RETRY_DELAY = 1
+_MAX_RETRY_DELAY = 60
+_HEARTBEAT = 30
+
+
+class WebSocketSubscription:
+    """
+    Keeps one WebSocket to a plain WebThingServer open for one device, instead of polling its endpoints.
+    + After connecting, every event of `device.event_names()` is subscribed with `addEventSubscription`,
+      then `device.resync()` fetches what changed while the socket was closed.
+    + Every message the thing pushes, i.e. `propertyStatus`, `event`, `actionStatus` or `error`,
+      goes to `device.on_message()`.
+    + `send()` writes `setProperty` or `requestAction` messages to the same socket.
+    + A closed or failed socket is reconnected, the delay doubling from *retry_delay* up to *max_retry_delay*.
+      While it is down, `connected` is False and the device polls again.
+    `start()` and `stop()` may be called from any thread.
+    """
+
+    def __init__(self, device, loop, session,
+                 retry_delay = _RETRY_DELAY,
+                 max_retry_delay = _MAX_RETRY_DELAY,
+                 heartbeat = _HEARTBEAT):
+        """
+        :param session: callable returning the *aiohttp.ClientSession* to connect with, e.g. `HTTPConnectionPool.session`.
+        """
+        self.device = device
+        self.loop = loop
+        self.session = session
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.heartbeat = heartbeat
+        self.connected = False
+        self.stats = {'connects': 0,
+                      'messages': 0,
+                      'sent'    : 0,
+                      'failures': 0,
+                      }
+        # Only touched on the loop.
+        self._task = None
+        self._ws = None
+
+    def start(self):
+        self.loop.call_soon_threadsafe(self._start)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stop)
+
+    async def send(self, message_type, data):
+        """
+        Send a message over the open socket. Call on the loop.\n
+        :return: False if the socket is not connected, the caller may fall back to HTTP then.
+        """
+        if not self.connected or self._ws is None or self._ws.closed:
+            return False
+        try:
+            await self._ws.send_str(json.dumps({'messageType': message_type,
+                                                'data'       : data,
+                                                }))
+        except (aiohttp.ClientError, ConnectionError, RuntimeError) as e:
+            _LOGGER.info('Sending %s to %s failed:  %s', message_type, self.device.id, e)
+            return False
+        self.stats['sent'] += 1
+        return True
+
+    def subscribe_events(self):
+        """
+        Subscribe the events of `device.event_names()` on the open socket, e.g. after the Thing Description changed.
+        Call on the loop.
+        """
+        if self.connected and self._ws is not None:
+            self.loop.create_task(self._subscribe(self._ws))
+
+    def _start(self):
+        if self._task is None:
+            self._task = self.loop.create_task(self._keep())
+
+    def _stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.connected = False
+
+    async def _keep(self):
+        delay = self.retry_delay
+        while True:
+            try:
+                async with self.session().ws_connect(self.device.ws_url(), heartbeat = self.heartbeat) as ws:
+                    self._ws = ws
+                    self.stats['connects'] += 1
+                    await self._subscribe(ws)
+                    self.connected = True
+                    delay = self.retry_delay
+                    await self.device.resync()
+                    async for message in ws:
+                        if message.type == aiohttp.WSMsgType.TEXT:
+                            self.stats['messages'] += 1
+                            self._dispatch(message.data)
+                        elif message.type == aiohttp.WSMsgType.ERROR:
+                            break
+                _LOGGER.debug('WebSocket of %s was closed, connecting again.', self.device.id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['failures'] += 1
+                _LOGGER.info('WebSocket of %s failed:  %s', self.device.id, e)
+            finally:
+                self.connected = False
+                self._ws = None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_retry_delay)
+
+    async def _subscribe(self, ws):
+        # NOTE: the server keeps one subscription per event and socket, thus subscribing again is harmless.
+        event_names = self.device.event_names()
+        if event_names and not ws.closed:
+            await ws.send_str(json.dumps({'messageType': 'addEventSubscription',
+                                          'data'       : {event_name: {} for event_name in event_names},
+                                          }))
+
+    def _dispatch(self, data):
+        try:
+            message = json.loads(data)
+            self.device.on_message(message['messageType'], message['data'])
+        except Exception:
+            _LOGGER.exception('Message of %s could not be applied: %s', self.device.id, data)
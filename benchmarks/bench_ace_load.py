@@ -0,0 +1,248 @@
+"""
+Load generator for the ACE resource servers.
+Starts the example Authorization Server and the example ACE Tornado (HTTP) and/or ACE aiocoap (CoAP) server,
+then runs N concurrent ACE clients against them. Every client
+  1. fetches an access token from the AS,
+  2. uploads it to /authz-info,
+  3. runs EDHOC,
+  4. sends a mix of GET and POST requests until the run ends.
+Reports throughput, and p50/p95/p99 latency per pipeline stage and per endpoint, followed by one line of JSON.
+Run where the servers' requirements are installed.
+"""
+# Create implicit path.
+import sys
+from os import path, pardir
+_ROOT = path.join(path.dirname(path.abspath(__file__)), pardir)
+sys.path.append(_ROOT)
+
+# External imports.
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import time
+from collections import defaultdict
+
+from cbor2 import dumps
+
+# Internal imports.
+import webthing_ace_aiocoap.parameters as coap_parameters
+import webthing_ace_tornado.parameters as http_parameters
+
+_STARTUP_TIMEOUT = 30
+
+TRANSPORTS = {
+    'http': {'parameters': http_parameters,
+             'as'        : path.join('webthing_ace_tornado', 'example', 'authorization_server.py'),
+             'rs'        : path.join('webthing_ace_tornado', 'example', 'ace_tornado_server.py'),
+             'rs_url'    : http_parameters.PC_ACE_HTTP_RS_URL,
+             'rs_port'   : http_parameters.ACE_HTTP_RS_PORT,
+             'get'       : ['/', '/properties', '/properties/led', '/actions', '/events'],
+             'post'      : [('/properties/led', dumps({b'led': False})),
+                            ('/actions/switch_led', dumps({b'switch_led': {'input': {'state': True}}}))],
+             },
+    'coap': {'parameters': coap_parameters,
+             'as'        : path.join('webthing_ace_aiocoap', 'example', 'authorization_server.py'),
+             'rs'        : path.join('webthing_ace_aiocoap', 'example', 'ace_aiocoap_server.py'),
+             'rs_url'    : coap_parameters.PC_ACE_COAP_RS_URL,
+             'rs_port'   : None,
+             'get'       : ['/ ', '/properties', '/properties/led', '/actions', '/events'],
+             'post'      : [('/properties/led', dumps({'led': False})),
+                            ('/actions/switch_led', dumps({'switch_led': {'input': {'state': True}}}))],
+             },
+    }
+
+
+def percentile(ordered, q):
+    """ Nearest-rank percentile of the sorted list *ordered*. """
+    if not ordered:
+        return None
+    rank = max(1, int(round(q / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples):
+    """
+    :param samples: list of seconds
+    :return: count and mean/p50/p95/p99 in milliseconds
+    """
+    ordered = sorted(samples)
+    return {'count': len(ordered),
+            'mean' : sum(ordered) / len(ordered) * 1e3 if ordered else None,
+            'p50'  : percentile(ordered, 50) * 1e3 if ordered else None,
+            'p95'  : percentile(ordered, 95) * 1e3 if ordered else None,
+            'p99'  : percentile(ordered, 99) * 1e3 if ordered else None,
+            }
+
+
+class Recorder:
+
+    def __init__(self):
+        self.stages = defaultdict(list)
+        self.endpoints = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def time(self, samples, name, coro):
+        started = time.perf_counter()
+        try:
+            result = await coro
+        except Exception as e:
+            self.errors[name + ': ' + type(e).__name__] += 1
+            raise
+        samples[name].append(time.perf_counter() - started)
+        return result
+
+
+def wait_for_tcp(port, timeout = _STARTUP_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout = 1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError('Nothing listens on port ' + str(port))
+
+
+def start(script):
+    return subprocess.Popen([sys.executable, path.join(_ROOT, script)],
+                            cwd = _ROOT,
+                            stdout = subprocess.DEVNULL,
+                            stderr = subprocess.DEVNULL)
+
+
+async def make_client(transport):
+    parameters = TRANSPORTS[transport]['parameters']
+    if transport == 'http':
+        from ace.client.http import HTTPClient
+        return HTTPClient(client_id = parameters.CLIENT_ID,
+                          client_secret = parameters.CLIENT_SECRET)
+
+    from aiocoap import Context
+    from ace.client.coap import CoAPClient
+    protocol = await Context.create_client_context()
+    return CoAPClient(client_id = parameters.CLIENT_ID,
+                      client_secret = parameters.CLIENT_SECRET,
+                      protocol = protocol)
+
+
+async def run_client(transport, recorder, deadline, post_ratio):
+    config = TRANSPORTS[transport]
+    parameters = config['parameters']
+    rs_url = config['rs_url']
+    client = await make_client(transport)
+
+    session = await recorder.time(recorder.stages, 'token',
+                                  client.request_access_token(as_url = parameters.PC_AS_URL,
+                                                              audience = parameters.AUDIENCE,
+                                                              scopes = parameters.SCOPES))
+    await recorder.time(recorder.stages, 'authz-info',
+                        client.upload_access_token(session = session,
+                                                   rs_url = rs_url,
+                                                   endpoint = '/authz-info'))
+    # The ACE clients run EDHOC on the first request of a session, thus 'edhoc' includes that request.
+    await recorder.time(recorder.stages, 'edhoc',
+                        client.access_resource(session, rs_url, config['get'][0]))
+
+    while time.monotonic() < deadline:
+        if random.random() < post_ratio:
+            endpoint, data = random.choice(config['post'])
+            name = 'POST ' + endpoint
+            request = client.post_resource(session, rs_url, endpoint, data)
+        else:
+            endpoint = random.choice(config['get'])
+            name = 'GET ' + endpoint
+            request = client.access_resource(session, rs_url, endpoint)
+        try:
+            await recorder.time(recorder.endpoints, name, request)
+        except Exception:
+            pass
+
+
+async def run_load(transport, clients, duration, post_ratio):
+    recorder = Recorder()
+    started = time.monotonic()
+    deadline = started + duration
+    results = await asyncio.gather(*[run_client(transport, recorder, deadline, post_ratio) for _ in range(clients)],
+                                   return_exceptions = True)
+    elapsed = time.monotonic() - started
+
+    requests = sum(len(samples) for samples in recorder.endpoints.values())
+    all_requests = [sample for samples in recorder.endpoints.values() for sample in samples]
+    return {'clients'       : clients,
+            'seconds'       : elapsed,
+            'requests'      : requests,
+            'throughput_rps': requests / elapsed,
+            'failed_clients': sum(1 for result in results if isinstance(result, Exception)),
+            'stages'        : {name: summarize(samples) for name, samples in recorder.stages.items()},
+            'endpoints'     : {name: summarize(samples) for name, samples in sorted(recorder.endpoints.items())},
+            'all'           : summarize(all_requests),
+            'errors'        : dict(recorder.errors),
+            }
+
+
+def bench(transport, args):
+    config = TRANSPORTS[transport]
+    processes = []
+    try:
+        if not args.no_start:
+            processes.append(start(config['as']))
+            wait_for_tcp(config['parameters'].AS_PORT)
+            processes.append(start(config['rs']))
+            if config['rs_port'] is not None:
+                wait_for_tcp(config['rs_port'])
+            else:
+                # UDP, nothing to connect to.
+                time.sleep(args.startup)
+        return asyncio.get_event_loop().run_until_complete(run_load(transport,
+                                                                    args.clients,
+                                                                    args.duration,
+                                                                    args.post_ratio))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+def print_report(transport, report):
+    print('{}: {} clients, {} requests in {:.1f} s, {:.1f} requests/s, {} failed clients'.format(
+            transport, report['clients'], report['requests'], report['seconds'],
+            report['throughput_rps'], report['failed_clients']))
+    for group in ('stages', 'endpoints'):
+        for name, summary in report[group].items():
+            if summary['count']:
+                print('  {:<28} n={:<6} p50 {:8.1f} ms  p95 {:8.1f} ms  p99 {:8.1f} ms'.format(
+                        name, summary['count'], summary['p50'], summary['p95'], summary['p99']))
+    for name, count in report['errors'].items():
+        print('  error {:<40} {}'.format(name, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__, formatter_class = argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-t', '--transport', choices = ['http', 'coap', 'both'], default = 'both')
+    parser.add_argument('-c', '--clients', type = int, default = 10)
+    parser.add_argument('-d', '--duration', type = float, default = 30, help = 'seconds of mixed traffic')
+    parser.add_argument('-p', '--post-ratio', type = float, default = 0.2, help = 'share of POST requests')
+    parser.add_argument('--no-start', action = 'store_true', help = 'use servers which are already running')
+    parser.add_argument('--startup', type = float, default = 3, help = 'seconds to wait for the CoAP server')
+    parser.add_argument('-o', '--output', help = 'also write the JSON report to this file')
+    args = parser.parse_args()
+
+    transports = ['http', 'coap'] if args.transport == 'both' else [args.transport]
+    reports = {}
+    for transport in transports:
+        reports[transport] = bench(transport, args)
+        print_report(transport, reports[transport])
+
+    report = json.dumps({'unit': 'ms', 'results': reports})
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-message overhead of `AceAddonManagerProxy.send()`.
+Compares the former implementation (second `json.dumps(indent = 4)` and an unconditional print)
+with the current one (level-gated logging of the already encoded message).
+Run where the adapter's requirements are installed, e.g. on the gateway.
+"""
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+# External imports.
+import argparse
+import io
+import json
+import logging
+import os
+import timeit
+from contextlib import redirect_stdout
+
+# Internal imports.
+from pkg.addon_manager_proxy import AceAddonManagerProxy
+from pkg.parameters import *
+
+
+class FakeSocket:
+
+    def send(self, msg):
+        pass
+
+
+class FakeIpcClient:
+
+    def __init__(self):
+        self.plugin_socket = FakeSocket()
+
+
+def make_proxy():
+    """ A proxy without IPC connection and without its recv thread. """
+    proxy = AceAddonManagerProxy.__new__(AceAddonManagerProxy)
+    proxy.plugin_id = 'bench'
+    proxy.ipc_client = FakeIpcClient()
+    return proxy
+
+
+def legacy_send(proxy, msg_type, data):
+    """ The former body of `AceAddonManagerProxy.send()`. """
+    data['pluginId'] = proxy.plugin_id
+    _msg = json.dumps({'messageType': msg_type,
+                       'data'       : data,
+                       })
+    _msg_encoded = _msg.encode('utf-8')
+    proxy.ipc_client.plugin_socket.send(_msg)
+    _msg_pretty = json.dumps({'messageType': msg_type,
+                              'data'       : data,
+                              },
+                             indent = 4)
+    print(GREEN + 'AceAddonManagerProxy().send() ' + ENDC + _msg_pretty, flush = True)
+
+
+def property_changed():
+    return {'adapterId': 'ace_adapter',
+            'deviceId' : 'Virtual ACE HTTP RPi Thing',
+            'property' : {'name'       : 'temperature',
+                          'value'      : 21.5,
+                          'label'      : 'Temperature',
+                          'type'       : 'number',
+                          'readOnly'   : True,
+                          'description': 'The temperature in C.',
+                          'unit'       : 'C',
+                          },
+            }
+
+
+def measure(fn, number):
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        seconds = timeit.timeit(fn, number = number)
+    return seconds / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('-n', '--number', type = int, default = 20000)
+    args = parser.parse_args()
+
+    proxy = make_proxy()
+    logger = logging.getLogger('pkg.addon_manager_proxy')
+    logger.propagate = False
+    logger.addHandler(logging.StreamHandler(io.StringIO()))
+
+    results = {'legacy': measure(lambda: legacy_send(proxy, 'propertyChanged', property_changed()), args.number)}
+
+    logger.setLevel(logging.INFO)
+    results['disabled'] = measure(lambda: proxy.send('propertyChanged', property_changed()), args.number)
+
+    logger.setLevel(logging.DEBUG)
+    results['enabled'] = measure(lambda: proxy.send('propertyChanged', property_changed()), args.number)
+
+    for name, us in results.items():
+        print('{:<10} {:8.2f} us/message'.format(name, us))
+    print(json.dumps({'unit': 'us/message', 'results': results}))
+
+
+if __name__ == '__main__':
+    main()
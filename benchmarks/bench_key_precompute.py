@@ -0,0 +1,82 @@
+"""
+Latency of the ECDSA P-256 signature check done for access tokens (AS key) and during EDHOC (PoP keys),
+with and without the precomputed verification tables of `precompute_key()`.
+Uses the keys of the ACE Tornado and of the ACE aiocoap server's `parameters.py`.
+Run where the servers' requirements are installed.
+"""
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+# External imports.
+import argparse
+import hashlib
+import json
+import timeit
+
+from ecdsa import NIST256p, SigningKey, VerifyingKey
+from ecdsa.util import sigencode_string, sigdecode_string
+
+# Internal imports.
+import webthing_ace_aiocoap.parameters as aiocoap_parameters
+import webthing_ace_tornado.parameters as tornado_parameters
+from webthing_ace_common.keys import precompute_key
+
+
+def measure_verify(signing_key, verifying_key, number, precompute):
+    """
+    :return: us per `verify()`, with a fresh copy of *verifying_key* (precomputed or not).
+    """
+    key = VerifyingKey.from_der(verifying_key.to_der())
+    if precompute:
+        precompute_key(key)
+    message = b'COSE_Sign1 Sig_structure of an access token'
+    signature = signing_key.sign(message, hashfunc = hashlib.sha256, sigencode = sigencode_string)
+
+    def verify():
+        key.verify(signature, message, hashfunc = hashlib.sha256, sigdecode = sigdecode_string)
+
+    seconds = timeit.timeit(verify, number = number)
+    return seconds / number * 1e6
+
+
+def measure_precompute(verifying_key, number):
+    """
+    :return: us which `precompute_key()` takes once per key.
+    """
+    der = verifying_key.to_der()
+    seconds = timeit.timeit(lambda: precompute_key(VerifyingKey.from_der(der)), number = number)
+    return seconds / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('-n', '--number', type = int, default = 200)
+    args = parser.parse_args()
+
+    # A peer's PoP key, as uploaded in the cnf claim of its token.
+    peer = SigningKey.generate(curve = NIST256p)
+
+    results = {}
+    for server, parameters in (('tornado', tornado_parameters), ('aiocoap', aiocoap_parameters)):
+        keys = {'as_key' : (parameters.AS_IDENTITY, parameters.AS_PUBLIC_KEY),
+                'pop_key': (peer, peer.get_verifying_key()),
+                }
+        results[server] = {}
+        for name, (signing_key, verifying_key) in keys.items():
+            results[server][name] = {
+                'plain'      : measure_verify(signing_key, verifying_key, args.number, precompute = False),
+                'precomputed': measure_verify(signing_key, verifying_key, args.number, precompute = True),
+                'precompute' : measure_precompute(verifying_key, max(1, args.number // 20)),
+                }
+
+    for server, keys in results.items():
+        for name, us in keys.items():
+            print('{:<8} {:<8} plain {:9.1f} us   precomputed {:9.1f} us   (precompute once {:9.1f} us)'.format(
+                    server, name, us['plain'], us['precomputed'], us['precompute']))
+    print(json.dumps({'unit': 'us/verify', 'results': results}))
+
+
+if __name__ == '__main__':
+    main()
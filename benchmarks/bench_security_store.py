@@ -0,0 +1,109 @@
+"""
+Throughput of OSCORE encrypt/decrypt through a `SecurityStore`, as run by the workers of `AceWebThingServer`,
+against the number of clients whose contexts are stored and the number of worker processes.
+Uses a stand-in for the `ResourceServer`, whose contexts only count their sequence number,
+thus it measures the store alone.
+"""
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+# External imports.
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import time
+
+# Internal imports.
+from webthing_ace_common.security_store import SecurityStore, SharedOscoreContext, new_key, private_directory
+
+
+class Context:
+
+    def __init__(self):
+        self.sequence_number = 0
+
+    def encrypt(self, data):
+        self.sequence_number += 1
+        return data
+
+
+class EdhocServer:
+
+    def __init__(self):
+        self.contexts = {}
+
+
+class ResourceServer:
+
+    def __init__(self):
+        self.token_cache = {}
+        self.edhoc_server = EdhocServer()
+
+    def oscore_context(self, unprot, scope):
+        return self.edhoc_server.contexts[unprot[4]]
+
+
+def kid(n):
+    return b'kid%d' % n
+
+
+def worker(store_path, key, clients, number, results):
+    store = SecurityStore(store_path, ResourceServer(), key)
+    started = time.perf_counter()
+    for i in range(number):
+        SharedOscoreContext(store, {4: kid(i % clients)}, 'GET /').encrypt(b'x')
+    results.put(time.perf_counter() - started)
+    store.close()
+
+
+def measure(clients, workers, number):
+    directory = private_directory()
+    try:
+        store_path = os.path.join(directory, 'security_state.sqlite')
+        key = new_key()
+        rs = ResourceServer()
+        for n in range(clients):
+            rs.token_cache[kid(n)] = 'token'
+            rs.edhoc_server.contexts[kid(n)] = Context()
+        store = SecurityStore(store_path, rs, key)
+        store.publish()
+        # Every context was used once, as in the steady state.
+        for n in range(clients):
+            SharedOscoreContext(store, {4: kid(n)}, 'GET /').encrypt(b'x')
+        store.close()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target = worker, args = (store_path, key, clients, number, results))
+                     for _ in range(workers)]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        return workers * number / (time.perf_counter() - started)
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description = __doc__)
+    parser.add_argument('-c', '--clients', type = int, nargs = '+', default = [10, 1000])
+    parser.add_argument('-w', '--workers', type = int, nargs = '+', default = [1, 4])
+    parser.add_argument('-n', '--number', type = int, default = 2000, help = 'operations per worker')
+    args = parser.parse_args()
+
+    results = []
+    for clients in args.clients:
+        for workers in args.workers:
+            ops = measure(clients, workers, args.number)
+            print('{:>6} clients {:>3} workers {:10.0f} ops/s'.format(clients, workers, ops))
+            results.append({'clients': clients, 'workers': workers, 'ops_per_s': ops})
+    print(json.dumps({'unit': 'ops/s', 'results': results}))
+
+
+if __name__ == '__main__':
+    main()
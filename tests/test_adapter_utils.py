@@ -0,0 +1,60 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import threading
+import unittest
+
+from pkg.utils.utils import EventLoopThread
+
+
+class TestEventLoopThread(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+
+    def tearDown(self):
+        self.loop_thread.stop(timeout = 1)
+
+    def test_run_sync_returns_result(self):
+        async def add(a, b):
+            await asyncio.sleep(0)
+            return a + b
+
+        assert (self.loop_thread.run_sync(add(1, 2)) == 3)
+
+    def test_coroutines_share_one_loop(self):
+        async def current_loop():
+            return asyncio.get_event_loop()
+
+        first = self.loop_thread.run_sync(current_loop())
+        second = self.loop_thread.run_sync(current_loop())
+        assert (first is second is self.loop_thread.loop)
+
+    def test_run_sync_from_many_threads(self):
+        results = []
+
+        async def echo(x):
+            await asyncio.sleep(0.01)
+            return x
+
+        def worker(x):
+            results.append(self.loop_thread.run_sync(echo(x)))
+
+        threads = [threading.Thread(target = worker, args = (i,)) for i in range(20)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert (sorted(results) == list(range(20)))
+
+    def test_stop_closes_loop(self):
+        self.loop_thread.stop(timeout = 1)
+        assert (self.loop_thread.loop.is_closed())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import random
+import unittest
+
+from cbor2 import CBORTag, dumps, loads
+
+try:
+    import aiocoap
+    from aiocoap.numbers.codes import Code
+    from webthing_ace_aiocoap.webthing.handlers import AceHandler, PropertyHandler
+    from webthing_ace_common.crypto_stage import CryptoStage
+except ImportError:
+    # The ACE library is not installed.
+    PropertyHandler = None
+
+_REQUESTS = 300
+
+
+class FakeOscoreContext:
+    """ Tags what it encrypts with its key id, and refuses to decrypt what was sent for another one. """
+
+    def __init__(self, kid):
+        self.kid = kid
+
+    def encrypt(self, data):
+        return self.kid + b'|' + data
+
+    def decrypt(self, payload):
+        kid, _, data = loads(payload).value[2].partition(b'|')
+        if kid != self.kid:
+            raise ValueError('Decrypted with the context of ' + repr(self.kid))
+        return data
+
+
+class FakeResourceServer:
+
+    def oscore_context(self, unprot, scope):
+        return FakeOscoreContext(unprot[4])
+
+
+class FakeThing:
+
+    def __init__(self):
+        self.properties = {'led': False}
+
+    def has_property(self, name):
+        return name in self.properties
+
+    def get_property(self, name):
+        return self.properties[name]
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+
+
+class FakeThings:
+
+    def __init__(self):
+        self.thing = FakeThing()
+
+    def get_thing(self, thing_id):
+        return self.thing
+
+
+def make_request(code, kid, plaintext = b''):
+    envelope = CBORTag(16, [b'', {4: kid}, kid + b'|' + plaintext])
+    return aiocoap.Message(code = code, payload = dumps(envelope))
+
+
+@unittest.skipIf(PropertyHandler is None, 'requires the ACE library')
+class TestConcurrentRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.rs, self.crypto = AceHandler.rs, AceHandler.crypto
+        AceHandler.rs = FakeResourceServer()
+        AceHandler.crypto = CryptoStage()
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        AceHandler.crypto.shutdown()
+        AceHandler.rs, AceHandler.crypto = self.rs, self.crypto
+        self.loop.close()
+
+    def test_overlapping_requests_keep_their_own_context(self):
+        handler = PropertyHandler(FakeThings(), ('properties', 'led'))
+        kids = [('client-' + str(i)).encode() for i in range(_REQUESTS)]
+
+        def request_for(kid):
+            if random.random() < 0.5:
+                return make_request(Code.GET, kid)
+            return make_request(Code.POST, kid, dumps({'led': True}))
+
+        async def main():
+            return await asyncio.gather(*[handler.render(request_for(kid)) for kid in kids])
+
+        responses = self.loop.run_until_complete(main())
+
+        for kid, response in zip(kids, responses):
+            assert (response.code in (Code.CONTENT, Code.CHANGED)), response.code
+            encrypted_for, _, data = response.payload.partition(b'|')
+            assert (encrypted_for == kid), (encrypted_for, kid)
+            assert (loads(data) in (b'OK', {'led': False}, {'led': True}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,232 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import unittest
+
+from cbor2 import CBORTag, dumps, loads
+
+try:
+    import aiocoap
+    import aiocoap.error
+    from aiocoap.numbers.codes import Code
+    from ace.rs.resource_server import NotAuthorizedException
+    from webthing_ace_aiocoap.webthing.handlers import AceHandler, EventHandler, PropertyHandler
+    from webthing_ace_common.crypto_stage import CryptoStage
+except ImportError:
+    # The ACE library is not installed.
+    PropertyHandler = None
+
+
+class FakeOscoreContext:
+
+    def __init__(self, kid):
+        self.kid = kid
+
+    def encrypt(self, data):
+        return self.kid + b'|' + data
+
+
+class FakeResourceServer:
+
+    def __init__(self):
+        self.revoked = set()
+
+    def oscore_context(self, unprot, scope):
+        if unprot[4] in self.revoked:
+            raise NotAuthorizedException()
+        return FakeOscoreContext(unprot[4])
+
+
+class FakeProperty:
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def get_name(self):
+        return self.name
+
+    def get_value(self):
+        return self.value
+
+
+class FakeEvent:
+
+    def __init__(self, n):
+        self.n = n
+
+    def as_event_description(self):
+        return {'proximity': {'data': self.n}}
+
+
+class FakeThing:
+    """ Notifies its subscribers like a webthing `Thing`. """
+
+    def __init__(self):
+        self.properties = {'led': False}
+        self.subscribers = set()
+        self.event_subscribers = set()
+
+    def add_subscriber(self, subscriber):
+        self.subscribers.add(subscriber)
+
+    def remove_subscriber(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def add_event_subscriber(self, name, subscriber):
+        self.event_subscribers.add(subscriber)
+
+    def remove_event_subscriber(self, name, subscriber):
+        self.event_subscribers.discard(subscriber)
+
+    def has_property(self, name):
+        return name in self.properties
+
+    def get_property(self, name):
+        return self.properties[name]
+
+    def set_property(self, name, value):
+        self.properties[name] = value
+        for subscriber in list(self.subscribers):
+            subscriber.update_property(FakeProperty(name, value))
+
+    def get_event_descriptions(self, event_name = None):
+        return []
+
+    def add_event(self, event):
+        for subscriber in list(self.event_subscribers):
+            subscriber.update_event(event)
+
+
+class FakeThings:
+
+    def __init__(self):
+        self.thing = FakeThing()
+
+    def get_thing(self, thing_id):
+        return self.thing
+
+
+class FakeServerObservation:
+
+    def __init__(self):
+        self.accepted = False
+        self.triggers = 0
+        self.cancel = None
+
+    def accept(self, cancellation_callback):
+        self.accepted = True
+        self.cancel = cancellation_callback
+
+    def trigger(self, response = None):
+        self.triggers += 1
+
+
+def make_request(kid):
+    return aiocoap.Message(code = Code.GET, payload = dumps(CBORTag(16, [b'', {4: kid}, b''])))
+
+
+def decrypted(response, kid):
+    encrypted_for, _, data = response.payload.partition(b'|')
+    assert (encrypted_for == kid)
+    return loads(data)
+
+
+@unittest.skipIf(PropertyHandler is None, 'requires the ACE library')
+class TestObserve(unittest.TestCase):
+
+    def setUp(self):
+        self.rs, self.crypto = AceHandler.rs, AceHandler.crypto
+        AceHandler.rs = FakeResourceServer()
+        AceHandler.crypto = CryptoStage()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.things = FakeThings()
+
+    def tearDown(self):
+        AceHandler.crypto.shutdown()
+        AceHandler.rs, AceHandler.crypto = self.rs, self.crypto
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    def run_async(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def observe(self, handler, kid):
+        request = make_request(kid)
+        observation = FakeServerObservation()
+        self.run_async(handler.add_observation(request, observation))
+        return request, observation
+
+    def test_notifications_carry_merged_changes(self):
+        handler = PropertyHandler(self.things, ('properties', 'led'))
+        request, observation = self.observe(handler, b'a')
+        assert (observation.accepted)
+        assert (decrypted(self.run_async(handler.render(request)), b'a') == {'led': False})
+
+        self.things.thing.set_property('led', True)
+        self.things.thing.set_property('led', False)
+        self.run_async(asyncio.sleep(0))
+        assert (observation.triggers == 2)
+
+        response = self.run_async(handler.render(request))
+        assert (response.code == Code.CONTENT)
+        assert (decrypted(response, b'a') == {'led': False})
+
+        observation.cancel()
+        assert (not self.things.thing.subscribers)
+
+    def test_every_observer_is_notified_with_its_own_context(self):
+        handler = PropertyHandler(self.things, ('properties', 'led'))
+        observations = {kid: self.observe(handler, kid) for kid in (b'a', b'b')}
+        for request, _ in observations.values():
+            self.run_async(handler.render(request))
+        assert (len(self.things.thing.subscribers) == 1)
+
+        self.things.thing.set_property('led', True)
+        self.run_async(asyncio.sleep(0))
+        for kid, (request, _) in observations.items():
+            assert (decrypted(self.run_async(handler.render(request)), kid) == {'led': True})
+
+    def test_revoked_observer_gets_unauthorized(self):
+        handler = PropertyHandler(self.things, ('properties', 'led'))
+        request, observation = self.observe(handler, b'a')
+        self.run_async(handler.render(request))
+
+        AceHandler.rs.revoked.add(b'a')
+        self.things.thing.set_property('led', True)
+        self.run_async(asyncio.sleep(0))
+        assert (self.run_async(handler.render(request)).code == Code.UNAUTHORIZED)
+
+        _, refused = self.observe(handler, b'a')
+        assert (not refused.accepted)
+
+    def test_malformed_request_is_not_accepted(self):
+        handler = PropertyHandler(self.things, ('properties', 'led'))
+        for payload in (b'', b'\xff', dumps(1), dumps(CBORTag(16, [b''])), dumps(CBORTag(16, [b'', {}, b'']))):
+            request = aiocoap.Message(code = Code.GET, payload = payload)
+            observation = FakeServerObservation()
+            self.run_async(handler.add_observation(request, observation))
+            assert (not observation.accepted)
+            # *render()* answers it with 4.00.
+            with self.assertRaises(aiocoap.error.BadRequest):
+                self.run_async(handler.render(request))
+        assert (not self.things.thing.subscribers)
+
+    def test_events_are_queued(self):
+        handler = EventHandler(self.things, ('events', 'proximity'))
+        request, observation = self.observe(handler, b'a')
+        assert (decrypted(self.run_async(handler.render(request)), b'a') == [])
+
+        for n in range(3):
+            self.things.thing.add_event(FakeEvent(n))
+        self.run_async(asyncio.sleep(0))
+        notification = decrypted(self.run_async(handler.render(request)), b'a')
+        assert (notification == [{'proximity': {'data': n}} for n in range(3)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import unittest
+
+from pkg.utils.utils import EventLoopThread
+
+try:
+    from pkg import coap_context
+    from pkg.coap_context import CoapClientContext
+except ImportError:
+    # The ACE library is not installed.
+    CoapClientContext = None
+
+
+class FakeContext:
+    """ Stands in for *aiocoap.Context*, counts how often one is created and shut down. """
+    created = []
+
+    def __init__(self):
+        self.shut_down = False
+
+    @classmethod
+    async def create_client_context(cls):
+        # Yield, so that concurrent callers really race for the context.
+        await asyncio.sleep(0.01)
+        context = cls()
+        cls.created.append(context)
+        return context
+
+    async def shutdown(self):
+        self.shut_down = True
+
+
+class FakeCoAPClient:
+
+    def __init__(self, client_id, client_secret, protocol):
+        self.protocol = protocol
+
+
+@unittest.skipIf(CoapClientContext is None, 'requires the ACE library')
+class TestCoapClientContext(unittest.TestCase):
+
+    def setUp(self):
+        self.patched = (coap_context.Context, coap_context.CoAPClient)
+        coap_context.Context = FakeContext
+        coap_context.CoAPClient = FakeCoAPClient
+        FakeContext.created = []
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+
+    def tearDown(self):
+        self.loop_thread.stop(timeout = 1)
+        coap_context.Context, coap_context.CoAPClient = self.patched
+
+    def test_one_context_for_all_clients(self):
+        context = CoapClientContext()
+
+        async def clients():
+            return await asyncio.gather(*(context.client() for _ in range(20)))
+
+        clients = self.loop_thread.run_sync(clients(), timeout = 5)
+        assert (len(FakeContext.created) == 1)
+        assert (all(client is clients[0] for client in clients))
+        assert (clients[0].protocol is FakeContext.created[0])
+
+        self.loop_thread.run_sync(context.client(), timeout = 5)
+        assert (len(FakeContext.created) == 1)
+
+    def test_close_shuts_the_context_down(self):
+        context = CoapClientContext()
+        self.loop_thread.run_sync(context.client(), timeout = 5)
+        self.loop_thread.run_sync(context.close(), timeout = 5)
+        assert (FakeContext.created[0].shut_down)
+
+        # Closing again is harmless, the next client gets a new context.
+        self.loop_thread.run_sync(context.close(), timeout = 5)
+        self.loop_thread.run_sync(context.client(), timeout = 5)
+        assert (len(FakeContext.created) == 2)
+        assert (not FakeContext.created[1].shut_down)
+
+    def test_close_without_client(self):
+        context = CoapClientContext()
+        self.loop_thread.run_sync(context.close(), timeout = 5)
+        assert (FakeContext.created == [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import threading
+import time
+import unittest
+
+from webthing_ace_common.crypto_stage import CryptoStage, LoopLagMonitor
+
+
+def slow_square(x, delay = 0.05):
+    time.sleep(delay)
+    return x * x
+
+
+class TestCryptoStage(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.stage = CryptoStage(max_workers = 4)
+
+    def tearDown(self):
+        self.stage.shutdown()
+        self.loop.close()
+
+    def test_verify_runs_in_parallel_off_the_loop(self):
+        async def main():
+            started = time.perf_counter()
+            results = await asyncio.gather(*[self.stage.verify(slow_square, i, delay = 0.1) for i in range(4)])
+            return results, time.perf_counter() - started
+
+        results, seconds = self.loop.run_until_complete(main())
+        assert (results == [0, 1, 4, 9])
+        assert (seconds < 0.3)
+        assert (self.stage.stats()['verify_jobs'] == 4)
+        assert (self.stage.stats()['verify_seconds'] >= 0.4)
+
+    def test_oscore_calls_do_not_overlap(self):
+        active = []
+        overlaps = []
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                active.append(1)
+                overlaps.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+
+        async def main():
+            await asyncio.gather(*[self.stage.oscore(job) for _ in range(5)])
+
+        self.loop.run_until_complete(main())
+        assert (max(overlaps) == 1)
+        assert (self.stage.stats()['oscore_jobs'] == 5)
+
+    def test_errors_propagate(self):
+        def fail():
+            raise ValueError('bad')
+
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(self.stage.verify(fail))
+
+
+class TestLoopLagMonitor(unittest.TestCase):
+
+    def test_measures_blocking(self):
+        loop = asyncio.new_event_loop()
+        monitor = LoopLagMonitor(interval = 0.01, warning = 10)
+        monitor.start(loop)
+
+        async def block():
+            await asyncio.sleep(0.02)
+            time.sleep(0.1)
+            await asyncio.sleep(0.05)
+
+        loop.run_until_complete(block())
+        monitor.stop()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+        assert (monitor.max_lag >= 0.05)
+        assert (monitor.samples > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import threading
+import time
+import unittest
+
+from pkg.dispatcher import OrderedDispatcher
+
+
+class TestOrderedDispatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.dispatcher = OrderedDispatcher(max_workers = 4, max_pending = 64)
+
+    def tearDown(self):
+        self.dispatcher.shutdown(wait = True)
+
+    def test_same_key_keeps_order(self):
+        seen = {'a': [], 'b': []}
+
+        def handler(key, i):
+            time.sleep(0.001)
+            seen[key].append(i)
+
+        for i in range(30):
+            self.dispatcher.submit('a', handler, args = ('a', i))
+            self.dispatcher.submit('b', handler, args = ('b', i))
+
+        self.dispatcher.shutdown(wait = True)
+        assert (seen['a'] == list(range(30)))
+        assert (seen['b'] == list(range(30)))
+        assert (self.dispatcher.stats['completed'] == 60)
+
+    def test_different_keys_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout = 1)
+        for key in ('a', 'b'):
+            self.dispatcher.submit(key, barrier.wait)
+
+        self.dispatcher.shutdown(wait = True)
+        assert (self.dispatcher.stats['failed'] == 0)
+
+    def test_submit_blocks_when_full(self):
+        dispatcher = OrderedDispatcher(max_workers = 1, max_pending = 2)
+        release = threading.Event()
+        dispatcher.submit('a', release.wait)
+        dispatcher.submit('a', release.wait)
+
+        submitted = threading.Event()
+
+        def submit_third():
+            dispatcher.submit('a', lambda: None)
+            submitted.set()
+
+        threading.Thread(target = submit_third, daemon = True).start()
+        assert (not submitted.wait(0.1))
+        assert (dispatcher.queue_depths() == {'a': 1})
+
+        release.set()
+        assert (submitted.wait(1))
+        dispatcher.shutdown(wait = True)
+        assert (dispatcher.stats['blocked'] == 1)
+
+    def test_submit_without_blocking_overflows(self):
+        dispatcher = OrderedDispatcher(max_workers = 1, max_pending = 1)
+        release = threading.Event()
+        seen = []
+        dispatcher.submit('a', release.wait)
+        dispatcher.submit('a', seen.append, args = (1,), block = False)
+        dispatcher.submit('a', seen.append, args = (2,), block = False)
+        assert (dispatcher.stats['overflow'] == 2)
+        assert (dispatcher.queue_depths() == {'a': 2})
+
+        release.set()
+        dispatcher.shutdown(wait = True)
+        assert (seen == [1, 2])
+        assert (dispatcher.stats['completed'] == 3)
+        # Overflowing handlers held no slot, thus exactly the one slot is free again.
+        assert (dispatcher._slots.acquire(blocking = False))
+        assert (not dispatcher._slots.acquire(blocking = False))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from pkg.utils.utils import EventLoopThread
+
+try:
+    from pkg.http_pool import HTTPConnectionPool
+except ImportError:
+    # The ACE library is not installed.
+    HTTPConnectionPool = None
+
+
+async def start_server():
+    async def handle(request):
+        await asyncio.sleep(float(request.query.get('delay', 0)))
+        return web.json_response({'level': 42})
+
+    app = web.Application()
+    app.router.add_get('/properties/level', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, 'http://127.0.0.1:{}/properties/level'.format(port)
+
+
+async def get(pool, url):
+    async with pool.session().get(url) as response:
+        return await response.json()
+
+
+@unittest.skipIf(HTTPConnectionPool is None, 'requires the ACE library')
+class TestHTTPConnectionPool(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.runner, self.url = self.loop_thread.run_sync(start_server(), timeout = 5)
+
+    def tearDown(self):
+        self.loop_thread.run_sync(self.runner.cleanup(), timeout = 5)
+        self.loop_thread.stop(timeout = 1)
+
+    def test_sequential_requests_reuse_one_connection(self):
+        pool = HTTPConnectionPool()
+
+        async def poll():
+            for _ in range(5):
+                assert (await get(pool, self.url) == {'level': 42})
+            await pool.close()
+
+        self.loop_thread.run_sync(poll(), timeout = 5)
+        assert (pool.stats == {'requests'           : 5,
+                               'connections_created': 1,
+                               'connections_reused' : 4,
+                               })
+        assert (pool.reuse_ratio() == 0.8)
+
+    def test_concurrent_requests_are_limited_per_host(self):
+        pool = HTTPConnectionPool(limit_per_host = 2)
+
+        async def poll():
+            await asyncio.gather(*(get(pool, self.url + '?delay=0.05') for _ in range(6)))
+            await pool.close()
+
+        self.loop_thread.run_sync(poll(), timeout = 5)
+        assert (pool.stats['requests'] == 6)
+        assert (pool.stats['connections_created'] == 2)
+        assert (pool.stats['connections_reused'] == 4)
+
+    def test_no_requests_no_reuse(self):
+        assert (HTTPConnectionPool().reuse_ratio() == 0.0)
+
+    def test_close_opens_a_new_session(self):
+        pool = HTTPConnectionPool()
+
+        async def poll():
+            session = pool.session()
+            await get(pool, self.url)
+            await pool.close()
+            assert (session.closed)
+            await get(pool, self.url)
+            assert (pool.session() is not session)
+            await pool.close()
+
+        self.loop_thread.run_sync(poll(), timeout = 5)
+        assert (pool.stats['connections_created'] == 2)
+        assert (pool.stats['connections_reused'] == 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
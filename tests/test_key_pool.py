@@ -0,0 +1,155 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import os
+import pickle
+import tempfile
+import time
+import types
+import unittest
+
+import ecdsa
+from ecdsa import NIST256p, NIST384p, SigningKey
+
+from webthing_ace_common.key_pool import EphemeralKeyPool, PooledSigningKey
+from webthing_ace_common.security_store import SecurityStore, new_key
+
+
+def make_edhoc_module():
+    """ A module like the one of the EDHOC server, which generates ephemeral keys with SigningKey. """
+    module = types.ModuleType('fake_edhoc')
+    module.SigningKey = SigningKey
+
+    class EdhocServer:
+        pass
+
+    EdhocServer.__module__ = module.__name__
+    EdhocServer.__qualname__ = EdhocServer.__name__
+    module.EdhocServer = EdhocServer
+
+    class ResourceServer:
+        """ Holds an identity key and the ephemeral keys of its EDHOC sessions, like `ResourceServer`. """
+
+        def __init__(self):
+            self.token_cache = {}
+            self.edhoc_server = EdhocServer()
+            self.edhoc_server.identity = module.SigningKey.from_string(b'\x01' * 32, curve = NIST256p)
+            self.edhoc_server.sessions = []
+
+    module.ResourceServer = ResourceServer
+    sys.modules[module.__name__] = module
+    return module
+
+
+class TestEphemeralKeyPool(unittest.TestCase):
+
+    def test_take_from_filled_pool(self):
+        pool = EphemeralKeyPool(size = 3)
+        pool.start()
+        deadline = time.monotonic() + 5
+        while pool.stats()['depth'] < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        keys = [pool.take() for _ in range(3)]
+        pool.stop()
+        assert (pool.stats()['exhausted'] == 0)
+        assert (len({key.to_string() for key in keys}) == 3)
+
+    def test_empty_pool_generates_inline(self):
+        pool = EphemeralKeyPool(size = 2)
+        key = pool.take()
+        assert (key.curve is NIST256p)
+        assert (pool.stats()['exhausted'] == 1)
+
+    def setUp(self):
+        self.module = make_edhoc_module()
+
+    def tearDown(self):
+        del sys.modules[self.module.__name__]
+        # Every test uninstalls its pool.
+        assert (PooledSigningKey.pool is None)
+
+    def test_install_serves_the_edhoc_module(self):
+        module = self.module
+        with EphemeralKeyPool(size = 2) as pool:
+            assert (pool.install(module.EdhocServer()))
+
+            module.SigningKey.generate(curve = NIST256p)
+            assert (pool.taken == 1)
+            # Other curves and ecdsa itself are left alone.
+            assert (module.SigningKey.generate(curve = NIST384p).curve is NIST384p)
+            assert (ecdsa.SigningKey is SigningKey)
+            assert (pool.taken == 1)
+
+    def test_uninstall_restores_the_edhoc_module(self):
+        module = self.module
+        pool = EphemeralKeyPool(size = 2)
+        assert (pool.install(module.EdhocServer()))
+        assert (module.SigningKey is PooledSigningKey)
+        key = module.SigningKey.from_string(b'\x02' * 32, curve = NIST256p)
+
+        pool.uninstall()
+        assert (module.SigningKey is SigningKey)
+        module.SigningKey.generate(curve = NIST256p)
+        assert (pool.taken == 0)
+        # Keys created while it was installed keep working.
+        assert (key.verifying_key.verify(key.sign(b'x'), b'x'))
+
+    def test_stop_uninstalls(self):
+        with EphemeralKeyPool(size = 2) as pool:
+            assert (pool.install(self.module.EdhocServer()))
+        assert (self.module.SigningKey is SigningKey)
+
+    def test_one_pool_at_a_time(self):
+        with EphemeralKeyPool(size = 2) as pool:
+            assert (pool.install(self.module.EdhocServer()))
+            assert (pool.install(self.module.EdhocServer()))
+            with EphemeralKeyPool(size = 2) as other:
+                assert (not other.install(self.module.EdhocServer()))
+            assert (self.module.SigningKey is PooledSigningKey)
+        with EphemeralKeyPool(size = 2) as other:
+            assert (other.install(self.module.EdhocServer()))
+
+    def test_keys_of_the_edhoc_module_can_be_pickled(self):
+        module = self.module
+        with EphemeralKeyPool(size = 2) as pool:
+            assert (pool.install(module.EdhocServer()))
+
+            key = module.SigningKey.from_string(b'\x02' * 32, curve = NIST256p)
+            assert (pickle.loads(pickle.dumps(key)).to_string() == key.to_string())
+
+    def test_pool_with_security_store(self):
+        module = self.module
+        fd, store_path = tempfile.mkstemp(suffix = '.sqlite')
+        os.close(fd)
+        try:
+            with EphemeralKeyPool(size = 2) as pool:
+                assert (pool.install(module.EdhocServer()))
+                # Its identity key is created by the installed class.
+                rs = module.ResourceServer()
+                key = new_key()
+                SecurityStore(store_path, rs, key).publish()
+
+                worker = SecurityStore(store_path, rs, key)
+                worker.write(lambda rs: rs.edhoc_server.sessions.append(module.SigningKey.generate(curve = NIST256p)))
+                assert (pool.taken == 1)
+
+                other = SecurityStore(store_path, module.ResourceServer(), key)
+                sessions = other.read(lambda rs: rs.edhoc_server.sessions)
+                assert ([session.to_string() for session in sessions] ==
+                        [session.to_string() for session in rs.edhoc_server.sessions])
+                worker.close()
+                other.close()
+        finally:
+            for suffix in ('', '-wal', '-shm'):
+                if os.path.exists(store_path + suffix):
+                    os.remove(store_path + suffix)
+
+    def test_install_without_ecdsa(self):
+        server = types.SimpleNamespace()
+        assert (not EphemeralKeyPool().install(server))
+
+
+if __name__ == '__main__':
+    unittest.main()
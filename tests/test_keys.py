@@ -0,0 +1,28 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import hashlib
+import unittest
+
+from ecdsa import NIST256p, SigningKey, VerifyingKey, BadSignatureError
+
+from webthing_ace_common.keys import precompute_key
+
+
+class TestPrecomputeKey(unittest.TestCase):
+
+    def test_key_from_der_still_verifies(self):
+        signing_key = SigningKey.generate(curve = NIST256p)
+        key = VerifyingKey.from_der(signing_key.get_verifying_key().to_der())
+        assert (precompute_key(key) is key)
+
+        signature = signing_key.sign(b'message', hashfunc = hashlib.sha256)
+        assert (key.verify(signature, b'message', hashfunc = hashlib.sha256))
+        with self.assertRaises(BadSignatureError):
+            key.verify(signature, b'other message', hashfunc = hashlib.sha256)
+
+
+if __name__ == '__main__':
+    unittest.main()
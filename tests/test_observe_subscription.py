@@ -0,0 +1,145 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import unittest
+
+from aiocoap.numbers.codes import Code
+
+from pkg.observe import ObservationEnded, ObserveNotOffered, ObserveSubscription
+
+
+class FakeDevice:
+    """
+    Every registration of an endpoint takes the next item of *scripts[endpoint]*, a list of states or an exception.
+    After its last script, an observation stays registered.
+    *registered* counts the observations which were not cancelled yet.
+    """
+
+    def __init__(self, scripts):
+        self.id = 'fake'
+        self.scripts = scripts
+        self.notifications = []
+        self.renewals = 0
+        self.registered = 0
+        self.max_registered = 0
+
+    async def observe(self, endpoint):
+        script = self.scripts[endpoint].pop(0) if self.scripts[endpoint] else []
+        if isinstance(script, Exception):
+            raise script
+        self.registered += 1
+        self.max_registered = max(self.max_registered, self.registered)
+        try:
+            for state in script:
+                yield state
+            if not self.scripts[endpoint]:
+                await asyncio.sleep(3600)
+        finally:
+            self.registered -= 1
+
+    def on_notification(self, endpoint, state):
+        self.notifications.append((endpoint, state))
+
+    async def async_renew_session(self):
+        self.renewals += 1
+
+
+class TestObserveSubscription(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_subscription(self, device, endpoints, seconds = 0.1, **kwargs):
+        subscription = ObserveSubscription(device, self.loop, retry_delay = 0.01, **kwargs)
+
+        async def run():
+            subscription.start(endpoints)
+            await asyncio.sleep(seconds)
+            observed = set(subscription.observed)
+            subscription.stop()
+            await asyncio.sleep(0)
+            return observed
+
+        return subscription, self.loop.run_until_complete(run())
+
+    def test_notifications(self):
+        device = FakeDevice({'/properties': [[{'on': True}, {'on': False}]]})
+        subscription, observed = self.run_subscription(device, ['/properties'])
+
+        assert (device.notifications == [('/properties', {'on': True}), ('/properties', {'on': False})])
+        assert (observed == {'/properties'})
+        assert (subscription.stats['registrations'] == 1)
+
+    def test_registers_again(self):
+        device = FakeDevice({'/events/e': [[[1]], [[2]]]})
+        subscription, _ = self.run_subscription(device, ['/events/e'])
+
+        assert (device.notifications == [('/events/e', [1]), ('/events/e', [2])])
+        assert (subscription.stats['failures'] == 0)
+
+    def test_renew_on_unauthorized(self):
+        device = FakeDevice({'/properties': [ObservationEnded(Code.UNAUTHORIZED), [{'on': True}]]})
+        subscription, observed = self.run_subscription(device, ['/properties'])
+
+        assert (device.renewals == 1)
+        assert (device.notifications == [('/properties', {'on': True})])
+        assert (observed == {'/properties'})
+
+    def test_renew_after_failures(self):
+        device = FakeDevice({'/properties': [OSError(), OSError(), OSError(), [{'on': True}]]})
+        subscription, _ = self.run_subscription(device, ['/properties'], seconds = 0.3, renew_after = 3)
+
+        assert (device.renewals == 1)
+        assert (subscription.stats['failures'] == 3)
+        assert (device.notifications == [('/properties', {'on': True})])
+
+    def test_not_offered(self):
+        device = FakeDevice({'/properties': [ObserveNotOffered()], '/events/e': [[[1]]]})
+        subscription, observed = self.run_subscription(device, ['/properties', '/events/e'])
+
+        assert (subscription.not_offered == {'/properties'})
+        assert (not subscription.is_observed('/properties'))
+        assert ('/events/e' in observed)
+        assert (device.renewals == 0)
+
+    def test_failing_notification_cancels_the_observation(self):
+        device = FakeDevice({'/properties': [[{'on': True}], [{'on': False}]]})
+
+        def on_notification(endpoint, state):
+            FakeDevice.on_notification(device, endpoint, state)
+            if state == {'on': True}:
+                raise ValueError(state)
+
+        device.on_notification = on_notification
+        # Held, so that the garbage collector does not close a dropped observation.
+        observations = []
+        observe = device.observe
+
+        def held_observe(endpoint):
+            observations.append(observe(endpoint))
+            return observations[-1]
+
+        device.observe = held_observe
+        subscription, observed = self.run_subscription(device, ['/properties'])
+
+        assert (device.notifications == [('/properties', {'on': True}), ('/properties', {'on': False})])
+        assert (subscription.stats['failures'] == 1)
+        assert (device.max_registered == 1)
+        assert (device.registered == 0)
+
+    def test_stop(self):
+        device = FakeDevice({'/properties': [[{'on': True}]]})
+        subscription, _ = self.run_subscription(device, ['/properties'])
+
+        assert (subscription.observed == set())
+        assert (subscription._tasks == {})
+
+
+if __name__ == '__main__':
+    unittest.main()
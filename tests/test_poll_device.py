@@ -0,0 +1,307 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import json
+import unittest
+
+from pkg.dispatcher import OrderedDispatcher
+from pkg.utils.utils import EventLoopThread
+
+try:
+    from pkg import device
+    from pkg.device import PollDevice, URLDevice
+except ImportError:
+    # The Gateway add-on library is not installed.
+    PollDevice = None
+
+THING = {'name'       : 'lamp',
+         'description': 'A lamp.',
+         'actions'    : {},
+         'events'     : {},
+         'properties' : {'on'   : {'type': 'boolean'},
+                         'level': {'type': 'number', 'readOnly': True},
+                         },
+         }
+
+
+class FakeManagerProxy:
+
+    def __init__(self):
+        self.dispatcher = OrderedDispatcher(max_workers = 2)
+        self.batches = []
+
+    def send_property_changed_notifications(self, props):
+        self.batches.append({prop.name: prop.value for prop in props})
+
+
+class FakeResponse:
+
+    def __init__(self, status, body = b'', headers = None):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def read(self):
+        return self.body
+
+
+class FakeSession:
+    """
+    Serves *states* { url : state } as JSON, and answers like the plain WebThingServer:
+    every state has an ETag, a GET with a matching `If-None-Match` gets 304.
+    """
+
+    def __init__(self, states):
+        self.states = states
+        self.requests = []
+
+    def etag(self, url):
+        return '"{}"'.format(hash(json.dumps(self.states[url], sort_keys = True)))
+
+    def request(self, method, url, headers = None, data = None):
+        self.requests.append((method, url, headers))
+        if headers and headers.get('If-None-Match') == self.etag(url):
+            return FakeResponse(304)
+        return FakeResponse(200, json.dumps(self.states[url]).encode(), {'Etag': self.etag(url)})
+
+    def get(self, url, headers = None):
+        return self.request('GET', url, headers = headers)
+
+
+class FakeHTTPPool:
+
+    def __init__(self, states):
+        self._session = FakeSession(states)
+
+    def session(self):
+        return self._session
+
+
+class FakeAdapter:
+
+    def __init__(self, loop_thread, states = None):
+        self.loop_thread = loop_thread
+        self.manager_proxy = FakeManagerProxy()
+        self.http_pool = FakeHTTPPool(states or {})
+
+
+if PollDevice is not None:
+    class FakePollDevice(PollDevice):
+        """ Serves *states* { endpoint : state or exception }, and records every fetched endpoint. """
+
+        def __init__(self, adapter, states):
+            super().__init__(adapter, 'fake')
+            self.states = states
+            self.fetched = []
+
+        async def fetch(self, endpoint):
+            self.fetched.append(endpoint)
+            state = self.states[endpoint]
+            if isinstance(state, Exception):
+                raise state
+            return state
+
+
+@unittest.skipIf(PollDevice is None, 'requires the Gateway add-on library')
+class TestThingValidator(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.adapter = FakeAdapter(self.loop_thread)
+        self.device = FakePollDevice(self.adapter, {'/'          : THING,
+                                                    '/?validator': {'validator': 'v1'},
+                                                    })
+
+    def tearDown(self):
+        self.adapter.manager_proxy.dispatcher.shutdown(wait = True)
+        self.loop_thread.stop(timeout = 1)
+
+    def test_unchanged_validator_keeps_the_cached_thing(self):
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) == THING)
+        assert (self.device.thing_validator == 'v1')
+        assert (self.device.fetched == ['/?validator', '/'])
+
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) is None)
+        assert (self.device.fetched == ['/?validator', '/', '/?validator'])
+
+    def test_changed_validator_fetches_the_thing(self):
+        self.device.run_sync(self.device.fetch_thing_if_changed())
+        changed = dict(THING, name = 'dimmer')
+        self.device.states.update({'/': changed, '/?validator': {'validator': 'v2'}})
+
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) == changed)
+        assert (self.device.thing_validator == 'v2')
+
+    def test_no_validator_always_fetches(self):
+        self.device.states['/?validator'] = {}
+        self.device.run_sync(self.device.fetch_thing_if_changed())
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) == THING)
+        assert (self.device.fetched.count('/') == 2)
+
+    def test_cached_thing_is_revalidated_every_few_polls(self):
+        self.device.thing_state = THING
+        self.device.thing_validator = 'v1'
+        for _ in range(device._TD_REVALIDATE_POLLS):
+            assert (self.device.run_sync(self.device.revalidate_thing()) is None)
+        assert (self.device.fetched == [])
+
+        assert (self.device.run_sync(self.device.revalidate_thing()) is None)
+        assert (self.device.fetched == ['/?validator'])
+        assert (self.device.polls_since_revalidation == 0)
+
+    def test_unknown_property_makes_the_thing_stale(self):
+        self.device.thing_state = THING
+        assert (not self.device.thing_is_stale({'on': True, 'level': 3}))
+        assert (self.device.thing_is_stale({'on': True, 'color': 'red'}))
+
+        # A stale thing is fetched again, without waiting for its revalidation.
+        changed = dict(THING, properties = dict(THING['properties'], color = {'type': 'string'}))
+        self.device.states.update({'/': changed, '/properties': {'on': True, 'color': 'red'}, '/events': []})
+        self.device.run_sync(self.device.async_update())
+        assert (self.device.thing_state == changed)
+        assert (self.device.thing_validator is None)
+        assert ('color' in self.device.properties)
+
+
+@unittest.skipIf(PollDevice is None, 'requires the Gateway add-on library')
+class TestPropertiesUpdate(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.adapter = FakeAdapter(self.loop_thread)
+        self.device = FakePollDevice(self.adapter, {})
+        self.device.thing_state = THING
+
+    def tearDown(self):
+        self.adapter.manager_proxy.dispatcher.shutdown(wait = True)
+        self.loop_thread.stop(timeout = 1)
+
+    def batches(self):
+        self.adapter.manager_proxy.dispatcher.shutdown(wait = True)
+        return self.adapter.manager_proxy.batches
+
+    def test_new_properties_are_added_without_notification(self):
+        assert (self.device.properties_update(THING, {'on': True, 'level': 3}) == 2)
+        assert (self.device.properties['level'].value == 3)
+        assert (self.batches() == [])
+
+    def test_unchanged_values_are_suppressed(self):
+        self.device.properties_update(THING, {'on': True, 'level': 3})
+        assert (self.device.properties_update(THING, {'on': True, 'level': 3}) == 0)
+        assert (self.device.properties_update(THING, {'on': True, 'level': 3}) == 0)
+        assert (self.device.suppressed_updates == 4)
+        assert (self.batches() == [])
+
+    def test_changed_values_are_sent_in_one_batch(self):
+        self.device.properties_update(THING, {'on': True, 'level': 3})
+        assert (self.device.properties_update(THING, {'on': False, 'level': 4}) == 2)
+        assert (self.device.properties_update(THING, {'on': False, 'level': 5}) == 1)
+        assert (self.device.suppressed_updates == 1)
+        assert (self.batches() == [{'on': False, 'level': 4}, {'level': 5}])
+
+    def test_batches_go_through_the_ordered_dispatcher(self):
+        self.device.properties_update(THING, {'on': True, 'level': 3})
+        self.device.run_sync(self.async_properties_update({'on': False, 'level': 4}))
+        assert (self.batches() == [{'on': False, 'level': 4}])
+        assert (self.adapter.manager_proxy.dispatcher.stats['submitted'] == 1)
+
+    async def async_properties_update(self, properties_state):
+        # The way polls and pushed updates call it, on the adapter's event loop.
+        return self.device.properties_update(THING, properties_state)
+
+
+@unittest.skipIf(PollDevice is None, 'requires the Gateway add-on library')
+class TestPartialFailure(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.adapter = FakeAdapter(self.loop_thread)
+        self.device = FakePollDevice(self.adapter, {'/'          : THING,
+                                                    '/?validator': {'validator': 'v1'},
+                                                    '/properties': {'on': True, 'level': 3},
+                                                    '/events'    : [{'overheated': {'data': 90}}],
+                                                    })
+
+    def tearDown(self):
+        self.adapter.manager_proxy.dispatcher.shutdown(wait = True)
+        self.loop_thread.stop(timeout = 1)
+
+    def test_failed_events_keep_the_properties(self):
+        self.device.states['/events'] = ConnectionError('events')
+        self.device.update()
+        assert (self.device.thing_state == THING)
+        assert (self.device.properties['level'].value == 3)
+        assert (self.device.events == [])
+
+    def test_failed_properties_keep_the_events(self):
+        self.device.states['/properties'] = ConnectionError('properties')
+        self.device.update()
+        assert (self.device.thing_state == THING)
+        assert (self.device.properties == {})
+        assert (self.device.events == [{'overheated': {'data': 90}}])
+
+    def test_failed_poll_is_reported_to_the_scheduler(self):
+        self.device.update()
+        self.device.states['/properties'] = ConnectionError('properties')
+        self.device.states['/events'] = [{'overheated': {'data': 90}}, {'overheated': {'data': 95}}]
+        # The PollScheduler backs off on the error, after the events were applied.
+        with self.assertRaises(ConnectionError):
+            self.device.run_sync(self.device.async_update())
+        assert (len(self.device.events) == 2)
+
+    def test_missing_thing_description_raises(self):
+        self.device.states['/'] = ConnectionError('thing')
+        with self.assertRaises(ConnectionError):
+            self.device.update()
+        assert (self.device.events == [{'overheated': {'data': 90}}])
+
+
+@unittest.skipIf(PollDevice is None, 'requires the Gateway add-on library')
+class TestURLDeviceETag(unittest.TestCase):
+
+    url = 'http://thing'
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+        self.adapter = FakeAdapter(self.loop_thread, {self.url + '/'          : THING,
+                                                      self.url + '/properties': {'on': True, 'level': 3},
+                                                      self.url + '/events'    : [],
+                                                      })
+        self.session = self.adapter.http_pool.session()
+        self.device = URLDevice(self.adapter, 'url', self.url)
+
+    def tearDown(self):
+        self.adapter.manager_proxy.dispatcher.shutdown(wait = True)
+        self.loop_thread.stop(timeout = 1)
+
+    def test_not_modified_keeps_the_cached_thing(self):
+        assert (self.device.thing_state == THING)
+        etag = self.session.etag(self.url + '/')
+        assert (self.device.thing_validator == etag)
+
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) is None)
+        assert (self.session.requests[-1] == ('GET', self.url + '/', {'If-None-Match': etag}))
+        assert (self.device.thing_validator == etag)
+
+    def test_modified_fetches_the_thing(self):
+        changed = dict(THING, name = 'dimmer')
+        self.session.states[self.url + '/'] = changed
+
+        assert (self.device.run_sync(self.device.fetch_thing_if_changed()) == changed)
+        assert (self.device.thing_validator == self.session.etag(self.url + '/'))
+
+
+if __name__ == '__main__':
+    unittest.main()
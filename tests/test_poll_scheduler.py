@@ -0,0 +1,123 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import time
+import unittest
+
+from pkg import parameters
+from pkg.poll_scheduler import AdaptiveInterval, PollScheduler
+from pkg.utils.utils import EventLoopThread
+
+
+class FakeDevice:
+
+    def __init__(self, _id, duration = 0.0):
+        self.id = _id
+        self.name = _id
+        self.duration = duration
+        self.polls = 0
+        self.cancelled = False
+
+    async def async_update(self):
+        try:
+            await asyncio.sleep(self.duration)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.polls += 1
+        return 0
+
+    def has_sensors(self):
+        return True
+
+
+class TestAdaptiveInterval(unittest.TestCase):
+
+    def test_changes_speed_up_and_stable_backs_off(self):
+        interval = AdaptiveInterval(8, floor = 1, ceiling = 60)
+        interval.on_success(changes = 3)
+        assert (interval.value == 4)
+        interval.on_success(changes = 0)
+        assert (interval.value == 5)
+
+    def test_failures_back_off(self):
+        interval = AdaptiveInterval(8, floor = 1, ceiling = 60)
+        interval.on_failure()
+        assert (interval.value == 16)
+        assert (interval.failures == 1)
+
+    def test_defaults_come_from_parameters(self):
+        interval = AdaptiveInterval(1000)
+        assert ((interval.floor, interval.ceiling) == (parameters.POLL_FLOOR, parameters.POLL_CEILING))
+        assert (interval.value == parameters.POLL_CEILING)
+
+    def test_stays_within_bounds(self):
+        interval = AdaptiveInterval(100, floor = 2, ceiling = 30)
+        assert (interval.value == 30)
+        for _ in range(10):
+            interval.on_success(changes = 1)
+        assert (interval.value == 2)
+        for _ in range(20):
+            interval.on_failure()
+        assert (interval.value == 30)
+
+
+class TestPollScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.loop_thread = EventLoopThread()
+        self.loop_thread.start()
+
+    def tearDown(self):
+        self.loop_thread.stop(timeout = 1)
+
+    def make_scheduler(self, **kwargs):
+        scheduler = PollScheduler(self.loop_thread.loop, floor = 0.01, **kwargs)
+        scheduler.start()
+        return scheduler
+
+    def test_polls_every_device_repeatedly(self):
+        scheduler = self.make_scheduler(interval = 0.05)
+        devices = [FakeDevice(str(i)) for i in range(50)]
+        for device in devices:
+            scheduler.add(device)
+
+        time.sleep(0.4)
+        assert (all(device.polls >= 2 for device in devices))
+
+    def test_concurrency_is_bounded(self):
+        scheduler = self.make_scheduler(interval = 0.01, max_concurrent = 3)
+        running = []
+        peak = []
+
+        class CountingDevice(FakeDevice):
+            async def async_update(self):
+                running.append(self)
+                peak.append(len(running))
+                await asyncio.sleep(0.02)
+                running.remove(self)
+
+        for i in range(20):
+            scheduler.add(CountingDevice(str(i)))
+
+        time.sleep(0.3)
+        assert (peak and max(peak) <= 3)
+
+    def test_remove_cancels_running_poll(self):
+        scheduler = self.make_scheduler(interval = 0.01)
+        device = FakeDevice('slow', duration = 10)
+        scheduler.add(device)
+        time.sleep(0.1)
+
+        started = time.monotonic()
+        scheduler.remove(device.id)
+        time.sleep(0.05)
+        assert (device.cancelled)
+        assert (time.monotonic() - started < 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import unittest
+
+from webthing_ace_common.push_queue import PushQueue
+
+
+class FakeConnection:
+
+    def __init__(self, delay = 0.0, fail = False):
+        self.delay = delay
+        self.fail = fail
+        self.frames = []
+        self.evicted = []
+
+    async def send(self, message):
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError('closed')
+        self.frames.append(message)
+
+    def on_evict(self, reason):
+        self.evicted.append(reason)
+
+
+class TestPushQueue(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_queue(self, connection, messages, seconds = 0.05, **kwargs):
+
+        async def run():
+            queue = PushQueue(connection.send, on_evict = connection.on_evict, **kwargs)
+            results = [queue.put(message) for message in messages]
+            await asyncio.sleep(seconds)
+            queue.close()
+            return queue, results
+
+        return self.loop.run_until_complete(run())
+
+    def test_in_order(self):
+        connection = FakeConnection()
+        queue, results = self.run_queue(connection, range(10))
+
+        assert (all(results))
+        assert (connection.frames == list(range(10)))
+        assert (queue.stats['sent'] == 10)
+        assert (len(queue) == 0)
+        assert (queue.evicted is None)
+
+    def test_evict_when_full(self):
+        connection = FakeConnection(delay = 1)
+        queue, results = self.run_queue(connection, range(5), max_pending = 3)
+
+        assert (results == [True, True, True, False, False])
+        assert (queue.evicted is not None)
+        assert (len(connection.evicted) == 1)
+        assert (len(queue) == 0)
+        assert (not queue.put('late'))
+
+    def test_evict_when_stalled(self):
+        connection = FakeConnection(delay = 1)
+        queue, _ = self.run_queue(connection, ['a', 'b'], seconds = 0.1, max_stall = 0.02)
+
+        assert (connection.frames == [])
+        assert (queue.evicted is not None)
+        assert (len(connection.evicted) == 1)
+
+    def test_evict_when_failed(self):
+        connection = FakeConnection(fail = True)
+        queue, _ = self.run_queue(connection, ['a', 'b'])
+
+        assert (queue.stats['sent'] == 0)
+        assert (len(connection.evicted) == 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
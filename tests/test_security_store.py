@@ -0,0 +1,308 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from ecdsa import NIST256p, SigningKey, VerifyingKey
+
+from webthing_ace_common.keys import precompute_key
+from webthing_ace_common.security_store import SecurityStore, SharedOscoreContext, UnsafeStoreError, \
+    check_durable_path, load_key, new_key
+
+
+class FakeContext:
+
+    def __init__(self):
+        self.sequence_number = 0
+
+    def encrypt(self, data):
+        self.sequence_number += 1
+        return self.sequence_number, data
+
+    def decrypt(self, data):
+        return data
+
+
+class FakeEdhocServer:
+
+    def __init__(self):
+        self.peers = {}
+        self.contexts = {}
+
+    def add_peer_identity(self, key_id, key):
+        self.peers[key_id] = key
+        self.contexts[key_id] = FakeContext()
+
+
+class FakeResourceServer:
+    """ Stands in for `ace.rs.resource_server.ResourceServer`. """
+
+    def __init__(self):
+        self.token_cache = {}
+        self.edhoc_server = FakeEdhocServer()
+
+    def oscore_context(self, unprot, scope):
+        return self.edhoc_server.contexts[unprot]
+
+
+def add_peer(rs, key_id):
+    rs.token_cache[key_id] = 'token'
+    rs.edhoc_server.add_peer_identity(key_id, 'key')
+
+
+def encrypt(rs, key_id, data):
+    return rs.edhoc_server.contexts[key_id].encrypt(data)
+
+
+class TestSecurityStore(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix = '.sqlite')
+        os.close(fd)
+        self.key = new_key()
+        parent = SecurityStore(self.path, FakeResourceServer(), self.key)
+        parent.publish()
+        # Two workers, as after forking.
+        self.a = SecurityStore(self.path, FakeResourceServer(), self.key)
+        self.b = SecurityStore(self.path, FakeResourceServer(), self.key)
+
+    def tearDown(self):
+        self.a.close()
+        self.b.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def test_peer_added_in_one_worker_is_known_to_the_other(self):
+        self.a.write(add_peer, b'kid')
+        assert (self.b.read(lambda rs: rs.token_cache.get(b'kid')) == 'token')
+
+    def test_sequence_numbers_are_never_reused(self):
+        self.a.write(add_peer, b'kid')
+        seen = [self.a.write(encrypt, b'kid', b'x')[0],
+                self.b.write(encrypt, b'kid', b'x')[0],
+                self.b.write(encrypt, b'kid', b'x')[0],
+                self.a.write(encrypt, b'kid', b'x')[0]]
+        assert (seen == [1, 2, 3, 4])
+
+    def test_reloads_only_when_changed(self):
+        self.a.write(add_peer, b'kid')
+        self.b.read(lambda rs: None)
+        reloads = self.b.stats['reloads']
+        self.b.read(lambda rs: None)
+        assert (self.b.stats['reloads'] == reloads)
+
+    def test_failed_write_is_rolled_back(self):
+        self.a.write(add_peer, b'kid')
+
+        def fail(rs):
+            rs.edhoc_server.contexts[b'kid'].encrypt(b'x')
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            self.a.write(fail)
+        assert (self.a.write(encrypt, b'kid', b'x')[0] == 1)
+
+
+    def test_shared_context_resolves_within_the_transaction(self):
+        self.a.write(add_peer, b'kid')
+        context_a = SharedOscoreContext(self.a, b'kid', 'GET /')
+        context_b = SharedOscoreContext(self.b, b'kid', 'GET /')
+        assert (context_a.encrypt(b'x') == (1, b'x'))
+        assert (context_b.encrypt(b'x') == (2, b'x'))
+        assert (context_b.decrypt(b'y') == b'y')
+
+    def test_contexts_are_stored_in_rows_of_their_own(self):
+        self.a.write(add_peer, b'kid')
+        self.a.write(add_peer, b'other')
+        context_a = SharedOscoreContext(self.a, b'kid', 'GET /')
+        context_b = SharedOscoreContext(self.b, b'kid', 'GET /')
+        assert (context_a.encrypt(b'x') == (1, b'x'))
+        version = self.a._version
+
+        seen = [context_b.encrypt(b'x')[0], context_a.encrypt(b'x')[0], context_b.encrypt(b'x')[0]]
+        assert (seen == [2, 3, 4])
+        # Only the first use of the context stored the state.
+        assert (self.a._version == version)
+        assert (self.b.stats['context_reloads'] == 1)
+        assert (SharedOscoreContext(self.b, b'other', 'GET /').encrypt(b'x') == (1, b'x'))
+
+    def test_new_edhoc_session_replaces_the_stored_context(self):
+        self.a.write(add_peer, b'kid')
+        context_a = SharedOscoreContext(self.a, b'kid', 'GET /')
+        context_a.encrypt(b'x')
+        context_a.encrypt(b'x')
+
+        self.b.write(add_peer, b'kid')
+        assert (context_a.encrypt(b'x') == (1, b'x'))
+        assert (SharedOscoreContext(self.b, b'kid', 'GET /').encrypt(b'x') == (2, b'x'))
+        connection = self.a._connect()
+        assert (connection.execute('SELECT COUNT(*) FROM oscore_context').fetchone()[0] == 1)
+
+    def test_ecdsa_keys_are_stored_without_their_tables(self):
+        signing_key = SigningKey.generate(curve = NIST256p)
+        verifying_key = precompute_key(VerifyingKey.from_string(signing_key.verifying_key.to_string(), curve = NIST256p))
+
+        def add_keys(rs):
+            rs.edhoc_server.peers[b'kid'] = verifying_key
+            rs.edhoc_server.peers[b'own'] = signing_key
+
+        self.a.write(add_keys)
+        state, = self.a._connect().execute('SELECT state FROM security_state').fetchone()
+        assert (len(state) < 1000)
+
+        peers = self.b.read(lambda rs: rs.edhoc_server.peers)
+        assert (peers[b'kid'].to_string() == verifying_key.to_string())
+        assert (peers[b'kid'].verify(peers[b'own'].sign(b'x'), b'x'))
+        # Not precomputed, as *b* does not precompute keys.
+        assert (peers[b'kid'].pubkey.point.order() is None)
+
+    def test_restored_keys_are_precomputed(self):
+        signing_key = SigningKey.generate(curve = NIST256p)
+        verifying_key = VerifyingKey.from_string(signing_key.verifying_key.to_string(), curve = NIST256p)
+        self.a.write(lambda rs: rs.edhoc_server.peers.update({b'kid': verifying_key}))
+
+        store = SecurityStore(self.path, FakeResourceServer(), self.key, precompute_keys = True)
+        restored = store.read(lambda rs: rs.edhoc_server.peers[b'kid'])
+        store.close()
+        assert (restored.pubkey.point.order() == NIST256p.order)
+        assert (restored.verify(signing_key.sign(b'x'), b'x'))
+        # Reloading the state reuses the restored keys, instead of precomputing them again.
+        self.a.write(add_peer, b'other')
+        assert (store.read(lambda rs: rs.edhoc_server.peers[b'kid']) is restored)
+
+    def test_tampered_context_is_refused(self):
+        self.a.write(add_peer, b'kid')
+        SharedOscoreContext(self.a, b'kid', 'GET /').encrypt(b'x')
+        self.a._connect().execute('UPDATE oscore_context SET state = ?', (b'not what was stored',))
+        with self.assertRaises(UnsafeStoreError):
+            SharedOscoreContext(self.b, b'kid', 'GET /').encrypt(b'x')
+
+    def test_files_are_private(self):
+        self.a.write(add_peer, b'kid')
+        for suffix in ('', '-wal', '-shm'):
+            assert (os.stat(self.path + suffix).st_mode & 0o777 == 0o600)
+
+    def test_file_others_may_access_is_refused(self):
+        self.a.close()
+        os.chmod(self.path, 0o644)
+        with self.assertRaises(UnsafeStoreError):
+            self.a.read(lambda rs: None)
+
+    def test_state_under_another_key_is_refused(self):
+        self.a.write(add_peer, b'kid')
+        other = SecurityStore(self.path, FakeResourceServer(), new_key())
+        with self.assertRaises(UnsafeStoreError):
+            other.read(lambda rs: None)
+        assert (other.rs.token_cache == {})
+        other.close()
+
+
+class TestSecurityStoreRestart(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix = '.sqlite')
+        os.close(fd)
+        os.remove(self.path)
+        self.key = new_key()
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm', '.key'):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+
+    def stored(self):
+        """ Store a peer as a previous run of the server would have. """
+        store = SecurityStore(self.path, FakeResourceServer(), self.key, durable = True)
+        store.publish()
+        store.write(add_peer, b'kid')
+        store.close()
+
+    def restarted(self, key = None):
+        return SecurityStore(self.path, FakeResourceServer(), key or self.key, durable = True)
+
+    def test_state_survives_a_restart(self):
+        store = SecurityStore(self.path, FakeResourceServer(), self.key, durable = True)
+        assert (not store.restore())
+        store.publish()
+        store.write(add_peer, b'kid')
+        store.write(encrypt, b'kid', b'x')
+        store.close()
+
+        # After the restart.
+        rs = FakeResourceServer()
+        store = SecurityStore(self.path, rs, self.key, durable = True)
+        assert (store.restore())
+        assert (rs.token_cache == {b'kid': 'token'})
+        assert (store.write(encrypt, b'kid', b'x')[0] == 2)
+        store.close()
+
+    def test_contexts_survive_a_restart(self):
+        store = SecurityStore(self.path, FakeResourceServer(), self.key, durable = True)
+        store.publish()
+        store.write(add_peer, b'kid')
+        SharedOscoreContext(store, b'kid', 'GET /').encrypt(b'x')
+        SharedOscoreContext(store, b'kid', 'GET /').encrypt(b'x')
+        store.close()
+
+        store = SecurityStore(self.path, FakeResourceServer(), self.key, durable = True)
+        assert (store.restore())
+        assert (SharedOscoreContext(store, b'kid', 'GET /').encrypt(b'x') == (3, b'x'))
+        store.close()
+
+    def test_tampered_state_is_not_loaded(self):
+        self.stored()
+        connection = sqlite3.connect(self.path)
+        connection.execute('UPDATE security_state SET state = ? WHERE id = 0', (b'not what was stored',))
+        connection.commit()
+        connection.close()
+
+        store = self.restarted()
+        with self.assertRaises(UnsafeStoreError):
+            store.restore()
+        assert (store.rs.token_cache == {})
+
+    def test_state_under_another_key_is_not_loaded(self):
+        self.stored()
+        store = self.restarted(key = new_key())
+        with self.assertRaises(UnsafeStoreError):
+            store.restore()
+        assert (store.rs.token_cache == {})
+
+    def test_file_others_may_write_is_not_loaded(self):
+        self.stored()
+        os.chmod(self.path, 0o666)
+        store = self.restarted()
+        with self.assertRaises(UnsafeStoreError):
+            store.restore()
+        assert (store.rs.token_cache == {})
+
+    @unittest.skipIf(not hasattr(os, 'geteuid') or os.geteuid() != 0, 'changing the owner of a file requires root')
+    def test_file_of_another_user_is_not_loaded(self):
+        self.stored()
+        os.chown(self.path, 65534, 65534)
+        store = self.restarted()
+        with self.assertRaises(UnsafeStoreError):
+            store.restore()
+        assert (store.rs.token_cache == {})
+
+    def test_key_survives_a_restart(self):
+        key = load_key(self.path + '.key')
+        assert (load_key(self.path + '.key') == key)
+        assert (os.stat(self.path + '.key').st_mode & 0o777 == 0o600)
+
+    def test_durable_store_needs_a_path_outside_the_temp_directory(self):
+        with self.assertRaises(ValueError):
+            check_durable_path(None)
+        with self.assertRaises(ValueError):
+            check_durable_path(self.path)
+        check_durable_path('/var/lib/ace_rs/security_state.sqlite')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from webthing_ace_common.stage_metrics import Histogram, StageMetrics
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_percentiles_are_bucket_bounds(self):
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.add(0.0001)
+        for _ in range(10):
+            histogram.add(0.01)
+
+        # 100 us falls into the bucket up to 128 us, 10 ms into the one up to 16.384 ms, capped by the maximum.
+        assert (abs(histogram.percentile(50) - 0.000128) < 1e-9)
+        assert (histogram.percentile(99) == 0.01)
+        assert (histogram.as_dict()['count'] == 100)
+
+    def test_empty(self):
+        assert (Histogram().percentile(50) is None)
+        assert (Histogram().as_dict()['p99_ms'] is None)
+
+
+class TestStageMetrics(unittest.TestCase):
+
+    def test_disabled_records_nothing(self):
+        metrics = StageMetrics()
+        started = metrics.start()
+        assert (started is None)
+        assert (metrics.lap('decrypt', started) is None)
+        assert (metrics.snapshot()['stages'] == {})
+
+    def test_laps_chain_stages(self):
+        metrics = StageMetrics(enabled = True)
+        started = metrics.start()
+        started = metrics.lap('cose_parse', started)
+        metrics.lap('decrypt', started)
+
+        stages = metrics.snapshot()['stages']
+        assert (set(stages) == {'cose_parse', 'decrypt'})
+        assert (stages['decrypt']['count'] == 1)
+
+    def test_toggle_and_reset(self):
+        metrics = StageMetrics(enabled = True)
+        metrics.record('encrypt', 0.001)
+        metrics.toggle()
+        assert (not metrics.enabled)
+        assert (metrics.start() is None)
+        metrics.reset()
+        assert (metrics.snapshot()['stages'] == {})
+
+    def test_dump_periodically(self):
+        metrics = StageMetrics(enabled = True)
+        metrics.record('thing', 0.002)
+        with tempfile.TemporaryDirectory() as directory:
+            dump_path = os.path.join(directory, 'metrics.json')
+            loop = asyncio.new_event_loop()
+            try:
+                metrics.dump_periodically(loop, dump_path, interval = 0.01)
+                loop.run_until_complete(asyncio.sleep(0.05))
+                metrics.stop_dumps()
+            finally:
+                loop.close()
+
+            with open(dump_path) as f:
+                dumped = json.load(f)
+            assert (dumped['stages']['thing']['count'] == 1)
+            assert (not os.path.exists(dump_path + '.tmp'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import unittest
+
+from cbor2 import loads
+from webthing import Property, Thing, Value
+
+from webthing_ace_common.td_cache import ThingDescriptionCache, fingerprint
+
+
+def make_thing(_id):
+    thing = Thing(_id, _id, ['MultiLevelSensor'], 'A thing.')
+    thing.add_property(Property(thing, 'level', Value(0), metadata = {'type': 'number'}))
+    return thing
+
+
+class TestThingDescriptionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = ThingDescriptionCache()
+        self.thing = make_thing('urn:dev:test-1')
+
+    def test_encodes_the_thing_description(self):
+        assert (loads(self.cache.encoded(self.thing)) == self.thing.as_thing_description())
+
+    def test_hit_until_thing_changes(self):
+        encoded = self.cache.encoded(self.thing)
+        validator = self.cache.validator(self.thing)
+        assert (self.cache.encoded(self.thing) is encoded)
+        assert (self.cache.misses == 1)
+
+        self.thing.set_href_prefix('/0')
+        assert (self.cache.validator(self.thing) != validator)
+        assert (loads(self.cache.encoded(self.thing)) == self.thing.as_thing_description())
+        assert (self.cache.misses == 2)
+
+    def test_adding_a_property_invalidates(self):
+        validator = self.cache.validator(self.thing)
+        self.thing.add_property(Property(self.thing, 'on', Value(True), metadata = {'type': 'boolean'}))
+        assert (self.cache.validator(self.thing) != validator)
+
+    def test_changing_metadata_invalidates(self):
+        validator = self.cache.validator(self.thing)
+        self.thing.find_property('level').metadata['unit'] = 'percent'
+        assert (self.cache.validator(self.thing) != validator)
+        assert (loads(self.cache.encoded(self.thing)) == self.thing.as_thing_description())
+
+        validator = self.cache.validator(self.thing)
+        self.thing.add_available_event('overheated', {'type': 'number'})
+        assert (self.cache.validator(self.thing) != validator)
+        validator = self.cache.validator(self.thing)
+        self.thing.available_events['overheated']['metadata']['unit'] = 'degree celsius'
+        assert (self.cache.validator(self.thing) != validator)
+
+    def test_encoded_all(self):
+        things = [self.thing, make_thing('urn:dev:test-2')]
+        encoded = self.cache.encoded_all(things)
+        assert (loads(encoded) == [thing.as_thing_description() for thing in things])
+        assert (self.cache.encoded_all(things) is encoded)
+        assert (self.cache.encoded_all(things[:1]) is not encoded)
+
+    def test_encoded_all_keeps_only_the_latest_set(self):
+        things = [self.thing, make_thing('urn:dev:test-2')]
+        for i in range(10):
+            things[1].set_href_prefix('/{}'.format(i))
+            self.cache.encoded_all(things)
+        assert (self.cache._all[0] == tuple(fingerprint(thing) for thing in things))
+        assert (self.cache.misses == 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
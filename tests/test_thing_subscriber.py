@@ -0,0 +1,83 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import asyncio
+import json
+import threading
+import unittest
+
+from webthing_ace_common.thing_subscriber import ThingSubscriber
+
+
+class FakeProperty:
+
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def get_name(self):
+        return self.name
+
+    def get_value(self):
+        return self.value
+
+
+class FakeEvent:
+
+    def as_event_description(self):
+        return {'proximity': {'timestamp': 'now'}}
+
+
+class TestThingSubscriber(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.properties = []
+        self.events = []
+        self.subscriber = ThingSubscriber(self.loop,
+                                          on_property = lambda name, value: self.properties.append((name, value)),
+                                          on_event = self.events.append)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def drain(self):
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+
+    def test_callbacks(self):
+        self.subscriber.update_property(FakeProperty('led', True))
+        self.subscriber.update_event(FakeEvent())
+        self.subscriber.update_action(object())
+        assert (self.properties == [])
+        self.drain()
+        assert (self.properties == [('led', True)])
+        assert (self.events == [{'proximity': {'timestamp': 'now'}}])
+
+    def test_write_message_of_older_webthing(self):
+        self.subscriber.write_message(json.dumps({'messageType': 'propertyStatus',
+                                                  'data'       : {'led': False, 'temperature': 21}}))
+        self.subscriber.write_message(json.dumps({'messageType': 'event',
+                                                  'data'       : {'proximity': {}}}))
+        self.subscriber.write_message(json.dumps({'messageType': 'actionStatus', 'data': {}}))
+        self.drain()
+        assert (sorted(self.properties) == [('led', False), ('temperature', 21)])
+        assert (self.events == [{'proximity': {}}])
+
+    def test_changes_from_other_threads_arrive_on_the_loop(self):
+        seen = []
+        subscriber = ThingSubscriber(self.loop, on_property = lambda *_: seen.append(threading.get_ident()))
+        thread = threading.Thread(target = subscriber.update_property, args = (FakeProperty('led', True),))
+        thread.start()
+        thread.join()
+        self.drain()
+        assert (seen == [threading.get_ident()])
+
+    def test_closed_loop_drops(self):
+        self.loop.close()
+        self.subscriber.update_property(FakeProperty('led', True))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import unittest
+
+import tornado.testing
+import tornado.web
+import tornado.websocket
+from cbor2 import CBORTag, dumps, loads
+from webthing import Event, Property, SingleThing, Thing, Value
+
+try:
+    from ace.rs.resource_server import NotAuthorizedException
+    from webthing_ace_tornado.webthing.handlers import AceHandler, ThingHandler
+except ImportError:
+    # The ACE library is not installed.
+    ThingHandler = None
+
+
+class FakeOscoreContext:
+
+    def __init__(self, kid):
+        self.kid = kid
+
+    def encrypt(self, data):
+        return self.kid + b'|' + data
+
+    def decrypt(self, message):
+        return loads(message).value[2]
+
+
+class FakeResourceServer:
+    """ *scopes* maps the kid of every client to the scopes of its token. """
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+
+    def oscore_context(self, unprot, scope):
+        if scope not in self.scopes.get(unprot[4], ()):
+            raise NotAuthorizedException()
+        return FakeOscoreContext(unprot[4])
+
+
+def frame(kid, message_type, data):
+    return dumps(CBORTag(16, [b'', {4: kid}, dumps({'messageType': message_type, 'data': data})]))
+
+
+def decrypted(message, kid):
+    encrypted_for, _, data = message.partition(b'|')
+    assert (encrypted_for == kid)
+    return loads(data)
+
+
+def make_thing():
+    thing = Thing('urn:dev:test', 'Test Thing', [], 'A thing to push from.')
+    thing.add_property(Property(thing, 'led', Value(False), metadata = {'type': 'boolean'}))
+    thing.add_available_event('overheated', {'type': 'number'})
+    return thing
+
+
+@unittest.skipIf(ThingHandler is None, 'requires the ACE library')
+class TestPush(tornado.testing.AsyncHTTPTestCase):
+
+    def setUp(self):
+        self.rs = AceHandler.ace_rs
+        self.max_pending = ThingHandler.push_max_pending
+        AceHandler.ace_rs = FakeResourceServer({b'a': {'GET /', 'GET /properties', 'GET /events/overheated',
+                                                       'POST /properties/led'},
+                                                b'b': {'GET /'},
+                                                })
+        self.thing = make_thing()
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        AceHandler.ace_rs = self.rs
+        ThingHandler.push_max_pending = self.max_pending
+
+    def get_app(self):
+        hosts = ['127.0.0.1:{}'.format(self.get_http_port())]
+        return tornado.web.Application([(r'/?', ThingHandler, dict(things = SingleThing(self.thing), hosts = hosts))])
+
+    async def connect(self, kid, message_type = 'addEventSubscription', data = None):
+        ws = await tornado.websocket.websocket_connect('ws://127.0.0.1:{}/'.format(self.get_http_port()))
+        ws.write_message(frame(kid, message_type, data or {'overheated': {}}), binary = True)
+        return ws
+
+    @tornado.testing.gen_test
+    async def test_pushes_properties_and_events(self):
+        ws = await self.connect(b'a')
+        await tornado.gen.sleep(0.05)
+
+        self.thing.set_property('led', True)
+        assert (decrypted(await ws.read_message(), b'a') == {'messageType': 'propertyStatus', 'data': {'led': True}})
+
+        self.thing.add_event(Event(self.thing, 'overheated', 102))
+        message = decrypted(await ws.read_message(), b'a')
+        assert (message['messageType'] == 'event')
+        assert (message['data']['overheated']['data'] == 102)
+        ws.close()
+
+    @tornado.testing.gen_test
+    async def test_frames_are_checked_against_their_scope(self):
+        ws = await self.connect(b'b')
+        message = decrypted(await ws.read_message(), b'b')
+        assert (message['messageType'] == 'error')
+        assert (message['data']['status'] == '403 Forbidden')
+
+        ws.write_message(frame(b'b', 'setProperty', {'led': True}), binary = True)
+        message = decrypted(await ws.read_message(), b'b')
+        assert (message['data']['status'] == '403 Forbidden')
+        assert (self.thing.get_property('led') is False)
+        ws.close()
+
+    @tornado.testing.gen_test
+    async def test_set_property(self):
+        ws = await self.connect(b'a', 'setProperty', {'led': True})
+        assert (decrypted(await ws.read_message(), b'a') == {'messageType': 'propertyStatus', 'data': {'led': True}})
+        assert (self.thing.get_property('led') is True)
+        ws.close()
+
+    @tornado.testing.gen_test
+    async def test_unauthorized_client_is_closed(self):
+        ws = await self.connect(b'c')
+        assert (await ws.read_message() is None)
+        assert (ws.close_code == 1008)
+
+    def test_plain_get_is_still_authorized(self):
+        response = self.fetch('/')
+        assert (response.code == 401)
+
+    @tornado.testing.gen_test
+    async def test_slow_consumer_is_evicted(self):
+        ThingHandler.push_max_pending = 2
+        ws = await self.connect(b'a')
+        await tornado.gen.sleep(0.05)
+
+        for value in (True, False, True, False):
+            self.thing.set_property('led', value)
+        while await ws.read_message() is not None:
+            pass
+        assert (ws.close_code == 1013)
+        assert (not self.thing.subscribers)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir))
+
+import unittest
+
+from webthing_ace_common.verified_tokens import VerifiedTokenCache
+
+
+class FakeClock:
+
+    def __init__(self, now = 1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestVerifiedTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = VerifiedTokenCache(max_entries = 2, clock = self.clock)
+
+    def test_hit_and_miss(self):
+        assert (self.cache.get(b'token') is None)
+        self.cache.put(b'token', {'aud': 'rpi_thing'}, 'pop_key', exp = 2000)
+        assert (self.cache.get(b'token') == ({'aud': 'rpi_thing'}, 'pop_key'))
+        assert (self.cache.stats()['hits'] == 1)
+        assert (self.cache.stats()['misses'] == 1)
+
+    def test_expired_tokens_are_dropped(self):
+        self.cache.put(b'token', {}, 'pop_key', exp = 1500)
+        self.clock.now = 1500
+        assert (self.cache.get(b'token') is None)
+        assert (self.cache.stats() == {'entries': 0, 'hits': 0, 'misses': 1, 'expired': 1})
+
+    def test_tokens_without_exp_do_not_expire(self):
+        self.cache.put(b'token', {}, 'pop_key')
+        self.clock.now = 10 ** 12
+        assert (self.cache.get(b'token') is not None)
+
+    def test_least_recently_used_is_evicted(self):
+        self.cache.put(b'a', {}, 'a')
+        self.cache.put(b'b', {}, 'b')
+        self.cache.get(b'a')
+        self.cache.put(b'c', {}, 'c')
+        assert (self.cache.get(b'b') is None)
+        assert (self.cache.get(b'a') is not None)
+        assert (self.cache.get(b'c') is not None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+# Create implicit path.
+import sys
+from os import path, pardir
+sys.path.append(path.join(path.dirname(path.abspath(__file__)), pardir, 'adapter', 'ace_url_adapter'))
+
+import asyncio
+import json
+import unittest
+
+import aiohttp
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+import tornado.websocket
+
+from pkg.websocket_subscription import WebSocketSubscription
+
+
+class FakeThingSocket(tornado.websocket.WebSocketHandler):
+    """ Speaks the WebSocket protocol of the plain WebThingServer, see `webthing.server.ThingHandler`. """
+
+    def initialize(self, server):
+        self.server = server
+
+    def open(self):
+        self.server.sockets.append(self)
+
+    def on_message(self, message):
+        message = json.loads(message)
+        self.server.received.append(message)
+        if message['messageType'] == 'setProperty':
+            self.write_message(json.dumps({'messageType': 'propertyStatus', 'data': message['data']}))
+
+
+class FakeServer:
+
+    def __init__(self):
+        self.sockets = []
+        self.received = []
+        application = tornado.web.Application([(r'/', FakeThingSocket, {'server': self})])
+        sockets = tornado.netutil.bind_sockets(0, '127.0.0.1')
+        self.port = sockets[0].getsockname()[1]
+        self.http_server = tornado.httpserver.HTTPServer(application)
+        self.http_server.add_sockets(sockets)
+
+    def push(self, message_type, data):
+        for socket in self.sockets:
+            socket.write_message(json.dumps({'messageType': message_type, 'data': data}))
+
+    def drop(self):
+        for socket in self.sockets:
+            socket.close()
+        self.sockets = []
+
+
+class FakeDevice:
+
+    def __init__(self, url):
+        self.id = 'fake'
+        self.url = url
+        self.messages = []
+        self.resyncs = 0
+
+    def ws_url(self):
+        return self.url
+
+    def event_names(self):
+        return ['overheated']
+
+    async def resync(self):
+        self.resyncs += 1
+
+    def on_message(self, message_type, data):
+        self.messages.append((message_type, data))
+
+
+class TestWebSocketSubscription(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.server = FakeServer()
+        self.device = FakeDevice('ws://127.0.0.1:%d/' % self.server.port)
+        self.session = None
+
+    def tearDown(self):
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+        self.server.http_server.stop()
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def session_factory(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+        return self.session
+
+    def until(self, condition, timeout = 2.0):
+
+        async def wait():
+            for _ in range(int(timeout / 0.01)):
+                if condition():
+                    return True
+                await asyncio.sleep(0.01)
+            return condition()
+
+        return self.loop.run_until_complete(wait())
+
+    def subscription(self):
+        subscription = WebSocketSubscription(self.device, self.loop, self.session_factory, retry_delay = 0.05)
+        subscription.start()
+        assert (self.until(lambda: subscription.connected))
+        return subscription
+
+    def test_subscribe_and_push(self):
+        subscription = self.subscription()
+
+        assert (self.until(lambda: self.server.received))
+        assert (self.server.received[0] == {'messageType': 'addEventSubscription', 'data': {'overheated': {}}})
+        assert (self.device.resyncs == 1)
+
+        self.server.push('propertyStatus', {'on': True})
+        self.server.push('event', {'overheated': {'timestamp': 't', 'data': 102}})
+        assert (self.until(lambda: len(self.device.messages) == 2))
+        assert (self.device.messages == [('propertyStatus', {'on': True}),
+                                         ('event', {'overheated': {'timestamp': 't', 'data': 102}})])
+        subscription.stop()
+        self.until(lambda: False, timeout = 0.05)
+
+    def test_send(self):
+        subscription = self.subscription()
+
+        sent = self.loop.run_until_complete(subscription.send('setProperty', {'level': 50}))
+        assert (sent)
+        assert (self.until(lambda: ('propertyStatus', {'level': 50}) in self.device.messages))
+        assert ({'messageType': 'setProperty', 'data': {'level': 50}} in self.server.received)
+        subscription.stop()
+        self.until(lambda: False, timeout = 0.05)
+
+    def test_reconnect(self):
+        subscription = self.subscription()
+
+        self.server.drop()
+        assert (self.until(lambda: not subscription.connected))
+        assert (not self.loop.run_until_complete(subscription.send('setProperty', {'level': 50})))
+        assert (self.until(lambda: subscription.connected))
+        assert (subscription.stats['connects'] == 2)
+        assert (self.device.resyncs == 2)
+        subscription.stop()
+        self.until(lambda: False, timeout = 0.05)
+
+    def test_backoff(self):
+        self.server.http_server.stop()
+        self.device.url = 'ws://127.0.0.1:1/'
+        subscription = WebSocketSubscription(self.device, self.loop, self.session_factory,
+                                             retry_delay = 0.01, max_retry_delay = 0.04)
+        subscription.start()
+        assert (self.until(lambda: subscription.stats['failures'] >= 4))
+        assert (not subscription.connected)
+        subscription.stop()
+        self.until(lambda: False, timeout = 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
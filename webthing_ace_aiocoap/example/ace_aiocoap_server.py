@@ -25,7 +25,12 @@ def run_server():
 
     server = CoapWebThingServer(things = SingleThing(thing),
                                 port = RS_PORT,
-                                hostname = HOST)
+                                hostname = HOST,
+                                precompute_keys = PRECOMPUTE_KEYS,
+                                persist = PERSIST_SECURITY_STATE,
+                                store_path = SECURITY_STORE_PATH,
+                                edhoc_key_pool = EDHOC_KEY_POOL,
+                                metrics = STAGE_METRICS)
     try:
         logging.info('Starting a CoapWebThingServer at [ ' + RS_URL + ' ].')
         server.start()
@@ -1,6 +1,9 @@
+import asyncio
+import collections
 import logging
 
 import ace.cose.cwt as cwt
+import aiocoap.error
 import aiocoap.resource
 from ace.cbor.constants import Keys
 from ace.cose.constants import Key
@@ -8,10 +11,17 @@ from ace.cose.cose import SignatureVerificationFailed
 from ace.cose.key import CoseKey
 from ace.rs.resource_server import ResourceServer, NotAuthorizedException
 from aiocoap.numbers.codes import Code
-from cbor2 import dumps, loads
+from cbor2 import CBORDecodeError, dumps, loads
 from webthing.errors import PropertyError
 
 from webthing_ace_aiocoap.parameters import *
+from webthing_ace_common.crypto_stage import CryptoStage
+from webthing_ace_common.keys import precompute_key
+from webthing_ace_common.security_store import SharedOscoreContext, add_token, edhoc_receive, oscore_resolve
+from webthing_ace_common.stage_metrics import StageMetrics
+from webthing_ace_common.td_cache import ThingDescriptionCache
+from webthing_ace_common.thing_subscriber import ThingSubscriber
+from webthing_ace_common.verified_tokens import VerifiedTokenCache
 from webthing_ace_aiocoap.webthing.errors import *
 
 
@@ -27,6 +37,31 @@ class AceHandler(aiocoap.resource.Resource):
                         identity = RS_IDENTITY,
                         as_url = PI_AS_URL,
                         as_public_key = AS_PUBLIC_KEY)
+    # CBOR encoded Thing Descriptions, shared by ThingsHandler and ThingHandler
+    td_cache = ThingDescriptionCache()
+    # CWT verification and OSCORE off the event loop, replaced by CoapWebThingServer
+    crypto = CryptoStage()
+    # Tokens which were uploaded before skip the signature check
+    verified_tokens = VerifiedTokenCache()
+    # Warm the verification tables of PoP keys, set by CoapWebThingServer
+    precompute_keys = False
+    # State kept across restarts, set by CoapWebThingServer
+    security_store = None
+    # Pre-generated EDHOC ephemeral keys, set by CoapWebThingServer
+    edhoc_keys = None
+    # Latency histograms of the request pipeline, switched on by CoapWebThingServer or at runtime
+    metrics = StageMetrics()
+
+    @staticmethod
+    async def change_state(fn, *args):
+        """
+        Run *fn(rs, \\*args)*, which changes the security state.\n
+        With a *security_store* this happens on the crypto stage,
+        within a transaction on the stored state.
+        """
+        if AceHandler.security_store is None:
+            return fn(AceHandler.rs, *args)
+        return await AceHandler.crypto.oscore(AceHandler.security_store.write, fn, *args)
 
 
 class AuthzHandler(AceHandler):
@@ -38,29 +73,39 @@ class AuthzHandler(AceHandler):
 
     async def render_post(self, request):
         access_token: bytes = request.payload
+        started = AceHandler.metrics.start()
 
-        # Verify if CWT from AS is valid
-        try:
-            decoded = cwt.decode(encoded = access_token,
-                                 key = AceHandler.rs.as_public_key)
+        verified = AceHandler.verified_tokens.get(access_token)
+        if verified is not None:
+            # Uploaded before, e.g. after a reconnect.
+            decoded, pop_key = verified
+        else:
+            # Verify if CWT from AS is valid
+            try:
+                decoded = await AceHandler.crypto.verify(cwt.decode,
+                                                         encoded = access_token,
+                                                         key = AceHandler.rs.as_public_key)
 
-        except SignatureVerificationFailed:
-            return aiocoap.Message(code = Code.UNAUTHORIZED)
+            except SignatureVerificationFailed:
+                return aiocoap.Message(code = Code.UNAUTHORIZED)
+            pop_key = None
+        started = AceHandler.metrics.lap('authz.verify', started)
 
         # Check if audience claim in token matches audience id of this RS.
         if decoded[Keys.AUD] != AceHandler.rs.audience:
             return aiocoap.Message(code = Code.FORBIDDEN)
 
-        # Extract PoP CoseKey.
-        pop_key: CoseKey = CoseKey.from_cose(decoded[Keys.CNF][Key.COSE_KEY])
-
-        # Store token and PoP key id.
-        AceHandler.rs.token_cache.add_token(token = decoded,
-                                            pop_key_id = pop_key.key_id)
+        if pop_key is None:
+            # Extract PoP CoseKey.
+            pop_key: CoseKey = CoseKey.from_cose(decoded[Keys.CNF][Key.COSE_KEY])
+            if AceHandler.precompute_keys:
+                await asyncio.get_event_loop().run_in_executor(None, precompute_key, pop_key.key)
+            AceHandler.verified_tokens.put(access_token, decoded, pop_key, exp = decoded.get(Keys.EXP))
+        started = AceHandler.metrics.lap('authz.pop_key', started)
 
-        # Inform EDHOC Server about new key.
-        AceHandler.rs.edhoc_server.add_peer_identity(key_id = pop_key.key_id,
-                                                     key = pop_key.key)
+        # Store token and PoP key id, inform EDHOC Server about new key.
+        await AceHandler.change_state(add_token, decoded, pop_key)
+        AceHandler.metrics.lap('authz.add_token', started)
 
         logging.info('AuthzInfo returning.')
         return aiocoap.Message(code = Code.CREATED)
@@ -70,23 +115,66 @@ class EdhocHandler(AceHandler):
 
     async def render_post(self, request):
         message = request.payload
-        response = AceHandler.rs.edhoc_server.on_receive(message)
+        started = AceHandler.metrics.start()
+        response = await AceHandler.change_state(edhoc_receive, message)
+        AceHandler.metrics.lap('edhoc.receive', started)
         return aiocoap.Message(code = Code.CREATED,
                                payload = bytes(response))
 
 
+class RequestContext:
+    """
+    State of one request, created by `BaseHandler.render()` and passed to `render_$(request, context)`.\n
+    Handlers are long-lived resources which serve overlapping requests,
+    thus nothing which belongs to a single request may be kept on them.
+    """
+
+    __slots__ = ('scope', 'oscore_context', 'thing')
+
+    def __init__(self, scope, oscore_context = None):
+        self.scope = scope
+        self.oscore_context = oscore_context
+        self.thing = None
+
+
 class BaseHandler(AceHandler):
     """
-    Checks authorization.
+    Checks authorization, then delegates to `render_$(request, context)` with a `RequestContext`.\n
+    The stages are timed into *metrics*: cose_parse, oscore_resolve, handler (the `render_$` method),
+    decrypt, cbor_encode and encrypt within it, and request for all of them.
+    The time spent in the thing is what handler leaves to the stages within it.
     """
 
     def __init__(self, things, coap_uri):
         super().__init__()
         self.things = things
         self.coap_uri = coap_uri
-        self.oscore_context = None
 
     async def render(self, request):
+        """
+        Resolve the OSCORE context of *request* into a new `RequestContext`,
+        then delegate to `render_$()` like `aiocoap.resource.Resource.render()` does.
+        """
+        request_started = AceHandler.metrics.start()
+        context = await self.resolve(request)
+        started = AceHandler.metrics.start()
+        method = getattr(self, 'render_%s' % str(request.code).lower(), None)
+        if method is None:
+            raise aiocoap.error.UnallowedMethod()
+        response = await method(request, context)
+        if response.code is None:
+            response.code = Code.CONTENT if request.code == Code.GET else Code.CHANGED
+        AceHandler.metrics.lap('handler', started)
+        AceHandler.metrics.lap('request', request_started)
+        return response
+
+    async def resolve(self, request):
+        """
+        Parse the COSE envelope of *request*, check its scope and resolve its OSCORE context.\n
+        :return: a new `RequestContext`.
+        :raise NotAuthorizedException: if the context does not exist or does not cover the scope.
+        :raise aiocoap.error.BadRequest: if the payload is no COSE envelope with a key id, answered with 4.00.
+        """
 
         def to_http(coap_uri: tuple) -> str:
             http_uri = ''
@@ -95,73 +183,211 @@ class BaseHandler(AceHandler):
             return http_uri
 
         scope = str(request.code) + ' ' + to_http(self.coap_uri)
-        prot, unprot, cipher = loads(request.payload).value
+        started = AceHandler.metrics.start()
+        context = RequestContext(scope)
         try:
-            self.oscore_context = AceHandler.rs.oscore_context(unprot, scope)
+            prot, unprot, cipher = loads(request.payload).value
+            started = AceHandler.metrics.lap('cose_parse', started)
+            if AceHandler.security_store is None:
+                context.oscore_context = oscore_resolve(AceHandler.rs, unprot, scope)
+            else:
+                # Checks the scope, the context is resolved again whenever it is used.
+                await AceHandler.crypto.oscore(AceHandler.security_store.read, oscore_resolve, unprot, scope)
+                context.oscore_context = SharedOscoreContext(AceHandler.security_store, unprot, scope)
         except NotAuthorizedException:
-            raise NotAuthorizedException
-        else:
-            return await super().render(request)
+            raise
+        except (CBORDecodeError, ValueError, TypeError, AttributeError, KeyError) as e:
+            # The payload is no CBOR, or no COSE envelope with a key id.
+            raise aiocoap.error.BadRequest('Malformed COSE envelope.') from e
+        AceHandler.metrics.lap('oscore_resolve', started)
+        return context
+
+    async def encrypt(self, cbor_data_dump, context):
+        """
+        Encrypt on the crypto stage.\n
+        :param context: `RequestContext` of the request, holds its OSCORE context.
+        """
+        started = AceHandler.metrics.start()
+        encrypted = await AceHandler.crypto.oscore(context.oscore_context.encrypt, cbor_data_dump)
+        AceHandler.metrics.lap('encrypt', started)
+        return encrypted
+
+    async def encrypt_response(self, payload, context):
+        """ CBOR encode *payload*, then *encrypt()* it. """
+        started = AceHandler.metrics.start()
+        cbor_data_dump = dumps(payload)
+        AceHandler.metrics.lap('cbor_encode', started)
+        return await self.encrypt(cbor_data_dump, context)
+
+    async def decrypt(self, payload, context):
+        """ Decrypt on the crypto stage, see *encrypt()*. """
+        started = AceHandler.metrics.start()
+        decrypted = await AceHandler.crypto.oscore(context.oscore_context.decrypt, payload)
+        AceHandler.metrics.lap('decrypt', started)
+        return decrypted
 
 
 class BaseThingHandler(BaseHandler):
     """
     Prepares all that is associated with a thing, such as:
       + `self.thing_id`
-      + the `self.thing is None` check
+      + `context.thing` and the `context.thing is None` check
     """
 
     def __init__(self, things, coap_uri):
         super().__init__(things, coap_uri)
         self.thing_id = coap_uri[0]
-        self.thing = None
 
-    # TODO: It would be elegant to replace render_$ with render. Be careful to avoid the recursion error.
-    # sync def render(self, request):
-    #    """
-    #    **render** delegates to **render_$**.
-    #    See `aiocoap.resource.Resource()`.
-    #    """
-    #
-    #    self.thing = self.things.get_thing(self.thing_id)
-    #    if self.thing is None:
-    #        raise ThingNotFoundException
-    #    else:
-    #        return await super().render(request)
-
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """
         Every `render_$` function is delegated by `.render()` in
         """
-        self.set_and_check_thing()
+        self.set_and_check_thing(context)
 
-    async def render_post(self, request):
-        self.set_and_check_thing()
+    async def render_post(self, request, context):
+        self.set_and_check_thing(context)
 
-    async def render_put(self, request):
-        self.set_and_check_thing()
+    async def render_put(self, request, context):
+        self.set_and_check_thing(context)
 
-    async def render_delete(self, request):
-        self.set_and_check_thing()
+    async def render_delete(self, request, context):
+        self.set_and_check_thing(context)
 
-    def set_and_check_thing(self):
-        self.thing = self.things.get_thing(self.thing_id)
-        if self.thing is None:
+    def set_and_check_thing(self, context):
+        context.thing = self.things.get_thing(self.thing_id)
+        if context.thing is None:
             raise ThingNotFoundException
 
 
+class Observer:
+    """ One observation of an `ObservableThingHandler`, with the changes it was not notified of yet. """
+
+    __slots__ = ('serverobservation', 'pending', 'notifying')
+
+    def __init__(self, serverobservation, pending):
+        self.serverobservation = serverobservation
+        self.pending = pending
+        # False until the first response, which carries the full state, was rendered.
+        self.notifying = False
+
+
+class ObservableThingHandler(BaseThingHandler, aiocoap.resource.ObservableResource):
+    """
+    A GET with the Observe option registers an observer, which then gets OSCORE protected notifications:
+      + the first response carries the full state, like a GET without Observe,
+      + every later one only what changed since the notification before, see `merge()` and `notification()`.
+    Changes come from the thing through a `ThingSubscriber`, which is subscribed while there are observers.
+    Observe is lossy, thus changes which arrive faster than notifications are sent are merged into the next one.
+    Every notification passes `resolve()`, thus an observer which is no longer authorized gets 4.01,
+    which ends its observation.
+    """
+
+    def __init__(self, things, coap_uri):
+        super().__init__(things, coap_uri)
+        # request -> Observer
+        self._observers = {}
+        self._subscriber = None
+        self._subscribed_thing = None
+
+    async def add_observation(self, request, serverobservation):
+        """ Accept the observation if *request* is an authorized GET, see `aiocoap.interfaces.ObservableResource`. """
+        if request.code != Code.GET:
+            return
+        # NOTE: aiocoap calls this outside of its error handling, thus nothing may be raised here.
+        try:
+            await self.resolve(request)
+        except (NotAuthorizedException, aiocoap.error.BadRequest):
+            # Not accepted, *render()* answers the request.
+            return
+
+        self._observers[request] = Observer(serverobservation, self.new_pending())
+
+        def cancel():
+            self._observers.pop(request, None)
+            self.update_observation_count(len(self._observers))
+
+        serverobservation.accept(cancel)
+        self.update_observation_count(len(self._observers))
+
+    def update_observation_count(self, count):
+        if count and self._subscriber is None:
+            thing = self.things.get_thing(self.thing_id)
+            if thing is None:
+                return
+            self._subscriber = ThingSubscriber(asyncio.get_event_loop(),
+                                               on_property = self.on_property,
+                                               on_event = self.on_event)
+            self._subscribed_thing = thing
+            self.subscribe(thing, self._subscriber)
+        elif not count and self._subscriber is not None:
+            self.unsubscribe(self._subscribed_thing, self._subscriber)
+            self._subscriber = None
+            self._subscribed_thing = None
+
+    async def render(self, request):
+        observer = self._observers.get(request)
+        if observer is None:
+            return await super().render(request)
+
+        if not observer.notifying:
+            observer.pending = self.new_pending()
+            response = await super().render(request)
+            observer.notifying = True
+            return response
+
+        try:
+            context = await self.resolve(request)
+        except NotAuthorizedException:
+            return aiocoap.Message(code = Code.UNAUTHORIZED)
+        changes, observer.pending = observer.pending, self.new_pending()
+        return aiocoap.Message(code = Code.CONTENT,
+                               payload = await self.encrypt_response(self.notification(changes), context))
+
+    def changed(self, change):
+        """ Merge *change* into what every observer has pending, and have notifications sent. """
+        for observer in self._observers.values():
+            self.merge(observer.pending, change)
+            observer.serverobservation.trigger()
+
+    def subscribe(self, thing, subscriber):
+        thing.add_subscriber(subscriber)
+
+    def unsubscribe(self, thing, subscriber):
+        thing.remove_subscriber(subscriber)
+
+    def on_property(self, name, value):
+        pass
+
+    def on_event(self, description):
+        pass
+
+    def new_pending(self):
+        """ :return: an empty collection of changes, { property name : value } unless overridden. """
+        return {}
+
+    def merge(self, pending, change):
+        pending.update(change)
+
+    def notification(self, pending):
+        """ :return: the payload of a notification of the *pending* changes. """
+        return pending
+
+
 class ThingsHandler(BaseHandler):
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """"""
-        response = [thing.as_thing_description()
-                    for idx, thing in enumerate(self.things.get_things())]
-        return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+        things = self.things.get_things()
+        if 'validator' in request.opt.uri_query:
+            response = dumps({'validator': self.td_cache.validator_all(things)})
+        else:
+            response = self.td_cache.encoded_all(things)
+        return aiocoap.Message(payload = await self.encrypt(response, context))
 
 
 class ThingHandler(BaseThingHandler):
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """
         This deviates from the WebThings spec, because WebSockets are not in scope of this project.
         STATUS:
@@ -169,38 +395,48 @@ class ThingHandler(BaseThingHandler):
           + TODO_ test normal, test errors, add bonus error handlers.
         """
         try:
-            await super().render(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.oscore_context.encrypt(dumps(self.thing.as_thing_description()))
-            return aiocoap.Message(payload = response)
+            if 'validator' in request.opt.uri_query:
+                response = dumps({'validator': self.td_cache.validator(context.thing)})
+            else:
+                response = self.td_cache.encoded(context.thing)
+            return aiocoap.Message(payload = await self.encrypt(response, context))
 
 
-class PropertiesHandler(BaseThingHandler):
-    """Handle a request to /properties."""
+class PropertiesHandler(ObservableThingHandler):
+    """
+    Handle a request to /properties.\n
+    Observers are notified with { name : value } of the properties which changed.
+    """
 
-    async def render_get(self, request):
+    def on_property(self, name, value):
+        self.changed({name: value})
+
+    async def render_get(self, request, context):
         """
         STATUS:
           + DONE_ match original, test normal
           + TODO_ , test errors, add bonus error handlers.
         """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.oscore_context.encrypt(dumps(self.thing.get_properties()))
+            response = await self.encrypt_response(context.thing.get_properties(), context)
             return aiocoap.Message(payload = response)
 
 
-class PropertyHandler(BaseThingHandler):
+class PropertyHandler(ObservableThingHandler):
     """
+    Observers are notified with { name : value } whenever the property changes.
     The`request` parameter has a `code` field, such as `GET`, `POST` and others.
     Supported codes: aiocoap.numbers.codes..
     diffrent from Tornado where  PropertyHandler.get() can have property as parameter,
@@ -213,56 +449,60 @@ class PropertyHandler(BaseThingHandler):
         _ = self.coap_uri.index('properties')
         self.property_name = coap_uri[_ + 1]
 
-    async def render_get(self, request):
+    def on_property(self, name, value):
+        if name == self.property_name:
+            self.changed({name: value})
+
+    async def render_get(self, request, context):
         """
         STATUS:
           + DONE_ match original, test normal.
           + TODO_ test errors, add bonus error handlers.
         """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            if self.thing.has_property(self.property_name):
+            if context.thing.has_property(self.property_name):
                 # NOTE: do not use `self.property` value, because that will always point at the original value.
-                _property_value = self.thing.get_property(self.property_name)
-                response = self.oscore_context.encrypt(dumps({self.property_name: _property_value}))
+                _property_value = context.thing.get_property(self.property_name)
+                response = await self.encrypt_response({self.property_name: _property_value}, context)
                 _ = self.get_link_description()
                 return aiocoap.Message(payload = response)
             else:
                 return aiocoap.Message(code = Code.NOT_FOUND)
 
-    async def render_post(self, request):
+    async def render_post(self, request, context):
         """
         STATUS:
           + DONE_ match original, test normal.
           + TODO_ test errors, add bonus error handlers.
         """
         try:
-            await super().render_post(request)
+            await super().render_post(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
             try:
-                args: dict = loads(self.oscore_context.decrypt(request.payload))
+                args: dict = loads(await self.decrypt(request.payload, context))
             except ValueError:
                 return aiocoap.Message(code = Code.BAD_REQUEST)
 
             if self.property_name not in args:
                 return aiocoap.Message(code = Code.BAD_REQUEST)
 
-            if self.thing.has_property(self.property_name):
+            if context.thing.has_property(self.property_name):
                 try:
-                    self.thing.set_property(self.property_name, args[self.property_name])
+                    context.thing.set_property(self.property_name, args[self.property_name])
                 except PropertyError:
                     return aiocoap.Message(code = Code.BAD_REQUEST)
                 response = b'OK'
-                return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+                return aiocoap.Message(payload = await self.encrypt_response(response, context))
             else:
                 return aiocoap.Message(code = Code.NOT_FOUND)
 
@@ -272,7 +512,7 @@ class ActionsHandler(BaseThingHandler):
     Handle GET or POST requests to /<thing_id>/actions .
     """
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """
         Return the description of the internal queue of actions.
         STATUS:
@@ -280,16 +520,16 @@ class ActionsHandler(BaseThingHandler):
           + TODO_  test normal, test errors, add bonus error handlers.
         """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.thing.get_action_descriptions()
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            response = context.thing.get_action_descriptions()
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
-    async def render_post(self, request):
+    async def render_post(self, request, context):
         """
         Add all supplied actions to the internal queue.\n
         As no action_name is supplied in URI,
@@ -301,14 +541,14 @@ class ActionsHandler(BaseThingHandler):
           + TODO_ test errors, add bonus error handlers.
         """
         try:
-            await super().render_post(request)
+            await super().render_post(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
             try:
-                args: dict = loads(self.oscore_context.decrypt(request.payload))
+                args: dict = loads(await self.decrypt(request.payload, context))
             except ValueError:
                 return aiocoap.Message(code = Code.BAD_REQUEST)
 
@@ -319,12 +559,12 @@ class ActionsHandler(BaseThingHandler):
                 if 'input' in action_params:
                     input_ = action_params['input']
 
-                action = self.thing.perform_action(action_name, input_)
+                action = context.thing.perform_action(action_name, input_)
                 if action:
                     response.update(action.as_action_description())
                     action.start()
 
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
 
 class ActionHandler(BaseThingHandler):
@@ -337,7 +577,7 @@ class ActionHandler(BaseThingHandler):
         _ = self.coap_uri.index('actions')
         self.action_name = coap_uri[_ + 1]
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """
         Return the description of the internal queue of actions.
         Only consider the actions whose name is `action_name`.
@@ -346,16 +586,16 @@ class ActionHandler(BaseThingHandler):
           + TODO_ test errors, add bonus error handlers.
         """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.thing.get_action_descriptions(action_name = self.action_name)
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            response = context.thing.get_action_descriptions(action_name = self.action_name)
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
-    async def render_post(self, request):
+    async def render_post(self, request, context):
         """
         Add action to the internal queue of actions.\n
         return -- status of action (.as_action_description)
@@ -364,14 +604,14 @@ class ActionHandler(BaseThingHandler):
           + TODO_ test errors, add bonus error handlers.
         """
         try:
-            await super().render_post(request)
+            await super().render_post(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
             try:
-                args: dict = loads(self.oscore_context.decrypt(request.payload))
+                args: dict = loads(await self.decrypt(request.payload, context))
             except ValueError:
                 return aiocoap.Message(code = Code.BAD_REQUEST)
 
@@ -384,12 +624,12 @@ class ActionHandler(BaseThingHandler):
                 if 'input' in action_params:
                     input_ = action_params['input']
 
-                action = self.thing.perform_action(name, input_)
+                action = context.thing.perform_action(name, input_)
                 if action:
                     response.update(action.as_action_description())
                     action.start()
 
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
 
 class ActionIDHandler(BaseThingHandler):
@@ -403,44 +643,44 @@ class ActionIDHandler(BaseThingHandler):
         self.action_name = coap_uri[_ + 1]
         self.action_id = coap_uri[_ + 2]
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """ """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            action = self.thing.get_action(self.action_name, self.action_id)
+            action = context.thing.get_action(self.action_name, self.action_id)
             if action is None:
                 return aiocoap.Message(code = Code.NOT_FOUND)
             response = action.as_action_description()
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
-    async def render_put(self, request):
+    async def render_put(self, request, context):
         try:
-            await super().render_put(request)
+            await super().render_put(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
             response = '(200: Not yet defined in the spec.)'
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
-    async def render_delete(self, request):
+    async def render_delete(self, request, context):
         """ """
         try:
-            await super().render_delete(request)
+            await super().render_delete(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            if self.thing.remove_action(self.action_name, self.action_id):
+            if context.thing.remove_action(self.action_name, self.action_id):
                 response = '(204: No Content)'
-                return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+                return aiocoap.Message(payload = await self.encrypt_response(response, context))
             else:
                 return aiocoap.Message(code = Code.NOT_FOUND)
 
@@ -450,37 +690,60 @@ class EventsHandler(BaseThingHandler):
     Handle GET requests to /<thing_id>/events .
     """
 
-    async def render_get(self, request):
+    async def render_get(self, request, context):
         """ """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.thing.get_event_descriptions()
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            response = context.thing.get_event_descriptions()
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
 
 
-class EventHandler(BaseThingHandler):
+class EventHandler(ObservableThingHandler):
     """
-    Handle GET requests to /<thing_id>/events/<event_name> .
+    Handle GET requests to /<thing_id>/events/<event_name> .\n
+    Observers are notified with the list of event descriptions which occurred since the notification before,
+    at most the last *max_pending_events* of them.
     """
 
+    max_pending_events = 64
+
     def __init__(self, things, coap_uri):
         super().__init__(things, coap_uri)
         _ = self.coap_uri.index('events')
         self.event_name = coap_uri[_ + 1]
 
-    async def render_get(self, request):
+    def subscribe(self, thing, subscriber):
+        thing.add_event_subscriber(self.event_name, subscriber)
+
+    def unsubscribe(self, thing, subscriber):
+        thing.remove_event_subscriber(self.event_name, subscriber)
+
+    def on_event(self, description):
+        if self.event_name in description:
+            self.changed(description)
+
+    def new_pending(self):
+        return collections.deque(maxlen = self.max_pending_events)
+
+    def merge(self, pending, change):
+        pending.append(change)
+
+    def notification(self, pending):
+        return list(pending)
+
+    async def render_get(self, request, context):
         """ """
         try:
-            await super().render_get(request)
+            await super().render_get(request, context)
         except NotAuthorizedException:
             return aiocoap.Message(code = Code.UNAUTHORIZED)
         except ThingNotFoundException:
             return aiocoap.Message(code = Code.NOT_FOUND)
         else:
-            response = self.thing.get_event_descriptions(event_name = self.event_name)
-            return aiocoap.Message(payload = self.oscore_context.encrypt(dumps(response)))
+            response = context.thing.get_event_descriptions(event_name = self.event_name)
+            return aiocoap.Message(payload = await self.encrypt_response(response, context))
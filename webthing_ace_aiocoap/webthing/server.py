@@ -1,8 +1,13 @@
 from webthing.utils import get_ip
 import asyncio
+import logging
 import aiocoap.resource
 from webthing import SingleThing, MultipleThings
 from webthing_ace_aiocoap.webthing.handlers import *
+from webthing_ace_common.crypto_stage import CryptoStage
+from webthing_ace_common.key_pool import EphemeralKeyPool
+from webthing_ace_common.keys import precompute_key
+from webthing_ace_common.security_store import SecurityStore, check_durable_path, load_key
 import socket
 from zeroconf import ServiceInfo, Zeroconf
 
@@ -10,18 +15,43 @@ from zeroconf import ServiceInfo, Zeroconf
 class CoapWebThingServer:
     """Server to represent a Web Thing over HTTP."""
 
-    def __init__(self, things, port = 8086, hostname = None):
+    def __init__(self, things, port = 8086, hostname = None, crypto_workers = 2, crypto_processes = False,
+                 precompute_keys = False, persist = False, store_path = None, edhoc_key_pool = 0,
+                 metrics = False, metrics_path = None, metrics_interval = 10):
         """
         Initialize the WebThingServer.\n
         :param things: SingleThing or MultipleThings managed by this server.
         :param port: port to listen on (defaults to 80)
         :param hostname: Optional host name, i.e. mything.com
+        :param crypto_workers: size of the pool which verifies access tokens
+        :param crypto_processes: verify access tokens in processes instead of threads
+        :param precompute_keys: warm the verification tables of the AS key now, and of PoP keys once they are uploaded
+        :param persist: keep tokens, PoP keys, EDHOC sessions and OSCORE contexts across restarts,
+            thus clients do not have to upload their token and run EDHOC again
+        :param store_path: SQLite file of *persist*, outside the temp directory,
+            its key is kept beside it in `<store_path>.key`
+        :param edhoc_key_pool: number of EDHOC ephemeral keys generated ahead of time, 0 to generate them in the handshake
+        :param metrics: record per-stage latency histograms from the start, SIGUSR1 switches them later
+        :param metrics_path: JSON file the histograms are written to every *metrics_interval* seconds
         """
         self.things = things
         self.name = things.get_name()
         self.port = port
         self.hostname = hostname
         self.ip = get_ip()
+        self.persist = persist
+        self.edhoc_key_pool = edhoc_key_pool
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        if persist:
+            check_durable_path(store_path)
+        self.store_path = store_path
+        AceHandler.crypto = CryptoStage(max_workers = crypto_workers,
+                                        use_processes = crypto_processes)
+        AceHandler.precompute_keys = precompute_keys
+        AceHandler.metrics.enabled = metrics
+        if precompute_keys:
+            precompute_key(AceHandler.rs.as_public_key)
 
         # Resource tree creation
         self.app = aiocoap.resource.Site()
@@ -100,10 +130,30 @@ class CoapWebThingServer:
         self.zeroconf = Zeroconf()
         self.zeroconf.register_service(self.service_info)
 
+        if self.persist:
+            store = SecurityStore(self.store_path, AceHandler.rs, load_key(self.store_path + '.key'), durable = True,
+                                  precompute_keys = AceHandler.precompute_keys)
+            if not store.restore():
+                store.publish()
+            AceHandler.security_store = store
+
+        if self.edhoc_key_pool:
+            AceHandler.edhoc_keys = EphemeralKeyPool(size = self.edhoc_key_pool)
+            if AceHandler.edhoc_keys.install(AceHandler.rs.edhoc_server):
+                AceHandler.edhoc_keys.start()
+
         asyncio.Task(aiocoap.Context.create_server_context(site = self.app,
                                                            bind = (self.hostname,
                                                                    self.port)))
 
+        AceHandler.metrics.install_signal()
+        if self.metrics_path is not None:
+            AceHandler.metrics.dump_periodically(asyncio.get_event_loop(),
+                                                 self.metrics_path,
+                                                 self.metrics_interval)
+
+        AceHandler.crypto.monitor(asyncio.get_event_loop())
+
         # Here would be a good point to generate an Event (if needed for prototyping).
 
         asyncio.get_event_loop().run_forever()
@@ -112,4 +162,15 @@ class CoapWebThingServer:
         """Stop listening for incoming connections."""
         self.zeroconf.unregister_service(self.service_info)
         self.zeroconf.close()
+        logging.info('Crypto stage: ' + str(AceHandler.crypto.stats()))
+        logging.info('Verified tokens: ' + str(AceHandler.verified_tokens.stats()))
+        if AceHandler.security_store is not None:
+            logging.info('Security store: ' + str(AceHandler.security_store.stats))
+        if AceHandler.edhoc_keys is not None:
+            logging.info('EDHOC key pool: ' + str(AceHandler.edhoc_keys.stats()))
+            AceHandler.edhoc_keys.stop()
+        AceHandler.metrics.stop_dumps()
+        if self.metrics_path is not None:
+            AceHandler.metrics.dump(self.metrics_path)
+        AceHandler.crypto.shutdown()
         asyncio.get_event_loop().stop()
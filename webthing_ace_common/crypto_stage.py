@@ -0,0 +1,116 @@
+"""
+Executor-backed crypto stage of the ACE resource servers, with a monitor of how long their event loop is blocked.
+"""
+import asyncio
+import functools
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAX_WORKERS = 2
+_LAG_INTERVAL = 0.05
+_LAG_WARNING = 0.1
+
+
+def _timed(fn, args, kwargs):
+    """ Runs on the executor, returns the result of *fn* and how long it took. """
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class LoopLagMonitor:
+    """
+    Wakes up every *interval* seconds, the delay of each wakeup is time in which the loop was blocked.\n
+    Delays above *warning* are logged.
+    """
+
+    def __init__(self, interval = _LAG_INTERVAL, warning = _LAG_WARNING):
+        self.interval = interval
+        self.warning = warning
+        self.blocked_seconds = 0.0
+        self.max_lag = 0.0
+        self.samples = 0
+        self._task = None
+
+    def start(self, loop):
+        if self._task is None:
+            self._task = loop.create_task(self._run(loop))
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, loop):
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            self.samples += 1
+            self.blocked_seconds += lag
+            self.max_lag = max(self.max_lag, lag)
+            if lag > self.warning:
+                _LOGGER.warning('Event loop was blocked for %.3f s.', lag)
+
+
+class CryptoStage:
+    """
+    Runs the crypto of a resource server on executors, so that its event loop keeps serving requests.
+    + `verify()` runs stateless work, such as the signature check of `cwt.decode()`,
+      on a pool of *max_workers* threads, or processes if *use_processes* (then *fn* and its arguments must pickle).
+    + `oscore()` runs OSCORE encrypt and decrypt on a single thread,
+      because OSCORE contexts keep sequence numbers and replay windows, thus their calls must not overlap.
+    + `stats()` counts the jobs and the time they took, i.e. the time they would have blocked the loop,
+      together with the time the loop actually was blocked, see `LoopLagMonitor`.
+    """
+
+    def __init__(self, max_workers = _MAX_WORKERS, use_processes = False):
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.lag_monitor = LoopLagMonitor()
+        self._jobs = {'verify': [0, 0.0], 'oscore': [0, 0.0]}
+        # Created on first use, thus importing the handlers does not start threads.
+        self._pool = None
+        self._serial = None
+
+    async def verify(self, fn, *args, **kwargs):
+        if self._pool is None:
+            executor = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+            self._pool = executor(max_workers = self.max_workers)
+        return await self._run(self._pool, 'verify', fn, args, kwargs)
+
+    async def oscore(self, fn, *args):
+        if self._serial is None:
+            self._serial = ThreadPoolExecutor(max_workers = 1)
+        return await self._run(self._serial, 'oscore', fn, args, {})
+
+    def monitor(self, loop):
+        """ Start measuring how long *loop* is blocked. """
+        self.lag_monitor.start(loop)
+
+    def stats(self):
+        stats = {}
+        for kind, (jobs, seconds) in self._jobs.items():
+            stats[kind + '_jobs'] = jobs
+            stats[kind + '_seconds'] = seconds
+        stats['loop_blocked_seconds'] = self.lag_monitor.blocked_seconds
+        stats['loop_max_lag'] = self.lag_monitor.max_lag
+        return stats
+
+    def shutdown(self):
+        self.lag_monitor.stop()
+        for executor in (self._pool, self._serial):
+            if executor is not None:
+                executor.shutdown(wait = False)
+        self._pool = None
+        self._serial = None
+
+    async def _run(self, executor, kind, fn, args, kwargs):
+        loop = asyncio.get_event_loop()
+        result, seconds = await loop.run_in_executor(executor, functools.partial(_timed, fn, args, kwargs))
+        self._jobs[kind][0] += 1
+        self._jobs[kind][1] += seconds
+        return result
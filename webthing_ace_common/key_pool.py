@@ -0,0 +1,146 @@
+"""
+Pool of pre-generated EDHOC ephemeral keys, refilled in the background.
+"""
+import inspect
+import logging
+import queue
+import sys
+import threading
+
+from ecdsa import NIST256p, SigningKey
+
+_LOGGER = logging.getLogger(__name__)
+
+_POOL_SIZE = 16
+
+_GENERATE_DEFAULTS = inspect.signature(SigningKey.generate).parameters
+
+
+class PooledSigningKey(SigningKey):
+    """
+    Takes the place of `SigningKey` in the module of an EDHOC server, see `EphemeralKeyPool.install()`.
+    `generate()` takes keys of the pool's curve from *pool*, all other calls are those of `SigningKey`.
+    Defined here, not per pool, so that the keys the module creates (e.g. with `from_der()`) can be pickled,
+    as the `SecurityStore` does.
+    """
+
+    pool = None
+
+    @classmethod
+    def generate(cls,
+                 curve = _GENERATE_DEFAULTS['curve'].default,
+                 entropy = None,
+                 hashfunc = _GENERATE_DEFAULTS['hashfunc'].default):
+        pool = cls.pool
+        if pool is not None and curve is pool.curve and entropy is None \
+                and hashfunc is _GENERATE_DEFAULTS['hashfunc'].default:
+            return pool.take()
+        return SigningKey.generate(curve = curve, entropy = entropy, hashfunc = hashfunc)
+
+
+class EphemeralKeyPool:
+    """
+    Keeps up to *size* ephemeral `SigningKey`s of *curve* ready, a daemon thread generates new ones
+    whenever keys were taken, thus an EDHOC handshake only pays for its message processing.
+    + `take()` returns a pooled key, or generates one inline if the pool is empty (counted as `exhausted`).
+    + `install()` makes the EDHOC server of a `ResourceServer` take its ephemeral keys from the pool,
+      until `uninstall()`, or `stop()`, restores the `SigningKey` of its module.
+      Only one pool can be installed at a time, use it as context manager to scope it, e.g. in tests.
+    + `stats()` reports the depth of the pool and how often it was exhausted.
+    Every key is handed out once.
+    """
+
+    def __init__(self, size = _POOL_SIZE, curve = NIST256p):
+        self.size = size
+        self.curve = curve
+        self.generated = 0
+        self.taken = 0
+        self.exhausted = 0
+        self._keys = queue.Queue(maxsize = size)
+        self._stopped = threading.Event()
+        self._thread = None
+        # (module, its original SigningKey) while installed
+        self._installed = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+        return False
+
+    def start(self):
+        """ Start filling the pool, after forking if the server forks. """
+        if self._thread is None:
+            self._thread = threading.Thread(target = self._fill, name = 'EphemeralKeyPool', daemon = True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self.uninstall()
+
+    def take(self):
+        try:
+            key = self._keys.get_nowait()
+        except queue.Empty:
+            self.exhausted += 1
+            key = SigningKey.generate(curve = self.curve)
+        self.taken += 1
+        return key
+
+    def stats(self):
+        return {'depth'    : self._keys.qsize(),
+                'size'     : self.size,
+                'generated': self.generated,
+                'taken'    : self.taken,
+                'exhausted': self.exhausted,
+                }
+
+    def install(self, edhoc_server):
+        """
+        Replace `SigningKey` in the module of *edhoc_server*'s class with `PooledSigningKey`,
+        whose `generate()` takes keys of *curve* from this pool.
+        :return: False if that module does not generate its keys with `ecdsa.SigningKey` itself,
+                 or if another pool is installed.
+        """
+        if PooledSigningKey.pool is not None and PooledSigningKey.pool is not self:
+            _LOGGER.warning('Another EphemeralKeyPool is installed, EDHOC keys of %s are not pooled.',
+                            type(edhoc_server).__name__)
+            return False
+
+        module = sys.modules.get(type(edhoc_server).__module__)
+        signing_key = getattr(module, 'SigningKey', None)
+        if signing_key is PooledSigningKey and self._installed is not None and self._installed[0] is module:
+            return True
+        if signing_key is not SigningKey:
+            _LOGGER.warning('%s does not generate keys with ecdsa.SigningKey, EDHOC keys are not pooled.',
+                            type(edhoc_server).__name__)
+            return False
+
+        self.uninstall()
+        PooledSigningKey.pool = self
+        module.SigningKey = PooledSigningKey
+        self._installed = (module, signing_key)
+        return True
+
+    def uninstall(self):
+        """ Restore the `SigningKey` of the module `install()` patched. Keys created meanwhile keep working. """
+        if self._installed is None:
+            return
+        module, signing_key = self._installed
+        if module.SigningKey is PooledSigningKey:
+            module.SigningKey = signing_key
+        if PooledSigningKey.pool is self:
+            PooledSigningKey.pool = None
+        self._installed = None
+
+    def _fill(self):
+        while not self._stopped.is_set():
+            key = SigningKey.generate(curve = self.curve)
+            self.generated += 1
+            while not self._stopped.is_set():
+                try:
+                    self._keys.put(key, timeout = 1)
+                    break
+                except queue.Full:
+                    pass
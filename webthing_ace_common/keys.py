@@ -0,0 +1,74 @@
+"""
+Helpers for the ecdsa keys of the ACE resource servers.
+"""
+import weakref
+
+from ecdsa import SigningKey, VerifyingKey
+from ecdsa.curves import find_curve
+
+try:
+    from ecdsa.ellipticcurve import PointJacobi
+except ImportError:
+    # ecdsa < 0.14 has no precomputation.
+    PointJacobi = None
+
+
+def precompute_key(key):
+    """
+    Build the precomputation tables of an ecdsa `VerifyingKey`, which make every later `verify()` faster.\n
+    Takes some ten milliseconds per key, thus it is done once: at startup, or when a peer becomes known.
+    Keys of ecdsa versions without precomputation are left as they are.
+    :return: *key*
+    """
+    if PointJacobi is None:
+        return key
+
+    point = key.pubkey.point
+    if isinstance(point, PointJacobi) and point.order() is None:
+        # Keys parsed from DER or bytes lack the curve order, which `VerifyingKey.precompute()` needs.
+        key.pubkey.point = PointJacobi(point.curve(), point.x(), point.y(), 1, key.curve.order, generator = True)
+        # The tables are built on first use, make that now.
+        key.pubkey.point * 2
+    else:
+        key.precompute()
+    return key
+
+
+# Restored keys by their encoding, thus reloading a pickled state shares the keys, and their tables, it had before.
+_restored = weakref.WeakValueDictionary()
+
+
+def reduce_key(obj):
+    """
+    For `reducer_override()` of a `pickle.Pickler` subclass, handles ecdsa keys:
+    a key is pickled as its encoding and the OID of its curve,
+    not with the curve and its precomputation tables, which are some 20 kB per key and specific to the ecdsa version.\n
+    :return: NotImplemented for every other object.
+    """
+    if isinstance(obj, VerifyingKey):
+        return restore_verifying_key, (obj.to_string(), obj.curve.oid, obj.default_hashfunc)
+    if isinstance(obj, SigningKey):
+        return _restore_signing_key, (type(obj), obj.to_string(), obj.curve.oid, obj.default_hashfunc)
+    return NotImplemented
+
+
+def restore_verifying_key(string, oid, hashfunc, precompute = False):
+    """
+    Unpickle a `VerifyingKey` pickled by `reduce_key()`.
+    An unpickler which should warm the keys it restores, see `precompute_key()`, calls it with *precompute*.
+    """
+    key = _restored.get((VerifyingKey, string, oid, precompute))
+    if key is None:
+        key = VerifyingKey.from_string(string, curve = find_curve(oid), hashfunc = hashfunc)
+        if precompute:
+            precompute_key(key)
+        _restored[(VerifyingKey, string, oid, precompute)] = key
+    return key
+
+
+def _restore_signing_key(cls, string, oid, hashfunc):
+    key = _restored.get((cls, string, oid))
+    if key is None:
+        key = cls.from_string(string, curve = find_curve(oid), hashfunc = hashfunc)
+        _restored[(cls, string, oid)] = key
+    return key
@@ -0,0 +1,92 @@
+"""
+Per-connection send queue of the push channels, which evicts consumers that do not keep up.
+"""
+import asyncio
+import collections
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+_MAX_PENDING = 64
+_MAX_STALL = 5
+
+
+class PushQueue:
+    """
+    Queues the messages pushed to one connection and writes them, one at a time, with *send(message)*.
+    + *send* is a coroutine which protects and writes one frame, it returns once the frame was flushed.
+    + A consumer which falls *max_pending* messages behind, or whose frame takes longer than *max_stall* seconds
+      to flush, is evicted: the queue is dropped and *on_evict(reason)* is called, which should close the connection.
+      Thus one slow client neither grows the server's memory nor delays the others.
+    + A failing *send* evicts as well, e.g. once the OSCORE context of the client was revoked.
+    Use from the event loop only.
+    """
+
+    def __init__(self, send, on_evict = None, max_pending = _MAX_PENDING, max_stall = _MAX_STALL):
+        self.send = send
+        self.on_evict = on_evict
+        self.max_pending = max_pending
+        self.max_stall = max_stall
+        self.evicted = None
+        self.stats = {'queued'     : 0,
+                      'sent'       : 0,
+                      'max_pending': 0,
+                      }
+        self._pending = collections.deque()
+        self._writer = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    def put(self, message):
+        """
+        Queue *message* for sending.\n
+        :return: False if the consumer is, or now got, evicted.
+        """
+        if self.evicted is not None:
+            return False
+        if len(self._pending) >= self.max_pending:
+            self.evict('more than {} messages pending'.format(self.max_pending))
+            return False
+
+        self._pending.append(message)
+        self.stats['queued'] += 1
+        self.stats['max_pending'] = max(self.stats['max_pending'], len(self._pending))
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._write())
+        return True
+
+    def evict(self, reason):
+        if self.evicted is not None:
+            return
+        self.evicted = reason
+        self._pending.clear()
+        self.close()
+        _LOGGER.info('Push consumer was evicted: %s', reason)
+        if self.on_evict is not None:
+            self.on_evict(reason)
+
+    def close(self):
+        """ Stop writing, e.g. once the connection closed. """
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self._writer = None
+
+    async def _write(self):
+        try:
+            while self._pending:
+                message = self._pending.popleft()
+                try:
+                    await asyncio.wait_for(self.send(message), self.max_stall)
+                except asyncio.TimeoutError:
+                    self.evict('a frame took longer than {} s'.format(self.max_stall))
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.evict('sending failed: {}'.format(e))
+                    return
+                self.stats['sent'] += 1
+        finally:
+            if self._writer is asyncio.current_task():
+                self._writer = None
@@ -0,0 +1,404 @@
+"""
+SQLite store of the security state of an ACE `ResourceServer`,
+shared by the worker processes of a resource server, and optionally kept across restarts.
+"""
+import hashlib
+import hmac
+import io
+import logging
+import os
+import pickle
+import sqlite3
+import stat
+import tempfile
+import functools
+import uuid
+
+from webthing_ace_common.keys import reduce_key, restore_verifying_key
+
+_LOGGER = logging.getLogger(__name__)
+
+# Attributes of `ResourceServer` which hold state: access tokens, PoP keys, EDHOC sessions and OSCORE contexts.
+_ATTRIBUTES = ('token_cache', 'edhoc_server')
+_TIMEOUT = 30
+_KEY_SIZE = 32
+# The database and the files SQLite keeps beside it in WAL mode.
+_SUFFIXES = ('', '-wal', '-shm')
+# Attribute which marks an OSCORE context as stored in a row of its own, see `SecurityStore.apply()`.
+_REF = '_security_store_ref'
+
+
+class UnsafeStoreError(Exception):
+    """ A store file may have been written or read by someone else, or its state failed authentication. """
+
+
+class _Pickler(pickle.Pickler):
+    """ Pickles ecdsa keys without their precomputation tables, see `reduce_key()`. """
+
+    def __init__(self, file):
+        super().__init__(file, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def reducer_override(self, obj):
+        return reduce_key(obj)
+
+
+class _Unpickler(pickle.Unpickler):
+    """ With *precompute_keys*, builds the verification tables of the `VerifyingKey`s it restores. """
+
+    def __init__(self, file, precompute_keys):
+        super().__init__(file)
+        self.precompute_keys = precompute_keys
+
+    def find_class(self, module, name):
+        cls = super().find_class(module, name)
+        if cls is restore_verifying_key and self.precompute_keys:
+            return functools.partial(restore_verifying_key, precompute = True)
+        return cls
+
+
+def new_key():
+    """ :return: a random key to authenticate the stored state with, see `SecurityStore`. """
+    return os.urandom(_KEY_SIZE)
+
+
+def private_directory(prefix = 'ace_rs_'):
+    """ :return: a new directory in the temp directory, which only the current user may enter (0700). """
+    return tempfile.mkdtemp(prefix = prefix)
+
+
+def check_private(path):
+    """
+    :raise UnsafeStoreError: unless *path* is a regular file, owned by the current user,
+        which neither group nor others may access.
+    """
+    try:
+        status = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISREG(status.st_mode):
+        raise UnsafeStoreError('{} is not a regular file.'.format(path))
+    if status.st_uid != os.geteuid():
+        raise UnsafeStoreError('{} is owned by another user.'.format(path))
+    if status.st_mode & 0o077:
+        raise UnsafeStoreError('{} may be accessed by other users (mode {:o}).'.format(path, status.st_mode & 0o777))
+
+
+def load_key(path):
+    """
+    :return: the key stored at *path*, for state which has to survive restarts.
+        A new key is stored there first, with mode 0600, unless the file exists.
+    """
+    create_private(path)
+    with open(path, 'r+b') as f:
+        key = f.read()
+        if not key:
+            key = new_key()
+            f.write(key)
+            f.flush()
+            os.fsync(f.fileno())
+    return key
+
+
+def check_durable_path(path):
+    """
+    A store kept across restarts holds long-lived secrets, thus it needs an explicit place outside the temp directory.\n
+    :raise ValueError: if *path* is None or within the temp directory.
+    """
+    if path is None:
+        raise ValueError('A persistent security store needs a store_path.')
+    temp = os.path.realpath(tempfile.gettempdir())
+    if os.path.commonpath([os.path.realpath(path), temp]) == temp:
+        raise ValueError('A persistent security store must not be kept in the temp directory: {}'.format(path))
+
+
+def create_private(path):
+    """ Create *path* with mode 0600 unless it exists, then `check_private()` it. """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY | getattr(os, 'O_NOFOLLOW', 0), 0o600)
+    except FileExistsError:
+        pass
+    else:
+        os.close(fd)
+    check_private(path)
+
+
+# Operations on the security state of a ResourceServer *rs*.
+# Resource servers run them directly, or within a transaction of their `SecurityStore`.
+
+def add_token(rs, decoded, pop_key):
+    # Store token and PoP key id
+    rs.token_cache.add_token(token = decoded,
+                             pop_key_id = pop_key.key_id)
+    # Inform EDHOC Server about new key
+    rs.edhoc_server.add_peer_identity(key_id = pop_key.key_id,
+                                      key = pop_key.key)
+
+
+def edhoc_receive(rs, message):
+    return rs.edhoc_server.on_receive(message)
+
+
+def oscore_resolve(rs, unprot, scope):
+    return rs.oscore_context(unprot, scope)
+
+
+class SharedOscoreContext:
+    """
+    Stands in for the OSCORE context of one request when a `SecurityStore` is used.\n
+    Every `encrypt()` and `decrypt()` resolves the context again within a store transaction, see `SecurityStore.apply()`,
+    thus it works on the current sequence number and replay window, and stores them before it returns.
+    Like the store, it must be used from the OSCORE thread of the `CryptoStage`.
+    """
+
+    def __init__(self, store, unprot, scope):
+        self.store = store
+        self.unprot = unprot
+        self.scope = scope
+
+    def encrypt(self, data):
+        return self.store.apply(self.unprot, self.scope, 'encrypt', data)
+
+    def decrypt(self, data):
+        return self.store.apply(self.unprot, self.scope, 'decrypt', data)
+
+
+class SecurityStore:
+    """
+    Keeps the state of *rs* (see `_ATTRIBUTES`) as one versioned row in the SQLite database at *path*.
+    + The state holds secrets and is unpickled, thus the database and its `-wal` and `-shm` files
+      are created with mode 0600 and refused (`UnsafeStoreError`) if another user owns them or may access them.
+    + Every row carries an HMAC under *key*, a row which does not match it is refused before it is unpickled.
+      Create the key with `new_key()` in the parent process, before it forks.
+    + `read(fn, *args)` and `write(fn, *args)` run *fn(rs, \\*args)* in a transaction.
+      Both first reload the state if another process changed it since (the version differs).
+    + `write()` then stores the state back before the transaction commits, thus no process ever works
+      on a stale OSCORE sequence number or replay window, and a client which ran EDHOC (or uploaded its token)
+      against one process is served by every other one.
+    + OSCORE objects returned by *fn* are only valid within the transaction, later calls have to resolve them again.
+    + `apply()` encrypts or decrypts with one OSCORE context. Every context which was used once is kept in a row
+      of its own, which the state only refers to. Thus a protected request only loads and stores its own context,
+      not the state of every client, and the state only changes with tokens and EDHOC sessions.
+      The write lock of SQLite still covers the whole database, but it is held for one context only.
+    One connection is opened per process, on first use, thus the store may be created before forking.
+    It must be used from one thread per process, the OSCORE thread of the `CryptoStage`.\n
+    With *durable* every transaction is synced to disk before it returns, thus the store survives a restart,
+    see `restore()`. Because the state is written before a response leaves the server, a restored OSCORE context
+    never reuses a sequence number and its replay window rejects every request which was processed before.\n
+    ecdsa keys are stored as their encoding only. With *precompute_keys* their verification tables
+    are built again once they are loaded, see `precompute_key()`.
+    """
+
+    def __init__(self, path, rs, key, attributes = _ATTRIBUTES, durable = False, precompute_keys = False):
+        if len(key) < _KEY_SIZE:
+            raise ValueError('The key of a SecurityStore must have at least {} bytes.'.format(_KEY_SIZE))
+        self.path = path
+        self.rs = rs
+        self.key = key
+        self.attributes = attributes
+        self.durable = durable
+        self.precompute_keys = precompute_keys
+        self.stats = {'reads'           : 0,
+                      'writes'          : 0,
+                      'applies'         : 0,
+                      'reloads'         : 0,
+                      'context_reloads' : 0,
+                      }
+        self._connection = None
+        self._version = None
+        # Reference of a context -> version of its row which the local context holds.
+        self._context_versions = {}
+
+    def publish(self):
+        """ Replace the stored state with the state of *rs*, e.g. by the parent process before it forks. """
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._save(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self.close()
+
+    def restore(self):
+        """
+        Load the stored state into *rs*, e.g. after a restart.
+        :return: False if nothing was stored yet.
+        """
+        connection = self._connect()
+        connection.execute('BEGIN')
+        try:
+            self._refresh(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        restored = self._version is not None
+        self.close()
+        if restored:
+            _LOGGER.info('Restored the security state from %s.', self.path)
+        return restored
+
+    def read(self, fn, *args):
+        return self._transaction(False, fn, args)
+
+    def write(self, fn, *args):
+        return self._transaction(True, fn, args)
+
+    def apply(self, unprot, scope, method, data):
+        """
+        *method* ('encrypt' or 'decrypt') *data* with the OSCORE context of *unprot* and *scope*,
+        within a transaction on the row of that context only.\n
+        A context which is used for the first time gets a row, and the state is stored once more to refer to it.
+        """
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._refresh(connection)
+            context = self.rs.oscore_context(unprot, scope)
+            ref = vars(context).get(_REF)
+            if ref is None:
+                setattr(context, _REF, uuid.uuid4().hex)
+                self._save(connection)
+            else:
+                self._refresh_context(connection, ref, context)
+            result = getattr(context, method)(data)
+            self._save_context(connection, context)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            # The local context may have changed, reload it with the state.
+            self._version = None
+            raise
+        self.stats['applies'] += 1
+        return result
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        self._version = None
+        self._context_versions = {}
+
+    def _connect(self):
+        if self._connection is None:
+            for suffix in _SUFFIXES:
+                check_private(self.path + suffix)
+            # SQLite creates the -wal and -shm files with the mode of the database.
+            create_private(self.path)
+            connection = sqlite3.connect(self.path, timeout = _TIMEOUT, isolation_level = None)
+            try:
+                connection.execute('PRAGMA journal_mode = WAL')
+                connection.execute('PRAGMA synchronous = ' + ('FULL' if self.durable else 'NORMAL'))
+                connection.execute('CREATE TABLE IF NOT EXISTS security_state '
+                                   '(id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER NOT NULL, '
+                                   'state BLOB NOT NULL, mac BLOB NOT NULL)')
+                connection.execute('CREATE TABLE IF NOT EXISTS oscore_context '
+                                   '(ref TEXT PRIMARY KEY, version INTEGER NOT NULL, '
+                                   'state BLOB NOT NULL, mac BLOB NOT NULL)')
+                for suffix in _SUFFIXES:
+                    check_private(self.path + suffix)
+            except BaseException:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    def _mac(self, ref, version, state):
+        """ *ref* is None for the state, else the reference of an OSCORE context. """
+        label = 'state' if ref is None else 'context ' + ref
+        return hmac.new(self.key, '{}|{}|'.format(label, version).encode('ascii') + state, hashlib.sha256).digest()
+
+    def _verify(self, ref, version, state, mac):
+        if not hmac.compare_digest(mac, self._mac(ref, version, state)):
+            raise UnsafeStoreError('The {} stored in {} does not match its HMAC.'.format(
+                    'state' if ref is None else 'OSCORE context', self.path))
+
+    def _transaction(self, write, fn, args):
+        connection = self._connect()
+        connection.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+        try:
+            self._refresh(connection)
+            result = fn(self.rs, *args)
+            if write:
+                self._save(connection)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            # *fn* may have changed the local state before it failed.
+            self._version = None
+            raise
+        self.stats['writes' if write else 'reads'] += 1
+        return result
+
+    def _refresh(self, connection):
+        row = connection.execute('SELECT version FROM security_state WHERE id = 0').fetchone()
+        if row is None or row[0] == self._version:
+            return
+        state, mac = connection.execute('SELECT state, mac FROM security_state WHERE id = 0').fetchone()
+        self._verify(None, row[0], state, mac)
+        self._context_versions = {}
+        unpickler = _Unpickler(io.BytesIO(state), self.precompute_keys)
+        unpickler.persistent_load = lambda ref: self._load_context(connection, ref)
+        for attribute, value in unpickler.load().items():
+            setattr(self.rs, attribute, value)
+        self._version = row[0]
+        self.stats['reloads'] += 1
+
+    def _save(self, connection):
+        """ Store the state, with references to the OSCORE contexts which have rows of their own. """
+        refs = set()
+
+        def persistent_id(obj):
+            ref = getattr(obj, '__dict__', {}).get(_REF)
+            if ref is None:
+                return None
+            refs.add(ref)
+            if ref not in self._context_versions:
+                self._save_context(connection, obj)
+            return ref
+
+        buffer = io.BytesIO()
+        pickler = _Pickler(buffer)
+        pickler.persistent_id = persistent_id
+        pickler.dump({attribute: getattr(self.rs, attribute) for attribute in self.attributes})
+        state = buffer.getvalue()
+        row = connection.execute('SELECT version FROM security_state WHERE id = 0').fetchone()
+        version = 0 if row is None else row[0] + 1
+        connection.execute('INSERT OR REPLACE INTO security_state (id, version, state, mac) VALUES (0, ?, ?, ?)',
+                           (version, state, self._mac(None, version, state)))
+        # Contexts of replaced EDHOC sessions.
+        for (ref,) in connection.execute('SELECT ref FROM oscore_context').fetchall():
+            if ref not in refs:
+                connection.execute('DELETE FROM oscore_context WHERE ref = ?', (ref,))
+                self._context_versions.pop(ref, None)
+        self._version = version
+
+    def _load_context(self, connection, ref):
+        row = connection.execute('SELECT version, state, mac FROM oscore_context WHERE ref = ?', (ref,)).fetchone()
+        if row is None:
+            raise UnsafeStoreError('The OSCORE context {} is missing in {}.'.format(ref, self.path))
+        version, state, mac = row
+        self._verify(ref, version, state, mac)
+        context = _Unpickler(io.BytesIO(state), self.precompute_keys).load()
+        self._context_versions[ref] = version
+        return context
+
+    def _refresh_context(self, connection, ref, context):
+        """ Update *context* in place if another process changed its row since. """
+        row = connection.execute('SELECT version FROM oscore_context WHERE ref = ?', (ref,)).fetchone()
+        if row is None or row[0] == self._context_versions.get(ref):
+            return
+        vars(context).update(vars(self._load_context(connection, ref)))
+        self.stats['context_reloads'] += 1
+
+    def _save_context(self, connection, context):
+        ref = vars(context)[_REF]
+        buffer = io.BytesIO()
+        _Pickler(buffer).dump(context)
+        state = buffer.getvalue()
+        row = connection.execute('SELECT version FROM oscore_context WHERE ref = ?', (ref,)).fetchone()
+        version = 0 if row is None else row[0] + 1
+        connection.execute('INSERT OR REPLACE INTO oscore_context (ref, version, state, mac) VALUES (?, ?, ?, ?)',
+                           (ref, version, state, self._mac(ref, version, state)))
+        self._context_versions[ref] = version
@@ -0,0 +1,157 @@
+"""
+Per-stage latency histograms of the ACE request pipeline, switchable at runtime.
+"""
+import bisect
+import json
+import logging
+import os
+import signal
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+_DUMP_INTERVAL = 10
+# Upper bounds of the buckets in seconds, doubling from 1 us to about 16 s, plus one bucket above.
+BUCKETS = tuple(2 ** i / 1e6 for i in range(25))
+
+
+class Histogram:
+    """ Counts of latencies per bucket of `BUCKETS`, with their count, sum and maximum. """
+
+    __slots__ = ('counts', 'count', 'total', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """
+        :return: upper bound of the bucket which holds the *q* th percentile, at most the maximum, or None if empty.
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        """ Milliseconds, buckets as { upper bound in ms : count } without empty ones. """
+        buckets = {('%g' % (bound * 1e3)): count for bound, count in zip(BUCKETS, self.counts) if count}
+        if self.counts[-1]:
+            buckets['+Inf'] = self.counts[-1]
+        return {'count'  : self.count,
+                'mean_ms': self.total / self.count * 1e3 if self.count else None,
+                'p50_ms' : self._ms(self.percentile(50)),
+                'p95_ms' : self._ms(self.percentile(95)),
+                'p99_ms' : self._ms(self.percentile(99)),
+                'max_ms' : self.max * 1e3,
+                'buckets': buckets,
+                }
+
+    @staticmethod
+    def _ms(seconds):
+        return None if seconds is None else seconds * 1e3
+
+
+class StageMetrics:
+    """
+    Latency histograms of the stages a request passes, e.g. COSE parsing, the scope check, decrypt,
+    the thing, CBOR encoding and encrypt.
+    + Handlers call `started = start()` and then `started = lap(stage, started)` after every stage.
+      While disabled, `start()` returns None and `lap()` returns right away, thus the hooks cost next to nothing.
+    + *enabled* may be switched at any time, e.g. by `toggle()` on SIGUSR1, see `install_signal()`.
+    + `snapshot()` returns the histograms as dict, `dump()` writes it as JSON,
+      `dump_periodically()` does so every *interval* seconds.
+    Record from the event loop only, the histograms are not locked.
+    """
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.since = time.time()
+        self._histograms = {}
+        self._dump_handle = None
+
+    def start(self):
+        """ :return: start of the first stage, None while disabled. """
+        return time.perf_counter() if self.enabled else None
+
+    def lap(self, stage, started):
+        """
+        Record the stage which began at *started*.\n
+        :return: its end, which is the start of the next stage, None if *started* is None.
+        """
+        if started is None:
+            return None
+        now = time.perf_counter()
+        self.record(stage, now - started)
+        return now
+
+    def record(self, stage, seconds):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = Histogram()
+        histogram.add(seconds)
+
+    def toggle(self, *_):
+        """ Switch recording on or off, usable as signal handler. """
+        self.enabled = not self.enabled
+        _LOGGER.info('Stage metrics %s.', 'enabled' if self.enabled else 'disabled')
+
+    def reset(self):
+        self._histograms = {}
+        self.since = time.time()
+
+    def snapshot(self):
+        return {'enabled': self.enabled,
+                'since'  : self.since,
+                'pid'    : os.getpid(),
+                'stages' : {stage: histogram.as_dict() for stage, histogram in sorted(self._histograms.items())},
+                }
+
+    def dump(self, path):
+        """ Write `snapshot()` to *path*, replacing the file at once so that readers never see half of it. """
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.snapshot(), f, indent = 2)
+        os.replace(temporary, path)
+
+    def dump_periodically(self, loop, path, interval = _DUMP_INTERVAL):
+        """ `dump()` to *path* every *interval* seconds on *loop*, until `stop_dumps()`. """
+
+        def dump():
+            try:
+                self.dump(path)
+            except OSError as e:
+                _LOGGER.warning('Stage metrics could not be written to %s: %s', path, e)
+            self._dump_handle = loop.call_later(interval, dump)
+
+        self.stop_dumps()
+        self._dump_handle = loop.call_later(interval, dump)
+
+    def stop_dumps(self):
+        if self._dump_handle is not None:
+            self._dump_handle.cancel()
+            self._dump_handle = None
+
+    def install_signal(self, signum = getattr(signal, 'SIGUSR1', None)):
+        """
+        Let *signum* switch recording on and off, e.g. `kill -USR1 <pid>`. Call from the main thread.\n
+        :return: False where the signal does not exist.
+        """
+        if signum is None:
+            return False
+        signal.signal(signum, self.toggle)
+        return True
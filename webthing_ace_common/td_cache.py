@@ -0,0 +1,97 @@
+"""
+Cache of CBOR encoded Thing Descriptions, shared by the ACE Tornado and the ACE aiocoap handlers.
+"""
+import hashlib
+import weakref
+
+from cbor2 import dumps
+
+
+def metadata_digest(thing):
+    """
+    Digest of the metadata dicts of all properties, actions and events of *thing*.
+    Hashing their `repr` is much cheaper than building and encoding the Thing Description,
+    and catches metadata that was changed in place.
+    """
+    metadata = ([(name, _property.metadata) for name, _property in thing.properties.items()],
+                [(name, action['metadata']) for name, action in thing.available_actions.items()],
+                [(name, event['metadata']) for name, event in thing.available_events.items()])
+    return hashlib.sha1(repr(metadata).encode()).digest()
+
+
+def fingerprint(thing):
+    """
+    Everything a Thing Description is built from.
+    A TD only changes if properties, actions or events are added, removed or their metadata changes,
+    or if the href prefix or the naming of the Thing change.
+    """
+    return (thing.href_prefix,
+            thing.ui_href,
+            getattr(thing, 'name', None),
+            getattr(thing, 'title', None),
+            thing.description,
+            tuple(thing.type),
+            thing.context,
+            metadata_digest(thing))
+
+
+class ThingDescriptionCache:
+    """
+    Keeps the CBOR encoded Thing Description of every Thing, together with its validator.
+    An entry is rebuilt only if the `fingerprint()` of its Thing changed,
+    thus OSCORE only has to encrypt the cached plaintext.
+    """
+
+    def __init__(self):
+        # thing -> (fingerprint, encoded, validator)
+        self._entries = weakref.WeakKeyDictionary()
+        # Only the latest set of things: (fingerprints of all things, encoded, validator)
+        self._all = None
+        self.hits = 0
+        self.misses = 0
+
+    def encoded(self, thing):
+        """
+        :return: `dumps(thing.as_thing_description())`
+        """
+        return self._entry(thing)[1]
+
+    def validator(self, thing):
+        """
+        :return: hash of the encoded Thing Description, changes whenever the TD changes.
+        """
+        return self._entry(thing)[2]
+
+    def encoded_all(self, things):
+        """
+        :return: `dumps([thing.as_thing_description() for thing in things])`
+        """
+        return self._entry_all(things)[0]
+
+    def validator_all(self, things):
+        return self._entry_all(things)[1]
+
+    def _entry(self, thing):
+        _fingerprint = fingerprint(thing)
+        entry = self._entries.get(thing)
+        if entry is not None and entry[0] == _fingerprint:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        encoded = dumps(thing.as_thing_description())
+        entry = (_fingerprint, encoded, hashlib.sha1(encoded).hexdigest())
+        self._entries[thing] = entry
+        return entry
+
+    def _entry_all(self, things):
+        things = list(things)
+        key = tuple(fingerprint(thing) for thing in things)
+        if self._all is not None and self._all[0] == key:
+            self.hits += 1
+            return self._all[1:]
+
+        self.misses += 1
+        encoded = dumps([thing.as_thing_description() for thing in things])
+        self._all = (key, encoded, hashlib.sha1(encoded).hexdigest())
+        return self._all[1:]
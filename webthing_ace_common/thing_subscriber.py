@@ -0,0 +1,49 @@
+"""
+Subscriber to the property changes and events of a webthing `Thing`, for the push channels of the servers.
+"""
+import json
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class ThingSubscriber:
+    """
+    Takes the place of a WebSocket in the subscribers of a `Thing`, and hands what the thing reports to a loop.
+    + *on_property(name, value)* is called for every property change,
+      *on_event(description)* for every event, with `Event.as_event_description()`.
+    + Both are called on *loop*, whichever thread changed the thing.
+    + Understands the `update_property()` / `update_event()` callbacks of newer webthing versions
+      as well as the JSON `write_message()` of older ones.
+    """
+
+    def __init__(self, loop, on_property = None, on_event = None):
+        self.loop = loop
+        self.on_property = on_property
+        self.on_event = on_event
+
+    def update_property(self, property_):
+        self._call(self.on_property, property_.get_name(), property_.get_value())
+
+    def update_event(self, event):
+        self._call(self.on_event, event.as_event_description())
+
+    def update_action(self, action):
+        pass
+
+    def write_message(self, message):
+        message = json.loads(message)
+        if message.get('messageType') == 'propertyStatus':
+            for name, value in message['data'].items():
+                self._call(self.on_property, name, value)
+        elif message.get('messageType') == 'event':
+            self._call(self.on_event, message['data'])
+
+    def _call(self, fn, *args):
+        if fn is None:
+            return
+        try:
+            self.loop.call_soon_threadsafe(fn, *args)
+        except RuntimeError:
+            # The loop was closed, e.g. while the server stops.
+            _LOGGER.debug('Dropped a notification, the loop is closed.')
@@ -0,0 +1,68 @@
+"""
+Cache of access tokens whose signature was already verified, so that re-uploads to /authz-info skip the ECDSA verify.
+"""
+import collections
+import hashlib
+import time
+
+_MAX_ENTRIES = 256
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU cache: SHA-256 of the encoded token -> (decoded claims, PoP CoseKey).
+    + Only tokens which passed `cwt.decode()` and `CoseKey.from_cose()` are put in the cache.
+    + An entry is dropped once the `exp` claim of its token has passed.
+    + `hits`, `misses` and `expired` count the lookups.
+    """
+
+    def __init__(self, max_entries = _MAX_ENTRIES, clock = time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        # digest -> (claims, pop_key, exp)
+        self._entries = collections.OrderedDict()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token).digest()
+
+    def get(self, token):
+        """
+        :return: (claims, pop_key) of *token*, or None if it was not verified yet or expired.
+        """
+        digest = self.digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        claims, pop_key, exp = entry
+        if exp is not None and exp <= self.clock():
+            del self._entries[digest]
+            self.expired += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return claims, pop_key
+
+    def put(self, token, claims, pop_key, exp = None):
+        """
+        :param exp: the `exp` claim of the token (seconds since the epoch), None if it does not expire.
+        """
+        digest = self.digest(token)
+        self._entries[digest] = (claims, pop_key, exp)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last = False)
+
+    def stats(self):
+        return {'entries': len(self._entries),
+                'hits'   : self.hits,
+                'misses' : self.misses,
+                'expired': self.expired,
+                }
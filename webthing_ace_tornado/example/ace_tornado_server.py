@@ -24,7 +24,12 @@ def run_server():
     thing.name = 'Virtual ACE HTTP RPi Thing'
 
     server = AceWebThingServer(things = SingleThing(thing),
-                               port = ACE_HTTP_RS_PORT)
+                               port = ACE_HTTP_RS_PORT,
+                               precompute_keys = PRECOMPUTE_KEYS,
+                               persist = PERSIST_SECURITY_STATE,
+                               store_path = SECURITY_STORE_PATH,
+                               edhoc_key_pool = EDHOC_KEY_POOL,
+                               metrics = STAGE_METRICS)
     try:
         logging.info('Starting the server at PORT: ' + str(ACE_HTTP_RS_PORT))
         server.start()
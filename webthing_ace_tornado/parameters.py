@@ -88,3 +88,14 @@ SCOPES = ['GET /',
           'GET /events/proximity']
 
 GRANTS = [Grant(audience = AUDIENCE, scopes = SCOPES), ]
+
+# Warm the ecdsa verification tables of the AS key and of PoP keys, see `webthing_ace_common/keys.py`.
+PRECOMPUTE_KEYS: bool = False
+# Keep tokens, PoP keys, EDHOC sessions and OSCORE contexts across restarts of the RS.
+PERSIST_SECURITY_STATE: bool = False
+# SQLite file of PERSIST_SECURITY_STATE, outside the temp directory, e.g. '/var/lib/ace_rs/security_state.sqlite'.
+SECURITY_STORE_PATH = None
+# Number of EDHOC ephemeral keys generated ahead of the handshakes, 0 to disable the pool.
+EDHOC_KEY_POOL: int = 16
+# Record per-stage latency histograms of requests from the start, `kill -USR1 <pid>` switches them at runtime.
+STAGE_METRICS: bool = False
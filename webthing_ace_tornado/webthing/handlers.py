@@ -1,3 +1,4 @@
+import asyncio
 import json
 import logging
 from typing import Optional, Awaitable
@@ -13,10 +14,18 @@ from ace.cbor.constants import Keys
 from ace.cose.constants import Key
 from ace.cose.cose import SignatureVerificationFailed
 from ace.cose.key import CoseKey
-from ace.rs.resource_server import ResourceServer, NotAuthorizedException
+from ace.rs.resource_server import ResourceServer
 from cbor2 import dumps, loads
 from webthing.errors import PropertyError
 
+from webthing_ace_common.crypto_stage import CryptoStage
+from webthing_ace_common.keys import precompute_key
+from webthing_ace_common.push_queue import PushQueue
+from webthing_ace_common.security_store import SharedOscoreContext, add_token, edhoc_receive, oscore_resolve
+from webthing_ace_common.stage_metrics import StageMetrics
+from webthing_ace_common.td_cache import ThingDescriptionCache
+from webthing_ace_common.thing_subscriber import ThingSubscriber
+from webthing_ace_common.verified_tokens import VerifiedTokenCache
 from webthing_ace_tornado.parameters import *
 
 
@@ -33,6 +42,20 @@ class AceHandler(tornado.web.RequestHandler):
                             identity = RS_IDENTITY,
                             as_url = PC_AS_URL,
                             as_public_key = AS_PUBLIC_KEY)
+    # CBOR encoded Thing Descriptions, shared by ThingsHandler and ThingHandler
+    td_cache = ThingDescriptionCache()
+    # CWT verification and OSCORE off the IOLoop, replaced by AceWebThingServer
+    crypto = CryptoStage()
+    # Tokens which were uploaded before skip the signature check
+    verified_tokens = VerifiedTokenCache()
+    # Warm the verification tables of PoP keys, set by AceWebThingServer
+    precompute_keys = False
+    # State shared with other worker processes or kept across restarts, set by AceWebThingServer
+    security_store = None
+    # Pre-generated EDHOC ephemeral keys, set by AceWebThingServer
+    edhoc_keys = None
+    # Latency histograms of the request pipeline, switched on by AceWebThingServer or at runtime
+    metrics = StageMetrics()
 
     _ = "%(asctime)s %(filename)s:%(lineno)s %(levelname)s %(message)s"
     logging.basicConfig(level = 10,
@@ -42,23 +65,54 @@ class AceHandler(tornado.web.RequestHandler):
         # 'implement' all abstracts methods of super
         pass
 
+    async def change_state(self, fn, *args):
+        """
+        Run *fn(ace_rs, \\*args)*, which changes the security state.\n
+        With a *security_store* this happens on the crypto stage,
+        within a transaction on the stored state.
+        """
+        if self.security_store is None:
+            return fn(self.ace_rs, *args)
+        return await self.crypto.oscore(self.security_store.write, fn, *args)
+
+    async def resolve(self, unprot, scope):
+        """
+        Resolve the OSCORE context of the COSE header *unprot* and check it against *scope*.\n
+        :return: the context, a `SharedOscoreContext` with a *security_store*.
+        :raise Exception: if the request is not authorized.
+        """
+        if self.security_store is None:
+            return oscore_resolve(self.ace_rs, unprot, scope)
+        # Checks the scope, the context is resolved again whenever it is used.
+        await self.crypto.oscore(self.security_store.read, oscore_resolve, unprot, scope)
+        return SharedOscoreContext(self.security_store, unprot, scope)
+
 
 class AuthzHandler(AceHandler):
     """Handle a request to /authz-info/."""
 
-    def post(self):
+    async def post(self):
 
         access_token = super().request.body
+        started = self.metrics.start()
 
-        # Verify if valid CWT from AS
-        try:
-            decoded = cwt.decode(access_token,
-                                 key = super().ace_rs.as_public_key)
-        except SignatureVerificationFailed as error:
-            self.set_status(401)
-            self.set_header('Content-Type', 'application/json')
-            self.write(json.dumps([{'error': {'error': str(error)}}]))
-            return
+        verified = self.verified_tokens.get(access_token)
+        if verified is not None:
+            # Uploaded before, e.g. after a reconnect.
+            decoded, pop_key = verified
+        else:
+            # Verify if valid CWT from AS
+            try:
+                decoded = await self.crypto.verify(cwt.decode,
+                                                   access_token,
+                                                   key = super().ace_rs.as_public_key)
+            except SignatureVerificationFailed as error:
+                self.set_status(401)
+                self.set_header('Content-Type', 'application/json')
+                self.write(json.dumps([{'error': {'error': str(error)}}]))
+                return
+            pop_key = None
+        started = self.metrics.lap('authz.verify', started)
 
         # Check if audience claim in token matches audience id of this RS
         if decoded[Keys.AUD] != super().ace_rs.audience:
@@ -67,31 +121,63 @@ class AuthzHandler(AceHandler):
             self.write(json.dumps([{'error': 'Audience mismatch'}]))
             return
 
-        # Extract PoP CoseKey
-        pop_key = CoseKey.from_cose(decoded[Keys.CNF][Key.COSE_KEY])
+        if pop_key is None:
+            # Extract PoP CoseKey
+            pop_key = CoseKey.from_cose(decoded[Keys.CNF][Key.COSE_KEY])
+            if self.precompute_keys:
+                await asyncio.get_event_loop().run_in_executor(None, precompute_key, pop_key.key)
+            self.verified_tokens.put(access_token, decoded, pop_key, exp = decoded.get(Keys.EXP))
+        started = self.metrics.lap('authz.pop_key', started)
 
-        # Store token and PoP key id
-        super().ace_rs.token_cache.add_token(token = decoded,
-                                             pop_key_id = pop_key.key_id)
-
-        # Inform EDHOC Server about new key
-        super().ace_rs.edhoc_server.add_peer_identity(key_id = pop_key.key_id,
-                                                      key = pop_key.key)
+        await self.change_state(add_token, decoded, pop_key)
+        self.metrics.lap('authz.add_token', started)
         self.set_status(201)
 
 
 class EdhocHandler(AceHandler):
 
-    def post(self):
+    async def post(self):
         message = self.request.body
-        response = super().ace_rs.edhoc_server.on_receive(message)
+        started = self.metrics.start()
+        response = await self.change_state(edhoc_receive, message)
+        self.metrics.lap('edhoc.receive', started)
         logging.info('EDHOC message was received.')
         self.set_status(201)
         self.write(bytes(response))
 
 
+class MetricsHandler(AceHandler):
+    """
+    Handle a request to /metrics, which only answers to the local host.\n
+    GET returns the stage histograms of this process as JSON,
+    POST switches them with *?enabled=1* or *?enabled=0*, and clears them with *?reset=1*.
+    """
+
+    def prepare(self):
+        if self.request.remote_ip not in ('127.0.0.1', '::1'):
+            raise tornado.web.HTTPError(403)
+
+    def get(self):
+        self.set_header('Content-Type', 'application/json')
+        self.write(json.dumps(self.metrics.snapshot()))
+
+    def post(self):
+        enabled = self.get_argument('enabled', None)
+        if enabled is not None:
+            self.metrics.enabled = enabled.lower() in ('1', 'true', 'on')
+        if self.get_argument('reset', None) is not None:
+            self.metrics.reset()
+        self.get()
+
+
 class BaseHandler(AceHandler):
-    """Base handler that is initialized with a thing."""
+    """
+    Base handler that is initialized with a thing.\n
+    Every request passes the security stage in *prepare()* before the handler method runs,
+    handlers then use *self.payload* and *self.encrypt()*.\n
+    The stages are timed into *metrics*: cose_parse, oscore_resolve, decrypt, thing (the handler method),
+    cbor_encode, encrypt, and request for all of them.
+    """
 
     def initialize(self, things, hosts):
         """
@@ -103,14 +189,60 @@ class BaseHandler(AceHandler):
         self.things = things
         self.hosts = hosts
         self.scope = self.request.method + ' ' + self.request.path
+        self._oscore_context = None
+        self.payload = None
+        # Start of the request and of the thing stage, None while *metrics* are disabled.
+        self._started = None
+        self._thing_started = None
 
-    def prepare(self):
-        """Validate Host header."""
-        host = self.request.headers.get('Host', None)
-        if host is not None and host in self.hosts:
+    async def prepare(self):
+        """
+        Validate Host header, then run the security stage of the request:\n
+        + parse the COSE envelope of the body,
+        + resolve the OSCORE context and check it against *self.scope*,
+        + decrypt the payload of requests which carry one (POST, PUT) into *self.payload*.\n
+        Each of these happens once per request. A request which fails is finished here with 401 or 400.
+        """
+        self.check_host()
+
+        self._started = started = self.metrics.start()
+        try:
+            # An unauthorized GET request will have *request.body == b''*,
+            # thus *cbor2.loads()* will fail,
+            # thus the *try* block.
+            prot, unprot, cipher = loads(self.request.body).value
+            started = self.metrics.lap('cose_parse', started)
+            self._oscore_context = await self.resolve(unprot, self.scope)
+        except Exception as e:
+            logging.info('Request to ' + self.scope + ' is not authorized: ' + str(e))
+            self.set_status(401)
+            self.finish()
             return
+        started = self.metrics.lap('oscore_resolve', started)
 
-        raise tornado.web.HTTPError(403)
+        if self.request.method in ('POST', 'PUT'):
+            try:
+                self.payload = loads(await self.crypto.oscore(self._oscore_context.decrypt, self.request.body))
+            except ValueError:
+                self.set_status(400)
+                self.finish()
+                return
+            started = self.metrics.lap('decrypt', started)
+        self._thing_started = started
+
+    def check_host(self):
+        """ Validate the Host header. """
+        host = self.request.headers.get('Host', None)
+        if host is None or host not in self.hosts:
+            raise tornado.web.HTTPError(403)
+
+    def on_finish(self):
+        self.metrics.lap('request', self._started)
+
+    def _thing_done(self):
+        """ Ends the thing stage, which began after *prepare()*, once per request. """
+        started, self._thing_started = self._thing_started, None
+        return self.metrics.lap('thing', started)
 
     def get_thing(self, thing_id):
         """
@@ -120,6 +252,12 @@ class BaseHandler(AceHandler):
         """
         return self.things.get_thing(thing_id)
 
+    def get_args(self):
+        """
+        :return: *self.payload* with the keys translated from bytes to str.
+        """
+        return {k.decode('utf-8'): v for k, v in self.payload.items()}
+
     def set_default_headers(self, *args, **kwargs):
         """Set the default headers for all requests."""
         self.set_header('Access-Control-Allow-Origin', '*')
@@ -128,74 +266,249 @@ class BaseHandler(AceHandler):
         self.set_header('Access-Control-Allow-Methods',
                         'GET, HEAD, PUT, POST, DELETE')
 
-    def write_response(self, oscore_context, payload):
+    def oscore_context(self):
+        """
+        :return: the OSCORE context resolved in *prepare()*, a `SharedOscoreContext` with a *security_store*.
+        """
+        return self._oscore_context
+
+    async def encrypt(self, cbor_data_dump):
+        """
+        Encrypt a CBOR encoded response with the OSCORE context of this request, on the crypto stage.
+        """
+        self._thing_done()
+        started = self.metrics.start()
+        encrypted = await self.crypto.oscore(self._oscore_context.encrypt, cbor_data_dump)
+        self.metrics.lap('encrypt', started)
+        return encrypted
+
+    async def write_response(self, payload):
         """
-        :param oscore_context:
         :param payload: Contains the message.
         :return: None
         """
-        self.set_header('Content-Type', 'application/cbor')
+        started = self._thing_done() or self.metrics.start()
         cbor_data_dump = dumps(payload)
-        response = oscore_context.encrypt(cbor_data_dump)
-        self.write(response)
+        self.metrics.lap('cbor_encode', started)
+        await self.write_encoded_response(cbor_data_dump)
 
-    def oscore_context(self):
+    async def write_encoded_response(self, cbor_data_dump):
         """
-        An unauthorized GET request will have *request.body == b''*,\n
-        thus *cbor2.loads()* will fail,\n
-        thus the *try* block.\n
-        Uses CBOR for load/dump of payload/body, another implementation with JSON possible.\n
-        :return: oscore_context
+        Like *write_response()*, for payloads which are already CBOR encoded.
+        :param cbor_data_dump: The encoded message.
+        :return: None
         """
-        try:
-            prot, unprot, cipher = loads(self.request.body).value
-            return super().ace_rs.oscore_context(unprot, self.scope)
-        except NotAuthorizedException:
-            self.set_status(401)
-            return
-        pass
+        self.set_header('Content-Type', 'application/cbor')
+        self.write(await self.encrypt(cbor_data_dump))
 
 
 class ThingsHandler(BaseHandler):
     """Handle a request to / when the server manages multiple things."""
 
     # TODO : to test this swap example to MultipleThings
-    def get(self):
+    async def get(self):
         """ Handle a GET request. """
-        prot, unprot, cipher = loads(self.request.body).value
-        try:
-            oscore_context = super().ace_rs.oscore_context(unprot, self.scope)
-        except NotAuthorizedException:
-            raise NotAuthorizedException
+        things = self.things.get_things()
+        if 'validator' in self.request.query_arguments:
+            await self.write_response({'validator': self.td_cache.validator_all(things)})
+            return
+
+        await self.write_encoded_response(self.td_cache.encoded_all(things))
 
-        self.set_header('Content-Type', 'application/json')
-        cbor_data_dump = dumps([
-            thing.as_thing_description()
-            for idx, thing in enumerate(self.things.get_things())
-            ])
-        response = oscore_context.encrypt(cbor_data_dump)
-        self.write(response)
 
+class ThingHandler(BaseHandler, tornado.websocket.WebSocketHandler):
+    """
+    Handle a request to /, including WebSocket requests.\n
+    Like in the Mozilla original the WebSocket pushes `propertyStatus` and `event` messages,
+    and takes `setProperty`, `requestAction` and `addEventSubscription` messages.
+    Messages are CBOR encoded, and every frame is protected with the OSCORE context of the client:
+    + The upgrade itself carries no body, thus it is not authorized.
+      The first frame of the client, e.g. an `addEventSubscription`, must arrive within *push_auth_timeout* seconds
+      and be authorized for the scope of the thing (`GET /`), else the socket is closed with 1008.
+    + Every frame of the client is checked against the scope of the equivalent HTTP request,
+      e.g. `POST /properties/led` for a `setProperty` of `led`. Refused messages are answered with an `error` message.
+    + Property changes are pushed if the client may `GET /properties`.
+    + Pushed frames are encrypted with the context of the client's last frame,
+      and pass a `PushQueue`, which closes the socket of a slow client, or of one whose context failed, with 1013.
+    """
 
-class ThingHandler(BaseHandler):
-    """Handle a request to /."""
+    # Settings of the push channel, set by AceWebThingServer.
+    push_auth_timeout = 10
+    push_max_pending = 64
+    push_max_stall = 5
+
+    def initialize(self, things, hosts):
+        super().initialize(things, hosts)
+        self.thing = None
+        self._push_context = None
+        self._push_queue = None
+        self._subscriber = None
+        self._auth_timeout = None
+
+    def is_upgrade(self):
+        return self.request.headers.get('Upgrade', '').lower() == 'websocket'
+
+    async def prepare(self):
+        if self.is_upgrade():
+            # The frames are authorized one by one, see on_message().
+            self.check_host()
+            return
+        await super().prepare()
+
+    async def get(self, thing_id = '0'):
+        """ Handle a GET request, including WebSocket requests. """
+        thing = self.get_thing(thing_id)
+        if thing is None:
+            self.set_status(404)
+            return
+
+        if self.is_upgrade():
+            self.thing = thing
+            await tornado.websocket.WebSocketHandler.get(self, thing_id)
+            return
+
+        if 'validator' in self.request.query_arguments:
+            await self.write_response({'validator': self.td_cache.validator(thing)})
+            return
+
+        await self.write_encoded_response(self.td_cache.encoded(thing))
+
+    def check_origin(self, origin):
+        """Allow connections from all origins."""
+        return True
+
+    def open(self, thing_id = '0'):
+        """Handle a new connection."""
+        self._push_queue = PushQueue(self.send_frame,
+                                     on_evict = self.evict,
+                                     max_pending = self.push_max_pending,
+                                     max_stall = self.push_max_stall)
+        self._subscriber = ThingSubscriber(asyncio.get_event_loop(),
+                                           on_property = self.push_property,
+                                           on_event = self.push_event)
+        self._auth_timeout = tornado.ioloop.IOLoop.current().call_later(self.push_auth_timeout, self.close, 1008,
+                                                                        'Not authorized')
+
+    async def on_message(self, message):
+        """
+        Handle an incoming message, an OSCORE protected CBOR map with *messageType* and *data*.
+        """
+        if not isinstance(message, bytes):
+            self.close(1003, 'Expected a binary frame')
+            return
 
-    # TODO:  This omits all the WebSocket features in the Mozilla original.
-    def get(self, thing_id = '0'):
-        """ Handle a GET request. """
         try:
-            # An unauthorized GET request will have *request.body == b''*,
-            # thus *cbor2.loads()* will fail,
-            # thus place the next line inside *try:*.
-            prot, unprot, cipher = loads(self.request.body).value
-            oscore_context = super().ace_rs.oscore_context(unprot, self.scope)
+            prot, unprot, cipher = loads(message).value
+            context = await self.resolve(unprot, self.scope)
+            message = loads(await self.crypto.oscore(context.decrypt, message))
         except Exception as e:
-            print(e)
-            self.set_status(401)
+            logging.info('Message to ' + self.scope + ' is not authorized: ' + str(e))
+            self.close(1008, 'Not authorized')
             return
 
-        self.write_response(oscore_context = oscore_context,
-                            payload = self.get_thing(thing_id).as_thing_description())
+        if self._push_context is None:
+            tornado.ioloop.IOLoop.current().remove_timeout(self._auth_timeout)
+            if await self.authorized(unprot, 'GET', '/properties'):
+                self.thing.add_subscriber(self._subscriber)
+        self._push_context = context
+
+        message = {self.decode(k): v for k, v in message.items()} if isinstance(message, dict) else {}
+        if 'messageType' not in message or 'data' not in message:
+            self.push_error('400 Bad Request', 'Invalid message')
+            return
+
+        msg_type = self.decode(message['messageType'])
+        data = {self.decode(k): v for k, v in message['data'].items()}
+        if msg_type == 'setProperty':
+            for property_name, property_value in data.items():
+                if not await self.authorized(unprot, 'POST', '/properties/' + property_name):
+                    self.push_error('403 Forbidden', 'Not authorized: setProperty ' + property_name)
+                    continue
+                try:
+                    self.thing.set_property(property_name, property_value)
+                except PropertyError as e:
+                    self.push_error('400 Bad Request', str(e))
+        elif msg_type == 'requestAction':
+            for action_name, action_params in data.items():
+                if not await self.authorized(unprot, 'POST', '/actions/' + action_name):
+                    self.push_error('403 Forbidden', 'Not authorized: requestAction ' + action_name)
+                    continue
+                input_ = None
+                if 'input' in action_params:
+                    input_ = action_params['input']
+
+                action = self.thing.perform_action(action_name, input_)
+                if action:
+                    tornado.ioloop.IOLoop.current().spawn_callback(perform_action,
+                                                                   action,)
+                else:
+                    self.push_error('400 Bad Request', 'Invalid action request')
+        elif msg_type == 'addEventSubscription':
+            for event_name in data.keys():
+                if not await self.authorized(unprot, 'GET', '/events/' + event_name):
+                    self.push_error('403 Forbidden', 'Not authorized: addEventSubscription ' + event_name)
+                    continue
+                self.thing.add_event_subscriber(event_name, self._subscriber)
+        else:
+            self.push_error('400 Bad Request', 'Unknown messageType: ' + msg_type)
+
+    def on_close(self):
+        """Handle a close event on the socket."""
+        if self._auth_timeout is not None:
+            tornado.ioloop.IOLoop.current().remove_timeout(self._auth_timeout)
+        if self._subscriber is not None and self.thing is not None:
+            self.thing.remove_subscriber(self._subscriber)
+        if self._push_queue is not None:
+            self._push_queue.close()
+
+    async def authorized(self, unprot, method, path):
+        """
+        :return: whether the client of *unprot* may send *method* requests to *path* of this thing.
+        """
+        try:
+            await self.resolve(unprot, method + ' ' + self.thing.href_prefix + path)
+        except Exception:
+            return False
+        return True
+
+    @staticmethod
+    def decode(key):
+        return key.decode('utf-8') if isinstance(key, bytes) else key
+
+    def push_property(self, name, value):
+        self.push({'messageType': 'propertyStatus',
+                   'data'       : {name: value},
+                   })
+
+    def push_event(self, event_description):
+        self.push({'messageType': 'event',
+                   'data'       : event_description,
+                   })
+
+    def push_error(self, status, message):
+        self.push({'messageType': 'error',
+                   'data'       : {'status' : status,
+                                   'message': message,
+                                   },
+                   })
+
+    def push(self, message):
+        if self._push_context is not None:
+            self._push_queue.put(message)
+
+    async def send_frame(self, message):
+        """
+        Encrypt *message* and write it as one binary frame, returns once it was flushed.
+        """
+        started = self.metrics.start()
+        frame = await self.crypto.oscore(self._push_context.encrypt, dumps(message))
+        started = self.metrics.lap('push.encrypt', started)
+        await self.write_message(frame, binary = True)
+        self.metrics.lap('push.write', started)
+
+    def evict(self, reason):
+        self.thing.remove_subscriber(self._subscriber)
+        self.close(1013, 'Evicted')
 
 
 class PropertiesHandler(BaseHandler):
@@ -205,7 +518,7 @@ class PropertiesHandler(BaseHandler):
     different implementation with JSON possible.
     """
 
-    def get(self, thing_id = '0'):
+    async def get(self, thing_id = '0'):
         """
         Handle a GET request.\n
         :parameter thing_id: ID of the thing this request is for.
@@ -215,34 +528,25 @@ class PropertiesHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = thing.get_properties())
+        await self.write_response(thing.get_properties())
 
 
 class PropertyHandler(BaseHandler):
     """Handle a request to /properties/<property>."""
 
-    def get(self, thing_id = '0', property_name = None):
+    async def get(self, thing_id = '0', property_name = None):
         """Handle a GET request."""
         thing = self.get_thing(thing_id)
         if thing is None:
             self.set_status(404)
             return
 
-        prot, unprot, cipher = loads(self.request.body).value
-        try:
-            oscore_context = super().ace_rs.oscore_context(unprot, self.scope)
-        except NotAuthorizedException:
-            self.set_status(401)
-            return
-
         if thing.has_property(property_name):
-            self.write_response(oscore_context,
-                                {property_name: thing.get_property(property_name)})
+            await self.write_response({property_name: thing.get_property(property_name)})
         else:
             self.set_status(404)
 
-    def post(self, thing_id = '0', property_name = None):
+    async def post(self, thing_id = '0', property_name = None):
         """
         Handle a PUT request.
 
@@ -254,17 +558,7 @@ class PropertyHandler(BaseHandler):
             self.set_status(404)
             return
 
-        try:
-            args = loads(self.oscore_context().decrypt(self.request.body))
-            # translate keys from bytes to str
-            _args = {}
-            for k in args:
-                _args.update({k.decode('utf-8'): args.get(k)})
-            args = _args
-        except ValueError:
-            self.set_status(400)
-            return
-
+        args = self.get_args()
         if property_name not in args:
             self.set_status(400)
             return
@@ -277,8 +571,7 @@ class PropertyHandler(BaseHandler):
                 return
             # code matches ACE http-client : check if this deviation from Mozilla spec is necessary.
             self.set_status(201)
-            self.write_response(oscore_context = self.oscore_context(),
-                                payload = {property_name: thing.get_property(property_name), })
+            await self.write_response({property_name: thing.get_property(property_name), })
         else:
             self.set_status(404)
 
@@ -286,7 +579,7 @@ class PropertyHandler(BaseHandler):
 class ActionsHandler(BaseHandler):
     """Handle a request to /actions."""
 
-    def get(self, thing_id = '0'):
+    async def get(self, thing_id = '0'):
         """
         Handle a GET request.
 
@@ -297,10 +590,9 @@ class ActionsHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = thing.get_action_descriptions())
+        await self.write_response(thing.get_action_descriptions())
 
-    def post(self, thing_id = '0'):
+    async def post(self, thing_id = '0'):
         """
         Handle a POST request.
 
@@ -311,28 +603,8 @@ class ActionsHandler(BaseHandler):
             self.set_status(404)
             return
 
-        # uses CBOR for load/dump of payload/body, another implementation with JSON possible
-        prot, unprot, cipher = loads(self.request.body).value
-        try:
-            oscore_context = super().ace_rs.oscore_context(unprot, self.scope)
-        except NotAuthorizedException:
-            self.set_status(401)
-            return
-        ##
-
-        try:
-            args = loads(oscore_context.decrypt(self.request.body))
-            # translate keys from bytes to str
-            _args = {}
-            for k in args:
-                _args.update({k.decode('utf-8'): args.get(k)})
-            args = _args
-        except ValueError:
-            self.set_status(400)
-            return
-
         response = {}
-        for action_name, action_params in args.items():
+        for action_name, action_params in self.get_args().items():
             input_ = None
             if 'input' in action_params:
                 input_ = action_params['input']
@@ -346,13 +618,13 @@ class ActionsHandler(BaseHandler):
                                                                action,)
 
         self.set_status(201)
-        self.write(oscore_context.encrypt(dumps(response)))
+        self.write(await self.encrypt(dumps(response)))
 
 
 class ActionHandler(BaseHandler):
     """Handle a request to /actions/<action_name>."""
 
-    def get(self, thing_id = '0', action_name = None):
+    async def get(self, thing_id = '0', action_name = None):
         """
         Handle a GET request.
 
@@ -364,10 +636,9 @@ class ActionHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = thing.get_action_descriptions(action_name = action_name))
+        await self.write_response(thing.get_action_descriptions(action_name = action_name))
 
-    def post(self, thing_id = '0', action_name = None):
+    async def post(self, thing_id = '0', action_name = None):
         """
         Handle a POST request.
 
@@ -378,19 +649,8 @@ class ActionHandler(BaseHandler):
             self.set_status(404)
             return
 
-        try:
-            args = loads(self.oscore_context().decrypt(self.request.body))
-            # translate keys from bytes to str
-            _args = {}
-            for k in args:
-                _args.update({k.decode('utf-8'): args.get(k)})
-            args = _args
-        except ValueError:
-            self.set_status(400)
-            return
-
         response = {}
-        for name, action_params in args.items():
+        for name, action_params in self.get_args().items():
             if name != action_name:
                 continue
 
@@ -407,13 +667,13 @@ class ActionHandler(BaseHandler):
                                                                action,)
 
         self.set_status(201)
-        self.write(self.oscore_context().encrypt(dumps(response)))
+        self.write(await self.encrypt(dumps(response)))
 
 
 class ActionIDHandler(BaseHandler):
     """Handle a request to /actions/<action_name>/<action_id>."""
 
-    def get(self, thing_id = '0', action_name = None, action_id = None):
+    async def get(self, thing_id = '0', action_name = None, action_id = None):
         """
         Handle a GET request.
 
@@ -431,10 +691,9 @@ class ActionIDHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = action.as_action_description())
+        await self.write_response(action.as_action_description())
 
-    def put(self, thing_id = '0', action_name = None, action_id = None):
+    async def put(self, thing_id = '0', action_name = None, action_id = None):
         """
         Handle a PUT request.
 
@@ -451,7 +710,7 @@ class ActionIDHandler(BaseHandler):
 
         self.set_status(200)
 
-    def delete(self, thing_id = '0', action_name = None, action_id = None):
+    async def delete(self, thing_id = '0', action_name = None, action_id = None):
         """
         Handle a DELETE request.
 
@@ -464,8 +723,6 @@ class ActionIDHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.oscore_context()
-
         if thing.remove_action(action_name, action_id):
             self.set_status(204)
         else:
@@ -475,7 +732,7 @@ class ActionIDHandler(BaseHandler):
 class EventsHandler(BaseHandler):
     """Handle a request to /events."""
 
-    def get(self, thing_id = '0'):
+    async def get(self, thing_id = '0'):
         """
         Handle a GET request.
 
@@ -486,14 +743,13 @@ class EventsHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = thing.get_event_descriptions())
+        await self.write_response(thing.get_event_descriptions())
 
 
 class EventHandler(BaseHandler):
     """Handle a request to /events/<event_name>."""
 
-    def get(self, thing_id = '0', event_name = None):
+    async def get(self, thing_id = '0', event_name = None):
         """
         Handle a GET request.
 
@@ -505,5 +761,4 @@ class EventHandler(BaseHandler):
             self.set_status(404)
             return
 
-        self.write_response(oscore_context = self.oscore_context(),
-                            payload = thing.get_event_descriptions(event_name = event_name))
+        await self.write_response(thing.get_event_descriptions(event_name = event_name))
@@ -3,23 +3,36 @@ Python Web Thing server implementation.
 """
 
 from zeroconf import ServiceInfo, Zeroconf
+import logging
+import os
 import socket
 import tornado.concurrent
 import tornado.gen
 import tornado.httpserver
 import tornado.ioloop
+import tornado.netutil
+import tornado.process
 import tornado.web
 import tornado.websocket
 from webthing.server import MultipleThings
 from webthing.utils import get_ip
 
+from webthing_ace_common.crypto_stage import CryptoStage
+from webthing_ace_common.key_pool import EphemeralKeyPool
+from webthing_ace_common.keys import precompute_key
+from webthing_ace_common.security_store import SecurityStore, check_durable_path, load_key, new_key, \
+    private_directory
 from webthing_ace_tornado.webthing.handlers import *
 
 
 class AceWebThingServer:
     """Server to represent a Web Thing over HTTP."""
 
-    def __init__(self, things, port = 80, hostname = None, ssl_options = None):
+    def __init__(self, things, port = 80, hostname = None, ssl_options = None,
+                 crypto_workers = 2, crypto_processes = False, precompute_keys = False,
+                 workers = 1, store_path = None, persist = False, edhoc_key_pool = 0,
+                 metrics = False, metrics_path = None, metrics_interval = 10,
+                 push_max_pending = 64, push_max_stall = 5, push_auth_timeout = 10):
         """
         Initialize the WebThingServer.
 
@@ -28,12 +41,47 @@ class AceWebThingServer:
         port -- port to listen on (defaults to 80)
         hostname -- Optional host name, i.e. mything.com
         ssl_options -- dict of SSL options to pass to the tornado server
+        crypto_workers -- size of the pool which verifies access tokens
+        crypto_processes -- verify access tokens in processes instead of threads
+        precompute_keys -- warm the verification tables of the AS key now, and of PoP keys once they are uploaded
+        workers -- number of worker processes which share the port, 0 for one per CPU core
+        store_path -- SQLite file through which several workers share tokens, PoP keys,
+                      EDHOC sessions and OSCORE contexts (defaults to a file in a new private temp directory)
+        persist -- keep the security state in *store_path* across restarts,
+                   thus clients do not have to upload their token and run EDHOC again,
+                   requires a *store_path* outside the temp directory
+        edhoc_key_pool -- number of EDHOC ephemeral keys generated ahead of time, 0 to generate them in the handshake
+        metrics -- record per-stage latency histograms from the start, SIGUSR1 or POST /metrics switch them later
+        metrics_path -- JSON file the histograms are written to every *metrics_interval* seconds,
+                        workers append their task id
+        push_max_pending -- messages a WebSocket client may fall behind before it is evicted
+        push_max_stall -- seconds a pushed frame may take to flush before its client is evicted
+        push_auth_timeout -- seconds a WebSocket client has to send its first, authorized, frame
         """
         self.things = things
         self.name = things.get_name()
         self.port = port
         self.hostname = hostname
         self.ip = get_ip()
+        self.ssl_options = ssl_options
+        self.workers = workers
+        self.persist = persist
+        self.edhoc_key_pool = edhoc_key_pool
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        if persist:
+            check_durable_path(store_path)
+        self.store_path = store_path
+        self.zeroconf = None
+        AceHandler.crypto = CryptoStage(max_workers = crypto_workers,
+                                        use_processes = crypto_processes)
+        AceHandler.precompute_keys = precompute_keys
+        AceHandler.metrics.enabled = metrics
+        ThingHandler.push_max_pending = push_max_pending
+        ThingHandler.push_max_stall = push_max_stall
+        ThingHandler.push_auth_timeout = push_auth_timeout
+        if precompute_keys:
+            precompute_key(AceHandler.ace_rs.as_public_key)
 
         system_hostname = socket.gethostname()
         self.hosts = [
@@ -113,6 +161,10 @@ class AceWebThingServer:
                     r'/.well-known/edhoc',
                     EdhocHandler,
                     ),
+                (
+                    r'/metrics',
+                    MetricsHandler,
+                    ),
                 ]
         else:
             # If SingleThing
@@ -154,6 +206,9 @@ class AceWebThingServer:
                         (r'/.well-known/edhoc/?',
                          EdhocHandler,
                          ),
+                        (r'/metrics/?',
+                         MetricsHandler,
+                         ),
                         ]
 
         self.app = tornado.web.Application(handlers)
@@ -162,7 +217,63 @@ class AceWebThingServer:
                                                     ssl_options = ssl_options)
 
     def start(self):
-        """Start listening for incoming connections."""
+        """
+        Start listening for incoming connections.\n
+        With several *workers* the port is bound here, then the process forks.
+        Every worker accepts on the same socket and works on the shared security state, see `SecurityStore`.
+        The parent process only restarts workers which die.
+        """
+        if self.persist or self.workers != 1:
+            AceHandler.security_store = self.open_store()
+
+        if self.workers == 1:
+            self.register_service()
+            self.server.listen(self.port)
+        else:
+            sockets = tornado.netutil.bind_sockets(self.port)
+
+            task_id = tornado.process.fork_processes(self.workers)
+            logging.info('Worker ' + str(task_id) + ' started.')
+            if self.metrics_path is not None:
+                self.metrics_path += '.' + str(task_id)
+            if task_id == 0:
+                self.register_service()
+            self.server = tornado.httpserver.HTTPServer(self.app,
+                                                        ssl_options = self.ssl_options)
+            self.server.add_sockets(sockets)
+
+        if self.edhoc_key_pool:
+            AceHandler.edhoc_keys = EphemeralKeyPool(size = self.edhoc_key_pool)
+            if AceHandler.edhoc_keys.install(AceHandler.ace_rs.edhoc_server):
+                AceHandler.edhoc_keys.start()
+
+        AceHandler.metrics.install_signal()
+        if self.metrics_path is not None:
+            AceHandler.metrics.dump_periodically(tornado.ioloop.IOLoop.current().asyncio_loop,
+                                                 self.metrics_path,
+                                                 self.metrics_interval)
+
+        AceHandler.crypto.monitor(tornado.ioloop.IOLoop.current().asyncio_loop)
+        tornado.ioloop.IOLoop.current().start()
+
+    def open_store(self):
+        """
+        :return: a SecurityStore holding the state restored from *store_path* if *persist*, else the current state.
+        Its key is created here, before the workers fork, and kept in memory, unless the state has to survive restarts.
+        """
+        if self.store_path is None:
+            self.store_path = os.path.join(private_directory(), 'security_state.sqlite')
+        if self.persist:
+            key = load_key(self.store_path + '.key')
+        else:
+            key = new_key()
+        store = SecurityStore(self.store_path, AceHandler.ace_rs, key, durable = self.persist,
+                              precompute_keys = AceHandler.precompute_keys)
+        if not (self.persist and store.restore()):
+            store.publish()
+        return store
+
+    def register_service(self):
         self.service_info = ServiceInfo(type_ = '_webthing._tcp.local.',
                                         name = '{}._webthing._tcp.local.'.format(self.name),
                                         address = socket.inet_aton(self.ip),
@@ -172,11 +283,20 @@ class AceWebThingServer:
         self.zeroconf = Zeroconf()
         self.zeroconf.register_service(self.service_info)
 
-        self.server.listen(self.port)
-        tornado.ioloop.IOLoop.current().start()
-
     def stop(self):
         """Stop listening."""
-        self.zeroconf.unregister_service(self.service_info)
-        self.zeroconf.close()
+        if self.zeroconf is not None:
+            self.zeroconf.unregister_service(self.service_info)
+            self.zeroconf.close()
         self.server.stop()
+        logging.info('Crypto stage: ' + str(AceHandler.crypto.stats()))
+        logging.info('Verified tokens: ' + str(AceHandler.verified_tokens.stats()))
+        if AceHandler.security_store is not None:
+            logging.info('Security store: ' + str(AceHandler.security_store.stats))
+        if AceHandler.edhoc_keys is not None:
+            logging.info('EDHOC key pool: ' + str(AceHandler.edhoc_keys.stats()))
+            AceHandler.edhoc_keys.stop()
+        AceHandler.metrics.stop_dumps()
+        if self.metrics_path is not None:
+            AceHandler.metrics.dump(self.metrics_path)
+        AceHandler.crypto.shutdown()